@@ -92,21 +92,23 @@ import re
 import time
 import traceback
 import inspect
+import glob
+import hashlib
+import cPickle as pickle
 
-from pylab import *
-import pandas as pd
+import numpy as np
 
 # psana modules
 import psana
 
-from psmon import publish
-publish.client_opts.daemon = True
-from psmon.plots import Image, XYPlot, MultiPlot
+# matplotlib, pandas and psmon are imported when used for plotting or
+# saving configurations so that batch jobs do not need to load them.
 
 # PyDataSource modules
 from DataSourceInfo import *
 from psana_doc_info import * 
 from psmessage import Message
+from psgeometry import GeometryCache, ImageAssembler, PolarIntegrator, ArrayStore
 
 _eventCodes_rate = {
         40: '120 Hz',
@@ -211,9 +213,15 @@ def get_key_info(psana_obj):
 def get_keys(psana_obj):
     """Get a dictionary of the (type, src, key) for the data types of each src.
     """
+    return _parse_keys(psana_obj.keys())
+
+def _parse_keys(keys):
+    """Parse list of psana event keys into dictionaries of (type, src, key) 
+       by src and by type module.
+    """
     key_info = {}
     _modules = {}
-    for key in psana_obj.keys():
+    for key in keys:
         typ = key.type()
         src = key.src()
         if typ:
@@ -237,6 +245,313 @@ def get_keys(psana_obj):
     return key_info, _modules
 
 
+class KeyLayoutCache(object):
+    """
+    Cache of parsed event keys for repeated event key layouts.
+
+    Most events in a run have one of a few sets of keys.  A signature of the 
+    number of keys and the str of each event key (which includes the type, 
+    src and key without further psana calls) is used to look up the parsed 
+    key_info and modules dictionaries from get_keys so they only need to 
+    be built once for each layout.  The cached dictionaries are shared and
+    should not be modified.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of layouts to cache before clearing the cache
+
+    Attributes
+    ----------
+    hits : int
+        Number of events with a cached key layout
+    misses : int
+        Number of events where the keys were parsed
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._layouts = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(keys):
+        """Signature of event key layout.
+        """
+        return (len(keys), '\n'.join(str(key) for key in keys))
+
+    def get_keys(self, psana_obj):
+        """Cached version of get_keys.
+        """
+        keys = psana_obj.keys()
+        signature = self._signature(keys)
+        layout = self._layouts.get(signature)
+        if layout is not None:
+            self.hits += 1
+            return layout
+
+        self.misses += 1
+        layout = _parse_keys(keys)
+        if len(self._layouts) >= self.maxsize:
+            self._layouts.clear()
+        
+        self._layouts[signature] = layout
+        return layout
+
+    def clear(self):
+        """Clear cached layouts and counters.
+        """
+        self._layouts.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return '{:} layouts, {:} hits, {:} misses'.format(len(self._layouts), 
+                                                          self.hits, self.misses)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+def benchmark_key_cache(data_source, nevents=1000):
+    """
+    Benchmark parsing event keys with get_keys on every event against 
+    the KeyLayoutCache (signature lookup on the hit path).
+
+    Parameters
+    ----------
+    data_source : str
+        psana data source (e.g., 'exp=xpptut15:run=54:smd')
+    nevents : int
+        Number of events
+
+    Returns
+    -------
+    dict
+        Time in sec for 'parse' and 'cache' key lookup, 'speedup' and 
+        the cache 'hits' and 'misses'
+    """
+    ds = psana.DataSource(data_source)
+    evts = []
+    for evt in ds.events():
+        evts.append(evt)
+        if len(evts) >= nevents:
+            break
+
+    time0 = time.time()
+    for evt in evts:
+        get_keys(evt)
+    time_parse = time.time()-time0
+
+    cache = KeyLayoutCache()
+    time0 = time.time()
+    for evt in evts:
+        cache.get_keys(evt)
+    time_cache = time.time()-time0
+
+    return {'parse': time_parse, 'cache': time_cache, 'speedup': time_parse/time_cache,
+            'hits': cache.hits, 'misses': cache.misses}
+
+
+class AddOnCache(object):
+    """
+    Per-event cache of AddOn results (roi, count, histogram, peak and projection).
+
+    Results are computed at most once per event for each detector alias and 
+    AddOn attribute.  The cache is cleared when a new event is loaded and when 
+    AddOn definitions or calibration options are changed.  Cached results are 
+    shared and should not be modified in place.
+
+    Attributes
+    ----------
+    hits : int
+        Number of results returned from the cache
+    misses : int
+        Number of results computed
+    version : int
+        Incremented when AddOn definitions change (see ReductionPlan)
+    """
+
+    def __init__(self):
+        self._results = {}
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+
+    def get(self, key, func, *args):
+        """
+        Cached result of func(*args) for key in the current event.
+        """
+        if key in self._results:
+            self.hits += 1
+            return self._results[key]
+
+        self.misses += 1
+        value = func(*args)
+        self._results[key] = value
+        return value
+
+    def clear(self):
+        """
+        Clear cached results (e.g., for a new event).
+        """
+        self._results.clear()
+
+    def invalidate(self):
+        """
+        Clear cached results when AddOn definitions change.
+        """
+        self._results.clear()
+        self.version += 1
+
+    def reset(self):
+        """
+        Clear cached results and counters.
+        """
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        return '{:} results, {:} hits, {:} misses'.format(len(self._results), 
+                                                          self.hits, self.misses)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+class ReductionPlan(object):
+    """
+    Compiled plan of AddOn reductions for a detector.
+
+    AddOn definitions form a graph where each roi, count, histogram, peak or 
+    projection takes as input a detector attribute (e.g., 'calib', 'image' or 
+    'raw') or the output of another AddOn (e.g., a count of a roi).
+    The plan includes only the AddOns needed for the requested outputs,
+    fetches each source attribute once per event and evaluates the AddOns 
+    in dependency order so intermediate results are reused.
+
+    Parameters
+    ----------
+    detector : object
+        Detector object
+    outputs : list, optional
+        Names of AddOn outputs to compute (default = all AddOns)
+
+    Attributes
+    ----------
+    order : list
+        AddOn names in evaluation order
+    sources : list
+        Detector attributes used as input
+    """
+
+    _addon_types = ['roi', 'count', 'histogram', 'peak', 'projection']
+    _batch_types = ['roi', 'count', 'projection']
+
+    def __init__(self, detector, outputs=None):
+        self._detector = detector
+        self._alias = detector._alias
+        self.version = detector._ds._addon_cache.version
+        config = detector._det_config
+        self._nodes = {}
+        for typ in self._addon_types:
+            for name, item in config[typ].items():
+                self._nodes[name] = (typ, item)
+
+        if outputs is None:
+            outputs = sorted(self._nodes.keys())
+        
+        self.outputs = [name for name in outputs if name in self._nodes]
+        self.order = []
+        self.sources = []
+        visiting = set()
+        def visit(name):
+            if name in self.order:
+                return
+            if name in visiting:
+                raise ValueError('Circular AddOn definition for {:}'.format(name))
+            
+            visiting.add(name)
+            typ, item = self._nodes[name]
+            dep = item['attr']
+            if dep in self._nodes:
+                visit(dep)
+            elif dep not in self.sources:
+                self.sources.append(dep)
+
+            visiting.discard(name)
+            self.order.append(name)
+        
+        for name in self.outputs:
+            visit(name)
+
+    def _reduce(self, name, value, batch=False):
+        typ, item = self._nodes[name]
+        func = getattr(self._detector, '_reduce_'+typ)
+        if typ in self._batch_types:
+            return func(name, item, value, batch=batch)
+        
+        if batch and value is not None:
+            return np.array([func(name, item, val) for val in value])
+
+        return func(name, item, value)
+
+    def evaluate(self):
+        """
+        Evaluate plan for current event.
+
+        Returns
+        -------
+        dict
+            AddOn output values
+        """
+        values = {}
+        for source in self.sources:
+            try:
+                values[source] = getattr_complete(self._detector, source)
+            except:
+                values[source] = None
+
+        cache = self._detector._ds._addon_cache
+        for name in self.order:
+            typ, item = self._nodes[name]
+            values[name] = cache.get((self._alias, typ, name), self._reduce, 
+                                     name, values.get(item['attr']))
+        
+        return {name: values[name] for name in self.outputs}
+
+    def evaluate_batch(self, sources):
+        """
+        Evaluate plan for a batch of events.
+
+        Parameters
+        ----------
+        sources : dict
+            Source attribute arrays with a leading event axis
+            (e.g., {'calib': array with shape (N, 32, 185, 388)})
+
+        Returns
+        -------
+        dict
+            AddOn output arrays with a leading event axis
+        """
+        values = {source: sources.get(source) for source in self.sources}
+        for name in self.order:
+            typ, item = self._nodes[name]
+            values[name] = self._reduce(name, values.get(item['attr']), batch=True)
+
+        return {name: values[name] for name in self.outputs}
+
+    def __str__(self):
+        return '{:} {:} -> {:}'.format(self._alias, ', '.join(self.sources), 
+                                       ', '.join(self.order))
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
 def _repr_value(value):
     """Represent a value for use in show_info method.
     """
@@ -267,6 +582,65 @@ def _repr_value(value):
                 except:
                     return value
 
+def _config_array_keys(config):
+    """
+    ArrayStore keys referenced in nested configuration dictionary.
+    """
+    keys = []
+    if isinstance(config, dict):
+        for value in config.values():
+            keys.extend(_config_array_keys(value))
+    elif isinstance(config, (list, tuple)):
+        for value in config:
+            keys.extend(_config_array_keys(value))
+    elif isinstance(config, basestring) and config.startswith(ArrayStore.prefix):
+        keys.append(config)
+
+    return keys
+
+def _update_hash(md5, value):
+    """Update md5 hash with the content of a configuration value.
+
+    Only primitive values (None, bool, numbers and strings) and numpy arrays 
+    are hashed by value.  Functions are hashed by module and name and other 
+    objects by type and str if it does not include a memory address, so 
+    that the hash is the same for equal configurations in different 
+    processes (or for different psana objects of the same configuration).
+    """
+    if hasattr(value, '_all_values'):
+        _update_hash(md5, value._all_values)
+    elif isinstance(value, dict):
+        for key in sorted(value.keys()):
+            md5.update(str(key))
+            _update_hash(md5, value[key])
+    elif isinstance(value, (list, tuple)):
+        md5.update('[{:}]'.format(len(value)))
+        for val in value:
+            _update_hash(md5, val)
+    elif isinstance(value, np.ndarray):
+        md5.update('{:}{:}'.format(value.dtype, value.shape))
+        md5.update(np.ascontiguousarray(value).tostring())
+    elif isinstance(value, np.generic):
+        _update_hash(md5, value.item())
+    elif value is None or isinstance(value, (bool, int, long, float)):
+        md5.update(repr(value))
+    elif isinstance(value, unicode):
+        md5.update(value.encode('utf-8'))
+    elif isinstance(value, str):
+        md5.update(value)
+    elif hasattr(value, '__call__') and hasattr(value, '__name__'):
+        # functions repr includes the memory address
+        md5.update('{:}.{:}'.format(getattr(value, '__module__', ''), value.__name__))
+    else:
+        typ = type(value)
+        md5.update('<{:}.{:}>'.format(typ.__module__, typ.__name__))
+        try:
+            text = str(value)
+        except:
+            text = ''
+        if ' at 0x' not in text:
+            md5.update(text)
+
 def _is_psana_type(value):
     """True if the input is a psana data type
     """
@@ -275,57 +649,11 @@ def _is_psana_type(value):
 def _get_typ_func_attr(typ_func, attr, nolist=False):
     """Return psana functions as properties.
     """
-    value = getattr(typ_func, attr)
-    module = typ_func.__module__.lstrip('psana.')
-    type_name = typ_func.__class__.__name__
-    try: 
-        info = psana_doc_info[module][type_name].get(attr, {'unit': '', 'doc': ''}).copy()
-    except:
-        info = {'unit': '', 'doc': ''}
-
-    info['typ_func'] = typ_func
-    info['attr'] = attr
-
-    if info.get('func_shape'):
-        nvals = info.get('func_shape')
-        if isinstance(nvals, str):
-            nvals = getattr(typ_func, nvals)()[0]
-       
-        i0 = info.get('func0',0)
-        try:
-            value = [value(i+i0) for i in range(nvals)]
-        except:
-            pass
-
-    elif info.get('func_len_hex'):
-        nvals = getattr(typ_func, info.get('func_len_hex'))()
-        try:
-            value = [hex(value(i)) for i in range(nvals)]
-        except:
-            pass
-
-    elif info.get('func_len'):
-        nvals = info.get('func_len')
-        if isinstance(nvals, str):
-            nvals = getattr(typ_func, nvals)()
-        
-        try:
-            value = [value(i) for i in range(nvals)]
-        except:
-            pass
-
-    elif info.get('func_index'):
-        vals = getattr(typ_func, info.get('func_index'))()
-        try:
-            value = [value(int(i)).name for i in vals]
-        except:
-            pass
-
-    elif 'func_method' in info:
-        info['value'] = info.get('func_method')(value())
-        return info
-
+    return get_type_schema(typ_func).get_info(typ_func, attr, nolist=nolist)
 
+def _eval_typ_func_value(typ_func, info, value):
+    """Evaluate psana function value and set info['value'].
+    """
     if hasattr(value, '_typ_func') and str(value._typ_func)[0].islower():
         # evaluate as name to avoid recursive psana functions 
         if 'name' in value._attrs and 'conjugate' in value._attrs:   
@@ -367,12 +695,211 @@ def _get_typ_func_attr(typ_func, attr, nolist=False):
 
     return info
 
+_type_schemas = {}
+
+def get_type_schema(typ_func):
+    """
+    Compiled TypeSchema for the type of a psana data object.
+    Schemas are compiled once for each psana type.
+    """
+    typ = typ_func.__class__
+    schema = _type_schemas.get(typ)
+    if schema is None:
+        schema = TypeSchema(typ_func)
+        _type_schemas[typ] = schema
+
+    return schema
+
+
+class TypeSchema(object):
+    """
+    Compiled attribute extraction schema for a psana data type.
+
+    The psana_doc_info entry for the type is resolved once, and each attribute 
+    is compiled on first use into an extractor function that applies the 
+    func_shape, func_len_hex, func_len, func_index or func_method rules 
+    for that attribute.
+    
+    Scalar attributes can be read in one pass into a NumPy structured 
+    record (see record and records methods), e.g., for BLD data.
+
+    Parameters
+    ----------
+    typ_func : object
+        psana data object of the type
+    """
+
+    def __init__(self, typ_func):
+        self.module = typ_func.__module__.lstrip('psana.')
+        self.type_name = typ_func.__class__.__name__
+        doc_info = psana_doc_info.get(self.module, {}).get(self.type_name)
+        if doc_info is not None:
+            self._info = doc_info
+            type_attrs = psana_attrs.get(self.module,{}).get(self.type_name)
+            if type_attrs:
+                self.attrs = [key for key in type_attrs if key in doc_info] 
+            else:
+                self.attrs = [key for key in doc_info if not key[0].isupper()]
+        else:
+            self._info = {}
+            self.attrs = [attr for attr in dir(typ_func) if not attr.startswith('_')]
+
+        self._extractors = {}
+        self.scalar_attrs = None
+        self.dtype = None
+
+    def _compile(self, attr):
+        """
+        Compile extractor for attr.  Returns (extractor, final) where final
+        is True if the extracted value needs no further evaluation.
+        """
+        info = self._info.get(attr, {})
+        if info.get('func_shape'):
+            nvals = info.get('func_shape')
+            i0 = info.get('func0',0)
+            def extractor(typ_func):
+                value = getattr(typ_func, attr)
+                if isinstance(nvals, str):
+                    n = getattr(typ_func, nvals)()[0]
+                else:
+                    n = nvals
+                try:
+                    return [value(i+i0) for i in range(n)]
+                except:
+                    return value
+
+        elif info.get('func_len_hex'):
+            len_func = info.get('func_len_hex')
+            def extractor(typ_func):
+                value = getattr(typ_func, attr)
+                n = getattr(typ_func, len_func)()
+                try:
+                    return [hex(value(i)) for i in range(n)]
+                except:
+                    return value
+
+        elif info.get('func_len'):
+            nvals = info.get('func_len')
+            def extractor(typ_func):
+                value = getattr(typ_func, attr)
+                if isinstance(nvals, str):
+                    n = getattr(typ_func, nvals)()
+                else:
+                    n = nvals
+                try:
+                    return [value(i) for i in range(n)]
+                except:
+                    return value
+
+        elif info.get('func_index'):
+            index_func = info.get('func_index')
+            def extractor(typ_func):
+                value = getattr(typ_func, attr)
+                vals = getattr(typ_func, index_func)()
+                try:
+                    return [value(int(i)).name for i in vals]
+                except:
+                    return value
+
+        elif 'func_method' in info:
+            func_method = info.get('func_method')
+            def extractor(typ_func):
+                return func_method(getattr(typ_func, attr)())
+            
+            return extractor, True
+
+        else:
+            def extractor(typ_func):
+                return getattr(typ_func, attr)
+
+        return extractor, False
+
+    def get_info(self, typ_func, attr, nolist=False):
+        """
+        Attribute information dictionary including the evaluated value.
+        """
+        compiled = self._extractors.get(attr)
+        if compiled is None:
+            compiled = self._compile(attr)
+            self._extractors[attr] = compiled
+
+        extractor, final = compiled
+        value = extractor(typ_func)
+        info = self._info.get(attr, {'unit': '', 'doc': ''}).copy()
+        info['typ_func'] = typ_func
+        info['attr'] = attr
+        if final:
+            info['value'] = value
+            return info
+
+        return _eval_typ_func_value(typ_func, info, value)
+
+    def _compile_record(self, typ_func):
+        """
+        Find scalar numeric attributes and build record dtype.
+        """
+        formats = []
+        for attr in self.attrs:
+            info = self._info.get(attr, {})
+            if any(key in info for key in ['func_shape', 'func_len_hex', 'func_len',
+                                            'func_index', 'func_method']):
+                continue
+            try:
+                value = getattr(typ_func, attr)()
+            except:
+                continue
+            
+            if isinstance(value, (bool, int, long, float, np.number, np.bool_)):
+                formats.append((attr, np.asarray(value).dtype))
+        
+        self.scalar_attrs = [attr for attr, dtype in formats]
+        self.dtype = np.dtype(formats)
+
+    def record(self, typ_func):
+        """
+        NumPy structured record of all scalar attributes.
+        """
+        if self.dtype is None:
+            self._compile_record(typ_func)
+
+        return np.array(tuple(getattr(typ_func, attr)() for attr in self.scalar_attrs), 
+                        dtype=self.dtype)
+
+    def records(self, typ_funcs):
+        """
+        NumPy structured array of scalar attributes for list of psana 
+        data objects of the type.
+        """
+        if self.dtype is None:
+            if not typ_funcs:
+                return None
+            self._compile_record(typ_funcs[0])
+
+        return np.array([tuple(getattr(typ_func, attr)() for attr in self.scalar_attrs) \
+                         for typ_func in typ_funcs], dtype=self.dtype)
+
+    def __str__(self):
+        return '{:}.{:}'.format(self.module, self.type_name)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+def get_psmon_publish():
+    """
+    Import psmon publish with daemon client option.
+    """
+    from psmon import publish
+    publish.client_opts.daemon = True
+    return publish
+
 def psmon_publish(evt, quiet=True):
     eventCodes = evt.Evr.eventCodes
     event_info = str(evt)
     for alias in evt._attrs:
         psplots = evt._ds._device_sets.get(alias, {}).get('psplot')
         if psplots:
+            from psmon.plots import Image, XYPlot
+            publish = get_psmon_publish()
             detector = evt._dets.get(alias)
             for name, psmon_args in psplots.items():
                 eventCode = psmon_args['pubargs'].get('eventCode', None)
@@ -411,11 +938,353 @@ def psmon_publish(evt, quiet=True):
                                         ydata,
                                         **psmon_args['kwargs'])
 
-                    if psmon_fnc:
-                        #print 'publish', name, event_info, psmon_args
-                        #print psmon_fnc
-                        pub_info = publish.send(name,psmon_fnc)
-                        psmon_args['psmon_fnc'] = psmon_fnc
+                    if psmon_fnc:
+                        #print 'publish', name, event_info, psmon_args
+                        #print psmon_fnc
+                        pub_info = publish.send(name,psmon_fnc)
+                        psmon_args['psmon_fnc'] = psmon_fnc
+
+
+class EventTimeIndex(object):
+    """
+    Sorted index of the event time stamps in a run for fast event lookup.
+
+    Event times are packed into 64 bit keys ((seconds << 32) | nanoseconds) 
+    and kept in a sorted NumPy array together with the fiducials so that
+    exact, nearest and range lookups are done with np.searchsorted 
+    instead of scanning a list of time tuples.
+
+    Parameters
+    ----------
+    times : list
+        List of psana.EventTime objects -- i.e., psana.DataSource.runs().next().times()
+
+    Attributes
+    ----------
+    nevents : int
+        Number of events in index
+
+    Example
+    -------
+    ievent = ds._time_index.index(evt.EventId.EventTime)
+    ievent = ds._time_index.index((sec, nsec, fiducials))
+    """
+
+    def __init__(self, times):
+        self.nevents = len(times)
+        sec = np.empty(self.nevents, dtype=np.int64)
+        nsec = np.empty(self.nevents, dtype=np.int64)
+        fiducials = np.empty(self.nevents, dtype=np.int64)
+        for i, evt_time in enumerate(times):
+            sec[i] = evt_time.seconds()
+            nsec[i] = evt_time.nanoseconds()
+            fiducials[i] = evt_time.fiducial()
+
+        keys = (sec << 32) | nsec
+        # stable sort keeps event order for any duplicate time stamps
+        self._order = np.argsort(keys, kind='mergesort')
+        self._keys = keys[self._order]
+        self._fiducials = fiducials[self._order]
+
+    @staticmethod
+    def _time_key(evt_time):
+        """
+        Return (key, fiducial) for a psana.EventTime, a (sec, nsec[, fiducial]) 
+        tuple or a packed 64 bit time key.
+        """
+        if hasattr(evt_time, 'seconds'):
+            key = (int(evt_time.seconds()) << 32) | int(evt_time.nanoseconds())
+            return key, int(evt_time.fiducial())
+        
+        if isinstance(evt_time, tuple):
+            key = (int(evt_time[0]) << 32) | int(evt_time[1])
+            if len(evt_time) > 2 and evt_time[2] is not None:
+                return key, int(evt_time[2])
+            else:
+                return key, None
+
+        return int(evt_time), None
+
+    @staticmethod
+    def _key_nsec(key):
+        """
+        Convert packed time key to total nanoseconds.
+        """
+        return (int(key) >> 32)*1000000000 + (int(key) & 0xffffffff)
+
+    def find(self, evt_time):
+        """
+        Event index for exact time match or None if not in run.
+
+        Parameters
+        ----------
+        evt_time : object
+            psana.EventTime, (sec, nsec, fiducial) tuple or packed time key.
+            The fiducial is only compared if provided.
+        """
+        key, fiducial = self._time_key(evt_time)
+        i0 = np.searchsorted(self._keys, key, side='left')
+        i1 = np.searchsorted(self._keys, key, side='right')
+        for i in range(i0, i1):
+            if fiducial is None or self._fiducials[i] == fiducial:
+                return int(self._order[i])
+
+        return None
+
+    def index(self, evt_time):
+        """
+        Event index for exact time match.  Like list.index a ValueError 
+        is raised if the time is not in the run.
+        """
+        ievent = self.find(evt_time)
+        if ievent is None:
+            raise ValueError('{:} is not a valid event time'.format(evt_time))
+
+        return ievent
+
+    def nearest(self, evt_time):
+        """
+        Event index with time nearest to evt_time.
+        """
+        if not self.nevents:
+            return None
+
+        key, fiducial = self._time_key(evt_time)
+        i = np.searchsorted(self._keys, key)
+        icandidates = [j for j in [i-1, i] if j >= 0 and j < self.nevents]
+        knsec = self._key_nsec(key)
+        inear = min(icandidates, key=lambda j: abs(self._key_nsec(self._keys[j])-knsec))
+        return int(self._order[inear])
+
+    def range(self, start, end):
+        """
+        Event indices in time order for events with start <= time <= end.
+
+        Parameters
+        ----------
+        start : object
+            Start time (see find method for valid time formats)
+        end : object
+            End time
+        """
+        key0, fid0 = self._time_key(start)
+        key1, fid1 = self._time_key(end)
+        i0 = np.searchsorted(self._keys, key0, side='left')
+        i1 = np.searchsorted(self._keys, key1, side='right')
+        return self._order[i0:i1]
+
+    def __contains__(self, evt_time):
+        return self.find(evt_time) is not None
+
+    def __len__(self):
+        return self.nevents
+
+    def __repr__(self):
+        return '< {:}: {:} events >'.format(self.__class__.__name__, self.nevents)
+
+
+def resident_memory():
+    """
+    Resident memory of current process in MB (from /proc/self/statm).
+    Returns None if not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages*os.sysconf('SC_PAGE_SIZE')/1024.**2
+    except:
+        return None
+
+
+class EventPrefetcher(object):
+    """
+    Read-ahead prefetcher for indexed (idx) random access to events.
+
+    Upcoming events are read with psana.Run.event(time) in one reader thread 
+    so that file reading overlaps the processing of the current event.  
+    Read-ahead is single-threaded:  psana.Run is not thread-safe, so reads 
+    of the run (by the reader thread or for a miss) are serialized with 
+    a lock, and the gain comes from psana releasing the GIL while reading 
+    (see benchmark_prefetch).
+    At most depth events are requested ahead of the current event 
+    (back-pressure), requests dropped after a jump are not read, and no new 
+    reads are started while the resident memory of the process is above 
+    max_memory.
+
+    Parameters
+    ----------
+    run : object
+        psana.Run object from indexed data source 
+    times : list
+        List of psana.EventTime objects for run
+    depth : int
+        Maximum number of events to read ahead
+    max_memory : float
+        Resident memory limit [MB] above which no events are prefetched
+    """
+
+    def __init__(self, run, times, depth=8, max_memory=None):
+        import threading
+        self._run = run
+        self._times = times
+        self.depth = int(depth)
+        self.max_memory = max_memory
+        self._run_lock = threading.Lock()
+        self._cond = threading.Condition()
+        # event indexes requested but not yet started, being read and read
+        self._requests = []
+        self._reading = set()
+        self._results = {}
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+        self.throttled = 0
+        self._thread = threading.Thread(target=self._reader)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read(self, ievent):
+        with self._run_lock:
+            return self._run.event(self._times[ievent])
+
+    def _reader(self):
+        """Reader thread loop.
+        """
+        while True:
+            with self._cond:
+                while not self._requests and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                ievent = self._requests.pop(0)
+                self._reading.add(ievent)
+            
+            try:
+                evt = self._read(ievent)
+            except:
+                # read again in event method
+                evt = None
+            
+            with self._cond:
+                self._reading.discard(ievent)
+                if not self._closed:
+                    self._results[ievent] = evt
+                self._cond.notify_all()
+
+    def _fill(self, ievent):
+        """Request events after ievent up to depth.  Call with _cond acquired.
+        """
+        if self.max_memory:
+            memory = resident_memory()
+            if memory is not None and memory > self.max_memory:
+                self.throttled += 1
+                return
+
+        for i in range(ievent+1, min(ievent+1+self.depth, len(self._times))):
+            if i not in self._results and i not in self._reading and i not in self._requests:
+                self._requests.append(i)
+        
+        self._cond.notify_all()
+
+    def event(self, ievent):
+        """
+        Return psana event for event index ievent and start reading 
+        the following events.
+        """
+        with self._cond:
+            # drop requests and results outside of the read-ahead window after a jump 
+            self._requests = [i for i in self._requests if ievent < i <= ievent+self.depth]
+            for i in self._results.keys():
+                if i < ievent or i > ievent+self.depth:
+                    self._results.pop(i)
+            
+            if ievent in self._requests:
+                self._requests.remove(ievent)
+            
+            while ievent in self._reading:
+                self._cond.wait()
+            
+            evt = self._results.pop(ievent, None)
+            self._fill(ievent)
+        
+        if evt is not None:
+            self.hits += 1
+            return evt
+        else:
+            self.misses += 1
+            return self._read(ievent)
+
+    def close(self):
+        """Stop reader thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._requests = []
+            self._results = {}
+            self._cond.notify_all()
+
+    def __str__(self):
+        return 'depth={:}, hits={:}, misses={:}'.format(
+                self.depth, self.hits, self.misses)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+def benchmark_prefetch(data_source, nevents=1000, process_time=0.005, depth=8):
+    """
+    Benchmark indexed event access with and without the EventPrefetcher.
+
+    Events are read in order and a busy loop of process_time per event 
+    stands in for event processing.  The prefetcher can only give a gain 
+    if psana releases the GIL while reading.
+
+    Parameters
+    ----------
+    data_source : str or object
+        Indexed data source (e.g., 'exp=xpptut15:run=54:idx') or a run
+        object with times and event methods
+    nevents : int
+        Number of events to read
+    process_time : float
+        Processing time per event [sec]
+    depth : int
+        Prefetch depth
+
+    Returns
+    -------
+    dict
+        Time in sec for 'direct' and 'prefetch' reading and 'speedup'
+    """
+    def process():
+        time0 = time.time()
+        while time.time()-time0 < process_time:
+            pass
+
+    if isinstance(data_source, basestring):
+        ds = psana.DataSource(data_source)
+        run = ds.runs().next()
+    else:
+        run = data_source
+    
+    times = run.times()[:nevents]
+    
+    time0 = time.time()
+    for evt_time in times:
+        evt = run.event(evt_time)
+        process()
+    time_direct = time.time()-time0
+
+    prefetcher = EventPrefetcher(run, times, depth=depth)
+    time0 = time.time()
+    for ievent in range(len(times)):
+        evt = prefetcher.event(ievent)
+        process()
+    time_prefetch = time.time()-time0
+    prefetcher.close()
+
+    return {'direct': time_direct, 'prefetch': time_prefetch, 
+            'speedup': time_direct/time_prefetch, 'prefetcher': str(prefetcher)}
 
 
 class ScanData(object):
@@ -430,18 +1299,47 @@ class ScanData(object):
     ds : object
         PyDataSource.DataSource object
 
+    use_cache : bool
+        Load ScanData from the run scan cache file if it is valid for the 
+        current xtc files, and save it after building from the run otherwise.
+        Default = True
+
+    path : str
+        Path of scan cache file (default is the same path as save_config)
+
     Attributes
     ----------
     nevents : list
         Number of events for each step
 
+    Notes
+    -----
+    Building ScanData requires reading through every step of the run.
+    The result is saved in a pickled cache file (run####.scan) keyed by the 
+    experiment, run and the name, size and modification time of the xtc files.
+    Use invalidate_cache to remove the cache file, or use_cache=False to 
+    force rebuilding from the data.
+
     """
     _array_attrs = ['pvControls_value', 'pvMonitors_loValue', 'pvMonitors_hiValue']
     _uses_attrs = ['uses_duration', 'uses_events', 'uses_l3t_events']
     _npv_attrs = ['npvControls', 'npvMonitors']
+    _cache_version = 1
 
-    def __init__(self, ds):
+    def __init__(self, ds, use_cache=True, path=None):
         self._ds = ds
+        self._cache_path = path
+        if use_cache and self.load_cache():
+            return
+
+        self._build()
+        if use_cache:
+            self.save_cache()
+
+    def _build(self):
+        """Build scan information by reading the first event of each step.
+        """
+        ds = self._ds
         self._attrs = sorted(ds.configData.ControlData._all_values.keys())
         self._scanData = {attr: [] for attr in self._attrs}
         ds.reload()
@@ -450,13 +1348,12 @@ class ScanData(object):
         ievent_end = []
         ievent_start = []
         for istep, events in enumerate(ds.steps):
-            okevt = False
-            while not okevt:
+            ievent = None
+            while ievent is None:
                 evt = events.next()
                 ttup = (evt.EventId.sec, evt.EventId.nsec, evt.EventId.fiducials)
-                okevt = ttup in ds._idx_times_tuple
+                ievent = ds._time_index.find(ttup)
 
-            ievent = ds._idx_times_tuple.index(ttup)
             ievent_start.append(ievent)
             if istep > 0:
                 ievent_end.append(ievent-1)
@@ -465,7 +1362,7 @@ class ScanData(object):
             for attr in self._attrs:
                 self._scanData[attr].append(ds.configData.ControlData._all_values[attr])
         
-        ievent_end.append(len(ds._idx_times_tuple)-1)       
+        ievent_end.append(ds._time_index.nevents-1)       
         end_times = []
         for istep, ievent in enumerate(ievent_end):
             end_times.append(ds.events.next(ievent).EventId.timef64)
@@ -530,6 +1427,99 @@ class ScanData(object):
 
         ds.reload()
 
+    @property
+    def _cache_file(self):
+        """Name of scan cache file.
+        """
+        return self._ds._get_config_file(path=self._cache_path, ext='scan')
+
+    def _cache_key(self):
+        """Key to validate scan cache:  experiment, run and the 
+           (name, size, modification time) of each xtc file for the run.
+           Returns None if no xtc files are found, in which case the cache
+           cannot be validated and is not used.
+        """
+        data_source = self._ds.data_source
+        xtc_dir = data_source.dir
+        if not xtc_dir:
+            xtc_dir = '/reg/d/psdm/{:}/{:}/xtc'.format(data_source.instrument, data_source.exp)
+
+        xtc_files = glob.glob('{:}/*-r{:04}-s*.xtc'.format(xtc_dir, int(data_source.run)))
+        xtc_info = []
+        for xtc_file in sorted(xtc_files):
+            stat = os.stat(xtc_file)
+            xtc_info.append((os.path.basename(xtc_file), stat.st_size, int(stat.st_mtime)))
+
+        if not xtc_info:
+            return None
+
+        return {'version': self._cache_version,
+                'exp': data_source.exp, 
+                'run': int(data_source.run),
+                'xtc': xtc_info}
+
+    def load_cache(self):
+        """Load ScanData from cache file.
+           Returns True if a valid cache was loaded.
+        """
+        try:
+            file_name = self._cache_file
+            if not os.path.isfile(file_name):
+                return False
+
+            cache_key = self._cache_key()
+            if cache_key is None:
+                print 'ScanData cache {:} not used -- no xtc files found.'.format(file_name)
+                return False
+
+            with open(file_name, 'rb') as f:
+                cache = pickle.load(f)
+
+            if cache.get('key') != cache_key:
+                print 'ScanData cache {:} is out of date.'.format(file_name)
+                return False
+
+            self.__dict__.update(cache['attrs'])
+            return True
+
+        except Exception as err:
+            print 'Cannot load ScanData cache: ', err
+            return False
+
+    def save_cache(self):
+        """Save ScanData to cache file.
+        """
+        try:
+            file_name = self._cache_file
+            attrs = {attr: val for attr, val in self.__dict__.items() \
+                     if attr not in ['_ds', '_cache_path', '_control_format', '_name_len']}
+            cache_key = self._cache_key()
+            if cache_key is None:
+                return False
+
+            cache = {'key': cache_key, 'attrs': attrs}
+            # write to temporary file and rename so a partial file is never read
+            tmp_file = '{:}.{:}.tmp'.format(file_name, os.getpid())
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(cache, f, pickle.HIGHEST_PROTOCOL)
+            
+            os.rename(tmp_file, file_name)
+            return True
+
+        except Exception as err:
+            print 'Cannot save ScanData cache: ', err
+            return False
+
+    def invalidate_cache(self):
+        """Remove ScanData cache file.
+        """
+        try:
+            file_name = self._cache_file
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+        except Exception as err:
+            print 'Cannot remove ScanData cache: ', err
+
     def show_info(self, **kwargs):
         """Show scan information.
         """
@@ -622,6 +1612,19 @@ class DataSource(object):
     smd : bool , optional
         small data support -- default for experiments after Oct 2015 when this feature became standard 
 
+    scan_cache : bool, optional
+        Use cached ScanData if available (default = True)
+
+    prefetch : int, optional
+        Number of events to read ahead for indexed access (default = 0, no prefetch)
+
+    prefetch_memory : float, optional
+        Resident memory limit in MB above which prefetching is paused
+
+    geometry_cache : str or bool, optional
+        Path of on-disk cache of detector geometry and mask arrays shared
+        between processes (default in scratch/nc/geometry, False to disable)
+
     Attributes
     ----------
     data_source :  object
@@ -665,6 +1668,19 @@ class DataSource(object):
 
     def __init__(self, data_source=None, **kwargs):
         self._device_sets = {}
+        self._detectors = {}
+        self._config_fingerprints = {}
+        self._reused_detectors = []
+        self._ConfigData = None
+        self._integrators = {}
+        self._reduction_plans = {}
+        self._array_store = ArrayStore()
+        self._addon_cache = AddOnCache()
+        self._scan_cache = kwargs.pop('scan_cache', True)
+        self._prefetch = kwargs.pop('prefetch', 0)
+        self._prefetch_memory = kwargs.pop('prefetch_memory', None)
+        self._prefetcher = None
+        self._geometry_cache = kwargs.pop('geometry_cache', True)
         path = os.path.dirname(__file__)
         if not path:
             path = '.'
@@ -692,7 +1708,15 @@ class DataSource(object):
         self._current_run = None
         self._evt_keys = {}
         self._evt_modules = {}
+        self._key_cache = KeyLayoutCache()
         self._init_dets = []
+        # psana.Detector objects are tied to the psana.DataSource so rebuild all
+        self._detectors = {}
+        self._config_fingerprints = {}
+        self._reused_detectors = []
+        self._ConfigData = None
+        self._integrators = {}
+        self._reduction_plans = {}
         if not reload:
             self.data_source = DataSourceInfo(data_source=data_source, **kwargs)
 
@@ -757,23 +1781,45 @@ class DataSource(object):
                 self._idx_nsteps = self._idx_run.nsteps()
                 self._idx_times = self._idx_run.times()
                 self.nevents = len(self._idx_times)
-                self._idx_times_tuple = [(a.seconds(), a.nanoseconds(), a.fiducial()) \
-                                        for a in self._idx_times]
+                self._time_index = EventTimeIndex(self._idx_times)
+                self._init_prefetcher(self._idx_run, self._idx_times)
         
         else:
             # For live data or data_source without idx or smd
             self.events = Events(self)
             self.nevents = None
+            self._time_index = None
 
         return str(self.data_source)
 
+    def _set_current_evt(self, evt):
+        """Set current psana event and parse event keys.
+        """
+        self._evt_keys, self._evt_modules = self._key_cache.get_keys(evt)
+        self._current_evt = evt 
+        self._current_data = {}
+        self._current_evtData = {}
+        self._addon_cache.clear()
+
+    def _init_prefetcher(self, run, times):
+        """Start event prefetcher for indexed run if prefetch option set.
+        """
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+
+        if self._prefetch:
+            self._prefetcher = EventPrefetcher(run, times, depth=self._prefetch, 
+                    max_memory=self._prefetch_memory)
+
     def reload(self):
         """Reload the current run.
         """
         self.load_run(reload=True)
 
     def _load_ConfigData(self):
-        self._ConfigData = ConfigData(self)
+        # reuse unchanged configuration from previous ConfigData of this run 
+        self._ConfigData = ConfigData(self, previous=self._ConfigData)
 
     def to_xarray(self, **kwargs):
         """
@@ -794,6 +1840,8 @@ class DataSource(object):
         x = ds.to_xarray()
         # Takes ~30 min to create in single core.
         # Saved file 2 GB
+        # Process in 16 worker processes and merge in time order
+        x = ds.to_xarray(nworkers=16)
  
         """
         from psxarray import to_xarray
@@ -843,20 +1891,41 @@ class DataSource(object):
         """
         return self.configData.Sources
 
-    def _init_detectors(self):
+    def _init_detectors(self, reuse=False, reload=True):
         """Initialize psana.Detector classes based on psana env information.
-        """
+
+        Parameters
+        ----------
+        reuse : bool
+            Keep existing Detector objects (and their psana.Detector) for sources 
+            where the configStore data is unchanged (e.g., for a new step)
+        reload : bool
+            Reload user detector modules
+        """
+        detectors = self._detectors
+        fingerprints = self._config_fingerprints
         self._detectors = {}
+        self._config_fingerprints = {}
+        self._reused_detectors = []
         self._load_ConfigData()
         self._aliases = self.configData._aliases
         for srcstr, item in self.configData._sources.items():
             alias = item.get('alias')
-            self._add_dets(**{alias: srcstr})
+            fingerprint = self.configData._fingerprint(srcstr)
+            self._config_fingerprints[srcstr] = fingerprint
+            detector = detectors.get(alias)
+            if reuse and detector is not None and fingerprints.get(srcstr) == fingerprint:
+                detector._source = item
+                self._detectors[alias] = detector
+                self._reused_detectors.append(alias)
+            else:
+                self._add_dets(reload_modules=reload, **{alias: srcstr})
 
     def add_detector(self, srcstr=None, alias=None, module=None, path=None, 
                      #pvs=None, desc=None, parameters={}, 
                      desc=None,
                      quiet=False,
+                     reload=True,
                      **kwargs):
         """
         Add a detector 
@@ -881,6 +1950,9 @@ class DataSource(object):
         desc : str
             Description 
 
+        reload : bool
+            Reload the python module (default = True)
+
         """
         initialized = False
         if not alias:
@@ -980,7 +2052,7 @@ class DataSource(object):
                     
                 det_dict['module']['path'] = module_path
 
-                new_class = get_module(module_name, module_path, reload=True)
+                new_class = get_module(module_name, module_path, reload=reload)
 #                import_module(module_name, module_path)
 #                try:
 #                    new_class =  getattr(globals()[module_name],module_name)
@@ -1011,22 +2083,34 @@ class DataSource(object):
 #    def add_plugin(self, cls, **kwargs):
 #        self._plugins.update({cls.__name__: cls})
 
-    def _add_dets(self, **kwargs):
+    def _add_dets(self, reload_modules=True, **kwargs):
         for alias, srcstr in kwargs.items():
             try:
-                self.add_detector(srcstr, alias=alias, quiet=True)
+                self.add_detector(srcstr, alias=alias, quiet=True, reload=reload_modules)
             except Exception as err:
                 print 'Cannot add {:}:  {:}'.format(alias, srcstr) 
                 traceback.print_exc()
 
-    def _get_config_file(self, path=None):
+    def _get_config_file(self, path=None, ext='config'):
         if not path:
             path = '/reg/d/psdm/{:}/{:}/scratch/nc/'.format(self.instrument,self.experiment)
 
         if not os.path.isdir(path):
             os.mkdir(path)
 
-        return '{:}/run{:04}.config'.format(path, int(self.data_source.run))
+        return '{:}/run{:04}.{:}'.format(path, int(self.data_source.run), ext)
+
+    def _get_geometry_path(self):
+        """
+        Path of on-disk geometry cache or None if disabled.
+        """
+        if not self._geometry_cache:
+            return None
+        
+        if isinstance(self._geometry_cache, str):
+            return self._geometry_cache
+
+        return '/reg/d/psdm/{:}/{:}/scratch/nc/geometry'.format(self.instrument,self.experiment)
 
     def save_config(self, file_name=None, path=None, **kwargs):
         """
@@ -1039,10 +2123,14 @@ class DataSource(object):
         path : str
             Path of file
         """
+        import pandas as pd
         if not file_name:
             file_name = self._get_config_file(path=path)
 
         pd.DataFrame.from_dict(self._device_sets).to_json(file_name)
+        keys = _config_array_keys(self._device_sets)
+        if keys:
+            self._array_store.save(file_name+'.npz', keys=keys)
 
     def load_config(self, file_name=None, path=None, **kwargs):
         """
@@ -1055,6 +2143,7 @@ class DataSource(object):
         path : str
             Path of file
         """
+        import pandas as pd
         if not file_name:
             file_name = self._get_config_file(path=path)
 
@@ -1062,14 +2151,28 @@ class DataSource(object):
                  'roi', 'projection', 'xarray']
  
         config = pd.read_json(file_name).to_dict()
+        if os.path.isfile(file_name+'.npz'):
+            self._array_store.load(file_name+'.npz')
+        
         for alias, item in config.items():
             if alias in self._device_sets:
+                old_keys = _config_array_keys(self._device_sets[alias])
                 for attr, config_dict in item.items():
                     if isinstance(config_dict, dict):
                         self._device_sets[alias][attr].update(**config_dict)
                     else:
                         self._device_sets[alias][attr] = config_dict
+                
+                # retain arrays now referenced before releasing replaced entries
+                for key in _config_array_keys(self._device_sets[alias]):
+                    self._array_store.retain(key)
+                for key in old_keys:
+                    self._array_store.release(key)
         
+        self._array_store.prune()
+        # rebuild projection integrators from loaded masks and bins
+        self._integrators = {}
+        self._addon_cache.invalidate()
 
     def show_info(self, **kwargs):
         """
@@ -1135,6 +2238,8 @@ class Runs(object):
         """
         self._ds._ds_run = self._ds._ds.runs().next()
         self._ds_runs.append(self._ds._ds_run)
+        self._ds._time_index = EventTimeIndex(self._ds._ds_run.times())
+        self._ds._init_prefetcher(self._ds._ds_run, self._ds._ds_run.times())
         self._ds._irun +=1
         self._ds._istep = -1
         self._ds._ievent = -1
@@ -1212,11 +2317,440 @@ class Run(object):
 #            raise StopIteration()
 
 
-class RunEvents(object):
+class EventIterator(object):
+    """
+    Base class for event iterators with common batch methods.
+    """
+
+    def batches(self, size=100, attrs=None, eventCodes=None, nevents=None, **kwargs):
+        """
+        Iterate over blocks of events with detector attributes stacked 
+        into NumPy arrays of shape (size, ...).
+
+        Parameters
+        ----------
+        size : int
+            Number of events in each block (default = 100)
+        attrs : dict
+            Dictionary of detector aliases with a list of attributes to stack,
+            e.g., {'EBeam': ['ebeamL3Energy'], 'cspad': ['calib']}
+        eventCodes : list
+            Event codes for block codes array (default = all event codes in configData)
+        nevents : int
+            Maximum number of events to iterate over (default = all events)
+
+        Returns
+        -------
+        EventBatches : iterator
+            Iterator returning EventBlock objects
+
+        Example
+        -------
+        for block in ds.events.batches(size=1000, attrs={'EBeam': ['ebeamL3Energy']}):
+            energy = block.EBeam['ebeamL3Energy'][block.present['EBeam']]
+        """
+        return EventBatches(self, size=size, attrs=attrs, eventCodes=eventCodes, 
+                            nevents=nevents, **kwargs)
+
+    def filter(self, eventCodes=None, l3t=False):
+        """
+        Iterate over events that pass event code and L3 trigger selections.
+        
+        Rejected events are skipped before the event keys are parsed 
+        and before the event detectors are setup or published.
+
+        Parameters
+        ----------
+        eventCodes : list
+            Event codes required to be present.  Use negative numbers
+            for event codes required not to be present (see EvrData.present), 
+            e.g., eventCodes=[162, -41]
+        l3t : bool
+            Only accept events that pass the L3 Trigger (if in data)
+
+        Returns
+        -------
+        EventFilter : iterator
+
+        Example
+        -------
+        for evt in ds.events.filter(eventCodes=[162]):
+            ...
+        """
+        return EventFilter(self, eventCodes=eventCodes, l3t=l3t)
+
+
+class EventFilter(object):
+    """
+    Event iterator that skips events that do not pass event code 
+    and L3 trigger selections.
+
+    Parameters
+    ----------
+    events : object
+        Event iterator (e.g., ds.events)
+    eventCodes : list
+        Required event codes (negative for not present)
+    l3t : bool
+        Require L3 Trigger pass
+
+    Attributes
+    ----------
+    nread : int
+        Number of events read
+    naccepted : int
+        Number of events accepted
+    nskipped_codes : int
+        Number of events skipped for event codes
+    nskipped_noevr : int
+        Number of events skipped because no evr data is in the event
+    nskipped_l3t : int
+        Number of events skipped for L3 Trigger
+    """
+
+    def __init__(self, events, eventCodes=None, l3t=False):
+        self._events = events
+        self._ds = events._ds
+        if eventCodes is None:
+            eventCodes = []
+        elif not isinstance(eventCodes, list):
+            eventCodes = [eventCodes]
+        
+        self.eventCodes = eventCodes
+        self.l3t = l3t
+        # (type, src) of data, None if not yet looked up and False if absent
+        self._evr_key = None
+        self._l3t_key = None
+        self.nread = 0
+        self.naccepted = 0
+        self.nskipped_codes = 0
+        self.nskipped_noevr = 0
+        self.nskipped_l3t = 0
+
+    @property
+    def current(self):
+        """Current event.
+        """
+        return EvtDetectors(self._ds, init=False)
+
+    def __iter__(self):
+        return self
+
+    def _find_keys(self, evt):
+        """Find (type, src) of evr and L3T data.  
+        
+        Data are absent if there is no EvrData or L3T configuration.  
+        Otherwise the event keys are parsed (with the DataSource key layout 
+        cache) until the data is found.
+        """
+        modules = self._ds.configData._modules
+        if self._evr_key is None and 'EvrData' not in modules:
+            self._evr_key = False
+        if self._l3t_key is None and 'L3T' not in modules:
+            self._l3t_key = False
+        
+        if (self.eventCodes and self._evr_key is None) \
+                or (self.l3t and self._l3t_key is None):
+            _key_info, _modules = self._ds._key_cache.get_keys(evt)
+            if self._evr_key is None and 'EvrData' in _modules:
+                self._evr_key = _modules['EvrData'].values()[0][0][:2]
+            if self._l3t_key is None and 'L3T' in _modules:
+                self._l3t_key = _modules['L3T'].values()[0][0][:2]
+
+    def _accept(self, evt):
+        """Check event selection using psana event data.
+        """
+        if (self.eventCodes and self._evr_key is None) \
+                or (self.l3t and self._l3t_key is None):
+            self._find_keys(evt)
+        
+        if self.eventCodes:
+            if not self._evr_key:
+                self.nskipped_noevr += 1
+                return False
+
+            evr = evt.get(*self._evr_key)
+            if evr is None:
+                self.nskipped_noevr += 1
+                return False
+
+            for eventCode in self.eventCodes:
+                if (eventCode > 0 and not evr.present(eventCode)) \
+                        or (eventCode < 0 and evr.present(abs(eventCode))):
+                    self.nskipped_codes += 1
+                    return False
+
+        if self.l3t and self._l3t_key:
+            l3t = evt.get(*self._l3t_key)
+            if l3t is not None and not l3t.result():
+                self.nskipped_l3t += 1
+                return False
+
+        return True
+
+    def next(self, **kwargs):
+        """
+        Returns
+        -------
+        EventDetectors : object
+            Next event that passes selection.
+        """
+        while True:
+            evt = self._events._next_evt()
+            self.nread += 1
+            if self._accept(evt):
+                break
+
+        self.naccepted += 1
+        self._ds._set_current_evt(evt)
+        return EvtDetectors(self._ds, **kwargs)
+
+    def show_info(self, **kwargs):
+        """Show event filter counters.
+        """
+        message = Message(quiet=True, **kwargs)
+        message('{:24} {:}'.format('Event codes', self.eventCodes))
+        message('{:24} {:}'.format('L3 Trigger', self.l3t))
+        message('-'*40)
+        for attr in ['nread', 'naccepted', 'nskipped_codes', 'nskipped_noevr', 'nskipped_l3t']:
+            message('{:24} {:10}'.format(attr, getattr(self, attr)))
+
+        return message
+
+    def __str__(self):
+        return '{:} of {:} events accepted'.format(self.naccepted, self.nread)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+class EventBatches(object):
+    """
+    Iterator over blocks of events from an event iterator.
+
+    Parameters
+    ----------
+    events : object
+        Event iterator (e.g., ds.events)
+    
+    See Also
+    --------
+    EventIterator.batches
+    """
+
+    def __init__(self, events, size=100, attrs=None, eventCodes=None, nevents=None, **kwargs):
+        self._events = events
+        self._ds = events._ds
+        self.size = int(size)
+        if not attrs:
+            attrs = {}
+        
+        self.attrs = {alias: list(attr_list) for alias, attr_list in attrs.items()}
+        if eventCodes is None:
+            try:
+                eventCodes = sorted(self._ds.configData._eventcodes.keys())
+            except:
+                eventCodes = []
+        
+        self.eventCodes = list(eventCodes)
+        self._code_index = {code: i for i, code in enumerate(self.eventCodes)}
+        self.nevents = nevents
+        self._ievt = 0
+        self._done = False
+        # (shape, dtype) of each attribute once found so blocks can be preallocated
+        self._formats = {}
+
+    def __iter__(self):
+        return self
+
+    def _alloc(self, shape, dtype):
+        dtype = np.dtype(dtype)
+        if dtype.kind in 'fc':
+            return np.full((self.size,)+shape, np.nan, dtype=dtype)
+        else:
+            return np.zeros((self.size,)+shape, dtype=dtype)
+
+    def next(self):
+        """
+        Returns
+        -------
+        EventBlock : object
+            Next block of events.  The last block may have fewer than size events.
+        """
+        if self._done:
+            raise StopIteration()
+
+        size = self.size
+        block = EventBlock(size, self.eventCodes)
+        for alias, attr_list in self.attrs.items():
+            block.data[alias] = {}
+            block.present[alias] = np.zeros(size, dtype=bool)
+            for attr in attr_list:
+                fmt = self._formats.get((alias, attr))
+                if fmt:
+                    block.data[alias][attr] = self._alloc(*fmt)
+
+        iblock = 0
+        while iblock < size:
+            if self.nevents is not None and self._ievt >= self.nevents:
+                self._done = True
+                break
+            
+            try:
+                evt = self._events.next(publish=False, init=False)
+            except StopIteration:
+                self._done = True
+                break
+
+            self._ievt += 1
+            eventId = evt.EventId
+            block.sec[iblock] = eventId.sec
+            block.nsec[iblock] = eventId.nsec
+            block.fiducials[iblock] = eventId.fiducials
+            block.step[iblock] = self._ds._istep
+            block.ievent[iblock] = self._ds._ievent
+            for code in evt.Evr.eventCodes:
+                icode = self._code_index.get(code)
+                if icode is not None:
+                    block.codes[iblock, icode] = True
+
+            evt_dets = evt._attrs
+            for alias, attr_list in self.attrs.items():
+                if alias not in evt_dets:
+                    continue
+                
+                detector = evt._dets.get(alias)
+                present = True
+                for attr in attr_list:
+                    try:
+                        if attr == 'image':
+                            # copied into block so image buffer can be reused
+                            value = detector._buffered_image()
+                        else:
+                            value = getattr_complete(detector, attr)
+                    except:
+                        value = None
+
+                    if value is None:
+                        present = False
+                        continue
+
+                    value = np.asarray(value)
+                    if attr not in block.data[alias]:
+                        fmt = (value.shape, value.dtype)
+                        self._formats[(alias, attr)] = fmt
+                        block.data[alias][attr] = self._alloc(*fmt)
+
+                    try:
+                        block.data[alias][attr][iblock] = value
+                    except:
+                        print 'Cannot stack {:}.{:} with shape {:} in event {:}'.format( \
+                                alias, attr, value.shape, self._ds._ievent)
+                        present = False
+                
+                block.present[alias][iblock] = present
+            
+            iblock += 1
+
+        if iblock == 0:
+            raise StopIteration()
+
+        if iblock < size:
+            block._trim(iblock)
+
+        return block
+
+
+class EventBlock(object):
+    """
+    Block of events with detector attributes stacked into arrays with 
+    the event as the first dimension.
+
+    Attributes
+    ----------
+    nevents : int
+        Number of events in block
+    sec, nsec, fiducials : array
+        Event time stamp
+    step : array
+        Step (calib cycle) of event
+    ievent : array
+        Event index in DataSource
+    codes : array
+        Boolean array with shape (nevents, len(eventCodes)) which is True 
+        where the event code is present in the event
+    data : dict
+        Dictionary of arrays for each detector alias and attribute
+    present : dict
+        Boolean array for each detector alias which is True where the 
+        detector and all requested attributes are in the event
+    """
+
+    def __init__(self, size, eventCodes):
+        self.nevents = size
+        self.eventCodes = eventCodes
+        self.sec = np.zeros(size, dtype=np.int64)
+        self.nsec = np.zeros(size, dtype=np.int64)
+        self.fiducials = np.zeros(size, dtype=np.int64)
+        self.step = np.zeros(size, dtype=np.int32)
+        self.ievent = np.zeros(size, dtype=np.int64)
+        self.codes = np.zeros((size, len(eventCodes)), dtype=bool)
+        self.data = {}
+        self.present = {}
+
+    def _trim(self, nevents):
+        """Trim block to first nevents.
+        """
+        self.nevents = nevents
+        for attr in ['sec', 'nsec', 'fiducials', 'step', 'ievent', 'codes']:
+            setattr(self, attr, getattr(self, attr)[:nevents])
+
+        for alias, adata in self.data.items():
+            self.present[alias] = self.present[alias][:nevents]
+            for attr in adata:
+                adata[attr] = adata[attr][:nevents]
+
+    @property
+    def time(self):
+        """
+        Event times as datetime64 array.
+        """
+        return (self.sec*1000000000+self.nsec).astype('datetime64[ns]')
+
+    def code(self, code):
+        """
+        Boolean array which is True for events where event code is present.
+        """
+        return self.codes[:,self.eventCodes.index(code)]
+
+    def __len__(self):
+        return self.nevents
+
+    def __str__(self):
+        return '{:} events: {:}'.format(self.nevents, ', '.join(sorted(self.data.keys())))
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+    def __getattr__(self, attr):
+        if attr in self.data:
+            return self.data[attr]
+
+        raise AttributeError(attr)
+
+    def __dir__(self):
+        all_attrs =  set(self.data.keys() +
+                         self.__dict__.keys() + dir(EventBlock))
+        
+        return list(sorted(all_attrs))
+
+
+class RunEvents(EventIterator):
     """
     Event iterator from ds.runs() for indexed idx data 
 
     No support yet for multiple runs in a data_source
+    -- use MultiRun to process a list of runs.
     """
     def __init__(self, ds, **kwargs):
         self._kwargs = kwargs
@@ -1256,30 +2790,35 @@ class RunEvents(object):
         EventDetectors : object
         """
         try:
-            if evt_time is not None:
-                if isinstance(evt_time, int):
-                    self._ds._ievent = evt_time
-                else:
-                    self._ds._ievent = self.times.index(evt_time)
-            else:
-                self._ds._ievent += 1
-            
-            if self._ds._ievent >= len(self.times):
-                raise StopIteration()
-            else:
-                evt = self._ds._ds_run.event(self.times[self._ds._ievent]) 
-                self._ds._evt_keys, self._ds._evt_modules = get_keys(evt)
-                self._ds._current_evt = evt
-                self._ds._current_data = {}
-                self._ds._current_evtData = {}
-
+            evt = self._next_evt(evt_time=evt_time)
+            self._ds._set_current_evt(evt)
             return EvtDetectors(self._ds, **kwargs)
 
         except: 
             raise StopIteration()
 
+    def _next_evt(self, evt_time=None):
+        """
+        Next psana event without parsing the event keys.
+        """
+        if evt_time is not None:
+            if isinstance(evt_time, int):
+                self._ds._ievent = evt_time
+            else:
+                self._ds._ievent = self._ds._time_index.index(evt_time)
+        else:
+            self._ds._ievent += 1
+        
+        if self._ds._ievent >= len(self.times):
+            raise StopIteration()
+        
+        if self._ds._prefetcher is not None:
+            return self._ds._prefetcher.event(self._ds._ievent)
+        else:
+            return self._ds._ds_run.event(self.times[self._ds._ievent]) 
+
 
-class SmdEvents(object):
+class SmdEvents(EventIterator):
     """
     Event iterator for smd xtc data that iterates first over steps and then
     events in steps (to make sure configData is updated for each step since
@@ -1316,11 +2855,25 @@ class SmdEvents(object):
             If at end of step goes to next step and returns first event.
         """
         try:
-            return self._ds._current_step.next(evt_time=evt_time)
+            return self._ds._current_step.next(evt_time=evt_time, **kwargs)
+        except:
+            try:
+                self._ds.steps.next()
+                return self._ds._current_step.next(**kwargs)
+            except:
+                raise StopIteration()
+
+    def _next_evt(self):
+        """
+        Next psana event without parsing the event keys.
+        Goes to next step if at end of current step.
+        """
+        try:
+            return self._ds._current_step._next_evt()
         except:
             try:
                 self._ds.steps.next()
-                return self._ds._current_step.next()
+                return self._ds._current_step._next_evt()
             except:
                 raise StopIteration()
 
@@ -1360,7 +2913,8 @@ class Steps(object):
                 self._ds._istep +=1
                 self._ds._ds_step = self._ds._ds.steps().next()
                 self._ds_steps.append(self._ds._ds_step)
-                self._ds._init_detectors()
+                # only rebuild detectors with configuration changes
+                self._ds._init_detectors(reuse=True, reload=False)
                 self._ds._current_step = StepEvents(self._ds)
                 return self._ds._current_step
 
@@ -1368,7 +2922,7 @@ class Steps(object):
             raise StopIteration()
 
 
-class StepEvents(object):
+class StepEvents(EventIterator):
     """
     Event iterator from ds.steps().events() 
     """
@@ -1416,12 +2970,11 @@ class StepEvents(object):
                     self._ds._istep = -1
                 
                 if evt_time.__class__.__name__ == 'EventTime':
-                    # lookup event index from time tuple
-                    ttup = (evt_time.seconds(), evt_time.nanoseconds(), evt_time.fiducial())
-                    self._ds._ievent = self._ds._idx_times_tuple.index(ttup)
+                    # lookup event index from time stamp
+                    self._ds._ievent = self._ds._time_index.index(evt_time)
                 elif isinstance(evt_time, tuple):
                     # optionally accept a time tuple (seconds, nanoseconds, fiducial)
-                    self._ds._ievent = self._ds._idx_times_tuple.index(evt_time)
+                    self._ds._ievent = self._ds._time_index.index(evt_time)
                     evt_time = self._ds._idx_times[self._ds._ievent]
                 else:
                     # if an integer was passed jump to the appropriate time from 
@@ -1430,36 +2983,40 @@ class StepEvents(object):
                     evt_time = self._ds._idx_times[evt_time]
 
                 #print self._ds._ievent, evt_time.seconds(), evt_time.nanoseconds()
-                evt = self._ds._idx_run.event(evt_time) 
+                if self._ds._prefetcher is not None:
+                    evt = self._ds._prefetcher.event(self._ds._ievent)
+                else:
+                    evt = self._ds._idx_run.event(evt_time) 
                     
-                self._ds._evt_keys, self._ds._evt_modules = get_keys(evt)
-                self._ds._current_evt = evt
-                self._ds._current_data = {}
-                self._ds._current_evtData = {}
+                self._ds._set_current_evt(evt)
             
             except:
                 print evt_time, 'is not a valid event time'
         
         else:
             try:
-                if self._ds._istep == -1:
-                    # recover event and step index after previoiusly jumping to an event 
-                    self._ds._ievent = self._ds._ievent_last
-                    self._ds._istep = self._ds._istep_last
-                
-                self._ds._ievent += 1
-                evt = self._ds._ds_step.events().next()
-                self._ds._evt_keys, self._ds._evt_modules = get_keys(evt)
-                self._ds._current_evt = evt 
-                self._ds._current_data = {}
-                self._ds._current_evtData = {}
+                evt = self._next_evt()
+                self._ds._set_current_evt(evt)
             except:
                 raise StopIteration()
 
         return EvtDetectors(self._ds, **kwargs)
 
+    def _next_evt(self):
+        """
+        Next psana event in step without parsing the event keys.
+        """
+        if self._ds._istep == -1:
+            # recover event and step index after previoiusly jumping to an event 
+            self._ds._ievent = self._ds._ievent_last
+            self._ds._istep = self._ds._istep_last
+        
+        evt = self._ds._ds_step.events().next()
+        self._ds._ievent += 1
+        return evt
+
 
-class Events(object):
+class Events(EventIterator):
     """
     Event iterator
     """
@@ -1487,18 +3044,22 @@ class Events(object):
             Returns next event in DataSource.  
         """
         try:
-            self._ds._ievent += 1
-            evt = self._ds._ds.events().next()
-            self._ds._evt_keys, self._ds._evt_modules = get_keys(evt)
-            self._ds._current_evt = evt 
-            self._ds._current_data = {}
-            self._ds._current_evtData = {}
+            evt = self._next_evt()
+            self._ds._set_current_evt(evt)
 
         except:
             raise StopIteration()
 
         return EvtDetectors(self._ds, **kwargs)
 
+    def _next_evt(self):
+        """
+        Next psana event without parsing the event keys.
+        """
+        evt = self._ds._ds.events().next()
+        self._ds._ievent += 1
+        return evt
+
 
 class PsanaTypeList(object):
     """
@@ -1591,43 +3152,57 @@ class PsanaTypeList(object):
 class PsanaTypeData(object):
     """
     Python representation of a psana data object (event or configStore data).
+
+    Attribute values are evaluated from the psana object on first access 
+    and memoized.  The _attr_info, _values and _all_values properties and
+    show_info evaluate all attributes.
     """
 
     def __init__(self, typ_func, nolist=False):
-        if typ_func:
-            self._typ_func = typ_func
-            module = typ_func.__module__.lstrip('psana.')
-            type_name = typ_func.__class__.__name__
-        else:
-            type_name = None
+        self._typ_func = typ_func
         self._nolist = nolist
-
-        if type_name in psana_doc_info[module]:
-            self._info = psana_doc_info[module][type_name].copy()
-            if psana_attrs.get(module,{}).get(type_name):
-                self._attrs = [key for key in psana_attrs[module][type_name] if key in self._info.keys()] 
-            else:
-                self._attrs = [key for key in self._info.keys() if not key[0].isupper()]
-            
-            #print module,        
- 
-        else:
-            self._attrs = [attr for attr in dir(typ_func) if not attr.startswith('_')]
-            self._info = {}
-
-        self._attr_info = {}
-        for attr in self._attrs:
-            self._attr_info[attr] = _get_typ_func_attr(typ_func, attr, nolist=nolist)
+        self._schema = get_type_schema(typ_func)
+        self._info = self._schema._info
+        self._attrs = list(self._schema.attrs)
+        self._attr_cache = {}
         
 #        self._attr_info_new = {}
 #        for attr in self._attrs_new:
 #            self._attr_info_new[attr] = _get_typ_func_attr(typ_func, attr, nolist=nolist)
 
+    def _get_info(self, attr):
+        """
+        Attribute information including value -- evaluated on first access.
+        """
+        info = self._attr_cache.get(attr)
+        if info is None:
+            info = self._schema.get_info(self._typ_func, attr, nolist=self._nolist)
+            self._attr_cache[attr] = info
+
+        return info
+
+    @property
+    def _record(self):
+        """
+        NumPy structured record of scalar attributes.
+        """
+        return self._schema.record(self._typ_func)
+
+    @property
+    def _attr_info(self):
+        """
+        Attribute information for all attributes.
+        """
+        for attr in self._attrs:
+            self._get_info(attr)
+
+        return self._attr_cache
+
     @property
     def _values(self):
         """Dictionary of attributes: values. 
         """
-        return {attr: self._attr_info[attr]['value'] for attr in self._attrs}
+        return {attr: self._get_info(attr)['value'] for attr in self._attrs}
 
     @property
     def _all_values(self):
@@ -1676,7 +3251,7 @@ class PsanaTypeData(object):
 
     def __getattr__(self, attr):
         if attr in self._attrs:
-            return self._attr_info[attr]['value']
+            return self._get_info(attr)['value']
 
     def __dir__(self):
         all_attrs = set(self._attrs +
@@ -1799,6 +3374,16 @@ class ConfigData(object):
     Parameters
     ----------
     ds : DataSource object
+    previous : ConfigData object, optional
+        ConfigData from the previous step.  If only sources without Partition, 
+        Alias or EvrData configuration have changed, the source information 
+        is reused from previous and only the ControlData is updated. 
+
+    Attributes
+    ----------
+    changed_sources : list
+        Sources (srcstr) with configStore data that changed from previous
+        (all sources if previous not provided).
     """
     _configStore_attrs = ['get','put','keys']
     # Alias default provides way to keep aliases consistent for controls devices like the FEE_Spec
@@ -1809,7 +3394,10 @@ class ConfigData(object):
             'BldInfo(MFX-BEAMMON-01)':  'MfxBeammon',
             }
 
-    def __init__(self, ds):
+    # Config modules used to build the source information
+    _source_modules = ['Partition', 'Alias', 'EvrData']
+
+    def __init__(self, ds, previous=None):
         configStore = ds.env().configStore()
         if (hasattr(ds, 'data_source') and ds.data_source.monshmserver):
             self._monshmserver = ds.data_source.monshmserver
@@ -1818,15 +3406,101 @@ class ConfigData(object):
        
         self._ds = ds
         self._configStore = configStore
+        self._fingerprints = {}
         self._key_info, self._modules = get_keys(configStore)
 
         # Build _config dictionary for each source
         self._config = {}
+        self._config_fingerprints = {}
         for attr, keys in self._key_info.items():
             config = PsanaSrcData(self._configStore, attr, 
                                   key_info=self._key_info, nolist=True)
+            fingerprint = self._config_fingerprint(attr, config)
+            self._config_fingerprints[attr] = fingerprint
+            if previous is not None \
+                    and previous.__dict__.get('_config_fingerprints', {}).get(attr) == fingerprint:
+                # keep previous object with any already evaluated values
+                config = previous._config[attr]
+            
             self._config[attr] = config
 
+        if previous is not None and '_config_fingerprints' in previous.__dict__:
+            fingerprints = previous._config_fingerprints
+            self.changed_sources = sorted(set( \
+                    [srcstr for srcstr, fingerprint in self._config_fingerprints.items() \
+                        if fingerprints.get(srcstr) != fingerprint] + 
+                    [srcstr for srcstr in fingerprints if srcstr not in self._config_fingerprints]))
+        else:
+            self.changed_sources = sorted(self._config_fingerprints.keys())
+        
+        if self._can_update(previous):
+            self._update_sources(previous)
+        elif self._build_sources() is False:
+            return
+
+        self._load_control_data()
+
+    def _config_fingerprint(self, srcstr, config):
+        """
+        Hash of configStore data types and values for a source.
+
+        Scalar attributes of each type are read in one pass as a TypeSchema 
+        record.  Array and nested type attributes (e.g., ControlData pvControls, 
+        EvrData eventcodes) are hashed by value.  These values are memoized 
+        in the PsanaTypeData so they are not evaluated again on use.
+        """
+        md5 = hashlib.md5()
+        for typ, src, key in self._key_info.get(srcstr, []):
+            md5.update('{:}.{:}:{:}'.format(typ.__module__, typ.__name__, key))
+        for type_alias in sorted(config._types):
+            type_data = config._types[type_alias]
+            md5.update(type_alias)
+            try:
+                md5.update(type_data._record.tostring())
+                scalar_attrs = type_data._schema.scalar_attrs
+                _update_hash(md5, {attr: type_data._get_info(attr)['value'] \
+                                   for attr in type_data._attrs if attr not in scalar_attrs})
+            except:
+                # treat as changed if config cannot be read
+                md5.update(repr(time.time()))
+
+        return md5.hexdigest()
+
+    def _can_update(self, previous):
+        """
+        True if source information from previous ConfigData can be reused.
+        """
+        if previous is None or '_sources' not in previous.__dict__ \
+                or '_config_fingerprints' not in previous.__dict__:
+            return False
+
+        if set(previous._config_fingerprints) != set(self._config_fingerprints):
+            return False
+
+        for module in self._source_modules:
+            for type_name, keys in self._modules.get(module, {}).items():
+                for typ, src, key in keys:
+                    if str(src) in self.changed_sources:
+                        return False
+
+        return True
+
+    def _update_sources(self, previous):
+        """
+        Reuse source information from previous ConfigData.
+        """
+        attrs = ['_partition', '_srcAlias', '_aliases', '_sources', '_readoutGroup',
+                 '_bldMask', '_ipAddrPartition', '_config_srcs', 
+                 '_output_maps', '_evr_pulses', '_eventcodes', '_IOCconfig_type', 
+                 'Partition']
+        for attr in attrs:
+            if attr in previous.__dict__:
+                setattr(self, attr, previous.__dict__[attr])
+
+    def _build_sources(self):
+        """
+        Build source information from Partition, Alias and EvrData configuration.
+        """
         self._sources = {}
         #Setup Partition
         if not self._modules.get('Partition'):
@@ -1851,7 +3525,7 @@ class ConfigData(object):
 
         elif len(self._modules['Partition']) != 1:
             print 'ERROR:  More than one Partition config type in configStore data.'
-            return
+            return False
         else:
             #Build _partition _srcAlias _readoutGroup dictionaries based on Partition configStore data. 
             type_name = self._modules.get('Partition').keys()[0]
@@ -1863,7 +3537,7 @@ class ConfigData(object):
             else:
                 print 'ERROR:  More that one Partition module in configStore data.'
                 print '       ', self._modules['Partition'][type_name]
-                return
+                return False
 
     # to convert ipAddr int to address 
     # import socket, struct
@@ -2018,7 +3692,10 @@ class ConfigData(object):
                         if srcstr in self._sources:
                             self._sources[srcstr]['eventCode'] = item['eventCodes'][0]
 
-        # Get control data
+    def _load_control_data(self):
+        """
+        Get ControlData and SmlData.
+        """
         if self._modules.get('ControlData'):
             type_name, keys = self._modules['ControlData'].items()[0]
             typ, src, key = keys[0]
@@ -2032,6 +3709,25 @@ class ConfigData(object):
             config = self._config[str(src)]
             self._smlData = config._values
 
+    def _fingerprint(self, srcstr):
+        """
+        Hash of the configStore data and source information for a source
+        used to check if a source configuration has changed.
+        Based on the full content hash of the configStore data 
+        (see _config_fingerprint), so Detectors are rebuilt for a step 
+        if any array or nested config value has changed.
+        """
+        fingerprint = self._fingerprints.get(srcstr)
+        if fingerprint is None:
+            md5 = hashlib.md5()
+            md5.update(self._config_fingerprints.get(srcstr, ''))
+            _update_hash(md5, {attr: val for attr, val in self._sources.get(srcstr, {}).items() \
+                               if attr != 'src'})
+            fingerprint = md5.hexdigest()
+            self._fingerprints[srcstr] = fingerprint
+
+        return fingerprint
+
     @property
     def Sources(self):
         """
@@ -2060,7 +3756,7 @@ class ConfigData(object):
             return None
 
         if self._ds._scanData is None:
-            self._ds._scanData = ScanData(self._ds)
+            self._ds._scanData = ScanData(self._ds, use_cache=self._ds._scan_cache)
 
         return self._ds._scanData
 
@@ -2666,6 +4362,9 @@ class Detector(object):
     src = ''
     _pydet = None
     _pydet_name = None
+    _calib_cache = None
+    _calib_cache_key = None
+    _geometry_cache = None
     _init = False
     _xarray_init = False
 
@@ -3189,7 +4888,19 @@ class Detector(object):
             if self._alias not in self._ds._current_data:
                 #opts = self._det_config.get('opts', {})
                 #self._ds._current_data.update({self._alias: self._det_class(self._pydet, self._ds._current_evt, opts=opts)})
-                self._ds._current_data.update({self._alias: self._det_class(self._pydet, self._ds._current_evt)})
+                if self._det_class == ImageData:
+                    try:
+                        assembler = self.calibData.image_assembler()
+                        buffers = self._get_calib_cache().setdefault('image_buffers', {})
+                    except:
+                        assembler = None
+                        buffers = None
+                    data = ImageData(self._pydet, self._ds._current_evt, 
+                                     assembler=assembler, buffers=buffers)
+                else:
+                    data = self._det_class(self._pydet, self._ds._current_evt)
+                
+                self._ds._current_data.update({self._alias: data})
              
             return self._ds._current_data.get(self._alias)
 
@@ -3202,10 +4913,47 @@ class Detector(object):
         Calibration data using psana.Detector class
         """
         if self._pydet:
-            return self._calib_class(self._pydet, self._ds._current_evt)
+            if isinstance(self._calib_class, type) and issubclass(self._calib_class, ImageCalibData):
+                return self._calib_class(self._pydet, self._ds._current_evt, 
+                                         cache=self._get_calib_cache(),
+                                         geometry=self._geometry_cache)
+            else:
+                return self._calib_class(self._pydet, self._ds._current_evt)
         else:
             return None
 
+    def _get_calib_cache(self):
+        """
+        Cache of calibration constants for current run and calib directory.
+        """
+        try:
+            runnum = self._ds._current_evt.run()
+        except:
+            runnum = self._ds.data_source.run
+        
+        key = (runnum, self._ds.calibDir)
+        if self._calib_cache is None or key != self._calib_cache_key:
+            self._calib_cache = {}
+            self._calib_cache_key = key
+            self._geometry_cache = None
+            path = self._ds._get_geometry_path()
+            if path:
+                try:
+                    self._geometry_cache = GeometryCache(self._ds.calibDir, 
+                            self._det_config['srcname'], runnum, path)
+                except Exception as err:
+                    print 'Cannot use geometry cache for {:}: {:}'.format(self._alias, err)
+
+        return self._calib_cache
+
+    def clear_calib_cache(self):
+        """
+        Clear cached calibration constants.
+        """
+        self._calib_cache = None
+        self._calib_cache_key = None
+        self._geometry_cache = None
+
     def set_cmpars(self, cmpars):
         """
         Set common mode.
@@ -3215,6 +4963,7 @@ class Detector(object):
         
         # reset current data
         self._ds._current_data = {}
+        self._ds._addon_cache.clear()
         # save opts for calib object
         self._det_config['opts']['calib'].update({'cmpars': cmpars})
         self._pydet.calib(self._ds._current_evt, cmpars=cmpars)
@@ -3228,21 +4977,33 @@ class Detector(object):
             #img = getattr(self, item['attr'])
             #img = self._getattr(item['attr'])
             img = getattr_complete(self, item['attr'])
-            if img is not None:
-                roi = item['roi']
-                if len(img.shape) == 1:
-                    return img[roi[0]:roi[1]]
-
-                sensor = item.get('sensor')
-                if sensor is not None:
-                    img = img[sensor]
-                    
-                return img[roi[0][0]:roi[0][1],roi[1][0]:roi[1][1]]
-            else:
-                return None
+            return self._reduce_roi(attr, item, img)
         else:
             return None
 
+    def _reduce_roi(self, attr, item, img, batch=False):
+        """
+        Apply roi as defined by AddOn to img 
+        (with leading event axis if batch).
+        """
+        if img is None:
+            return None
+
+        if batch:
+            lead = (slice(None),)
+        else:
+            lead = ()
+        
+        roi = item['roi']
+        if len(img.shape)-len(lead) == 1:
+            return img[lead+(slice(roi[0],roi[1]),)]
+
+        sensor = item.get('sensor')
+        if sensor is not None:
+            img = img[lead+(sensor,)]
+            
+        return img[lead+(slice(roi[0][0],roi[0][1]),slice(roi[1][0],roi[1][1]))]
+
     @property
     def psplots(self):
         """
@@ -3278,16 +5039,31 @@ class Detector(object):
             #img = getattr(self, item['attr'])
             #img = self._getattr(item['attr'])
             img = getattr_complete(self, item['attr'])
-            gain = item.get('gain', 1.)
-            limits = item.get('limits')
-            if limits:
-                return img[(img >= limits[0]) & (img < limits[1])].sum()*gain
-            else:
-                return img.sum()*gain
+            return self._reduce_count(attr, item, img)
 
         else:
             return None
 
+    def _reduce_count(self, attr, item, img, batch=False):
+        """
+        Sum img as defined by count AddOn (for each event if batch).
+        """
+        if img is None:
+            return None
+
+        gain = item.get('gain', 1.)
+        limits = item.get('limits')
+        if batch:
+            axes = tuple(range(1, len(img.shape)))
+            if limits:
+                img = np.where((img >= limits[0]) & (img < limits[1]), img, 0)
+            return img.sum(axis=axes)*gain
+
+        if limits:
+            return img[(img >= limits[0]) & (img < limits[1])].sum()*gain
+        else:
+            return img.sum()*gain
+
     def _get_histogram(self, attr):
         """
         Returns histogram as defined by AddOn.
@@ -3295,14 +5071,23 @@ class Detector(object):
         if attr in self._det_config['histogram']:
             item = self._det_config['histogram'][attr]
             img = getattr_complete(self, item['attr'])
-            gain = item.get('gain', 1.)
-            hst, hbins = np.histogram(img*gain, item.get('bins'), 
-                    weights=item.get('weights'), density=item.get('density'))
-
-            return hst
+            return self._reduce_histogram(attr, item, img)
         else:
             return None
 
+    def _reduce_histogram(self, attr, item, img):
+        """
+        Histogram of img as defined by histogram AddOn.
+        """
+        if img is None:
+            return None
+
+        gain = item.get('gain', 1.)
+        hst, hbins = np.histogram(img*gain, item.get('bins'), 
+                weights=item.get('weights'), density=item.get('density'))
+
+        return hst
+
     def _get_peak(self, attr):
         """
         Returns peak information as defined in AddOn class.
@@ -3315,17 +5100,27 @@ class Detector(object):
         if attr in self._det_config['peak']:
             item = self._det_config['peak'][attr]
             wf = getattr(self, item['attr'])
+            return self._reduce_peak(attr, item, wf)
+
+        return None
+
+    def _reduce_peak(self, attr, item, wf):
+        """
+        Peak of waveform wf as defined by peak AddOn.
+        """
+        if wf is not None:
             ichannel = item.get('ichannel')
             if ichannel is not None:
                 wf = wf[ichannel]
 
+            # do not modify wf in place since it may be a shared cached result
             background = item.get('background')
             if background:
-                wf -= background
+                wf = wf - background
 
             scale = item.get('scale')
             if scale:
-                wf *= scale
+                wf = wf * scale
 
             method = item.get('method')
             if method == 'waveform':
@@ -3373,27 +5168,83 @@ class Detector(object):
         #img = getattr(self, item['attr'])
         img = getattr_complete(self, item['attr'])
         #img = self._getattr(item['attr'])
+        return self._reduce_projection(attr, item, img)
+
+    def _reduce_projection(self, attr, item, img, batch=False):
+        """
+        Projection of img as defined by projection AddOn 
+        (with leading event axis if batch).
+        """
         if img is None:
             return None
 
         axis = item['axis']
         if axis in ['r', 'az']:
-            # make a radial histogram
-            coord_compressed = item['coord_compressed']
-            mask = item['mask']
-            bins = item['bins']
-            norm = item['norm']
-            # make masked image with mask compressed
-            img_compressed = np.ma.masked_array(img, mask).compressed()
-            hst, hbins  = np.histogram(coord_compressed, bins=bins, weights=img_compressed)
-            return hst/norm
+            # make a radial histogram with precomputed pixel bins
+            integrator = self._get_integrator(attr)
+            if batch:
+                hst = integrator.integrate_batch(img)
+            else:
+                hst = integrator.integrate(img)
+            return hst/item['norm']
             
         else:
             # perform method on oposite axis where psana convention is images have coordinates (x, y)
             iaxis = {'x': 0, 'y': 1}.get(axis,0)
+            if batch:
+                iaxis += 1
             method = item.get('method', 'sum')
             return getattr(img, method)(axis=iaxis)
 
+    def reduction_plan(self, outputs=None):
+        """
+        ReductionPlan to compute AddOn outputs.
+        The plan is rebuilt when AddOn definitions change.
+
+        Parameters
+        ----------
+        outputs : list, optional
+            Names of AddOn outputs to compute (default = all AddOns)
+        """
+        if outputs is not None:
+            outputs = tuple(outputs)
+
+        key = (self._alias, outputs)
+        plan = self._ds._reduction_plans.get(key)
+        if plan is None or plan.version != self._ds._addon_cache.version \
+                or plan._detector is not self:
+            plan = ReductionPlan(self, outputs=outputs)
+            self._ds._reduction_plans[key] = plan
+
+        return plan
+
+    def _get_integrator(self, attr):
+        """
+        Get PolarIntegrator for radial or azimuthal projection defined by AddOn.
+        
+        Parameters
+        ----------
+        attr : str
+            Projection name
+        """
+        key = (self._alias, attr)
+        integrator = self._ds._integrators.get(key)
+        if integrator is None:
+            item = self._det_config['projection'].get(attr)
+            calibData = self.calibData
+            coords_x = calibData.coords_x
+            coords_y = calibData.coords_y
+            if item['axis'] == 'r':
+                coords = np.sqrt(coords_y**2+coords_x**2)
+            else:
+                coords = np.degrees(np.arctan2(coords_y, coords_x))
+            
+            mask = self._ds._array_store.resolve(item['mask'])
+            integrator = PolarIntegrator(coords, item['bins'], mask=mask)
+            self._ds._integrators[key] = integrator
+
+        return integrator
+
     def _get_property(self, attr):
         """
         Get property as defined by AddOn.
@@ -3408,6 +5259,18 @@ class Detector(object):
             func_name = func_name(self)
         return func_name
 
+    def _buffered_image(self):
+        """
+        Image assembled into a buffer that is reused for every event.
+        Only for callers that copy the image before the next event 
+        (e.g., to_xarray and EventBatches) -- otherwise use image.
+        """
+        data = getattr(self, self._tabclass)
+        if isinstance(data, ImageData):
+            return data._buffered_image()
+
+        return self.image
+
     def __str__(self):
         return '{:} {:}'.format(self._alias, str(self._ds.events.current))
 
@@ -3424,20 +5287,10 @@ class Detector(object):
         if attr in self._det_config['property']:
             return self._get_property(attr)
             
-        if attr in self._det_config['count']:
-            return self._get_count(attr)
-
-        if attr in self._det_config['histogram']:
-            return self._get_histogram(attr)
-
-        if attr in self._det_config['roi']:
-            return self._get_roi(attr)
-       
-        if attr in self._det_config['peak']:
-            return self._get_peak(attr)
-       
-        if attr in self._det_config['projection']:
-            return self._get_projection(attr)
+        for typ in ['count', 'histogram', 'roi', 'peak', 'projection']:
+            if attr in self._det_config[typ]:
+                return self._ds._addon_cache.get((self._alias, typ, attr), 
+                                                 getattr(self, '_get_'+typ), attr)
 
         if attr in self._ds.events.current._event_attrs:
             return getattr(self._ds.events.current, attr)
@@ -3528,6 +5381,7 @@ class AddOn(object):
         >>> evt.acqiris.add.parameter(**params)
 
         """
+        self._ds._addon_cache.invalidate()
         for param, value in kwargs.items():
             self._det_config['parameter'][param] = value 
 
@@ -3612,6 +5466,7 @@ class AddOn(object):
             Make psplot of roi data
  
         """
+        self._ds._addon_cache.invalidate()
         _methods = ['sum', 'mean', 'std', 'min', 'max', 'var']
         _cartesian_axes = ['x', 'y']
         _polar_axes = ['r', 'az']
@@ -3717,8 +5572,10 @@ class AddOn(object):
 
                     bins = np.arange(-180., 180., bin_size)
 
-            coord_compressed = coord_hist.compressed()
-            norm, hbins = np.histogram(coord_compressed, bins=bins)
+            integrator = PolarIntegrator(coord_hist.data, bins, mask=mask)
+            self._ds._integrators[(self._alias, name)] = integrator
+            norm = integrator.counts
+            hbins = integrator.edges
             if method != 'norm':
                 norm = 1.
             
@@ -3727,6 +5584,10 @@ class AddOn(object):
             
             projaxis = (hbins[1:]+hbins[0:-1])/2.
             self._det_config['xarray']['coords'].update({axis_name: projaxis})
+            
+            # release arrays of projection being replaced
+            for key in _config_array_keys(self._det_config['projection'].get(name, {})):
+                self._ds._array_store.release(key)
 
             self._det_config['xarray']['dims'].update(
                     {name: ([axis_name], (projaxis.size))})
@@ -3736,8 +5597,7 @@ class AddOn(object):
                             'axis': axis, 
                             'method': method,
                             'axis_name': axis_name,
-                            'coord_compressed': coord_compressed,
-                            'mask': mask,
+                            'mask': self._ds._array_store.add(mask),
                             'bins': bins,
                             'rmin': rmin,
                             'rmax': rmax,
@@ -3810,6 +5670,7 @@ class AddOn(object):
             Make projection(s) of data.  See projection method. 
         
         """
+        self._ds._addon_cache.invalidate()
         if not attr:
             if sensor is not None:
                 attr = 'calib'
@@ -3822,6 +5683,7 @@ class AddOn(object):
                 if sensor is not None:
                     img = img[sensor]
 
+                import matplotlib.pyplot as plt
                 plotMax = np.percentile(img, 99.5)
                 plotMin = np.percentile(img, 5)
                 print 'using the 5/99.5% as plot min/max: (',plotMin,',',plotMax,')'
@@ -3830,7 +5692,7 @@ class AddOn(object):
                 plt.subplot(gs[0]).imshow(img,clim=[plotMin,plotMax],interpolation='None')
 
                 print 'Select two points to form ROI to zoom in on target location.'
-                p = np.array(ginput(2))
+                p = np.array(plt.ginput(2))
                 roi = ([int(p[:,1].min()),int(p[:,1].max())],
                        [int(p[:,0].min()),int(p[:,0].max())])
                 print 'Selected ROI [y, x] =', roi
@@ -3941,6 +5803,7 @@ class AddOn(object):
             roi method then acts on this reduced data
         
         """
+        self._ds._addon_cache.invalidate()
         if gain:
             if not unit:
                 unit = 'ADUx{:.2g}'.format(gain)
@@ -4038,6 +5901,7 @@ class AddOn(object):
         np.histogram
 
         """
+        self._ds._addon_cache.invalidate()
 #        range : (float, float), optional
 #            The lower and upper range of the bins.  If not provided, range
 #            is simply ``(a.min(), a.max())``.  Values outside the range are
@@ -4150,6 +6014,7 @@ class AddOn(object):
             Units of peaks data [Default assumes same as attr data]
  
         """
+        self._ds._addon_cache.invalidate()
         
         if not attr:
             if self._det._pydet_name == 'WFDetector':
@@ -4523,6 +6388,7 @@ class AddOn(object):
                 self._det_config['psplot'] = {}
 
             self._det_config['psplot'][name] = plt_args
+            publish = get_psmon_publish()
             if not publish.initialized:
                 publish.init(local=local)
             
@@ -4874,6 +6740,13 @@ class ImageData(object):
        
     Attributes come from psana.Detector with low level implementation 
     done in C++ or python.  Boost is used for the C++.
+
+    If an ImageAssembler is provided (see ImageCalibData.image_assembler),
+    images are assembled with numpy from the pixel index maps instead of 
+    with psana.Detector.image.  The image attribute is a new array for 
+    each event.  If buffers (a dict owned by the Detector) is also provided, 
+    internal callers that copy the image before the next event can assemble 
+    it into a buffer that is reused for every event (see _buffered_image).
     """
     _attrs = ['image', 'raw', 'calib', 'shape', 'size'] 
     _attr_info = {
@@ -4890,10 +6763,12 @@ class ImageData(object):
             } 
 
     #def __init__(self, det, evt, opts={}):
-    def __init__(self, det, evt):
+    def __init__(self, det, evt, assembler=None, buffers=None):
         self._evt = evt
         self._det = det
         self._data = {}
+        self._assembler = assembler
+        self._buffers = buffers
         #self._opts = opts
 
     @property
@@ -4903,7 +6778,7 @@ class ImageData(object):
         """
         return self._det.instrument()
 
-    def make_image(self, nda):
+    def make_image(self, nda, out=None):
         """
         Make an image from the input numpy array based on the 
         geometry in the calib directory for this event.
@@ -4912,9 +6787,46 @@ class ImageData(object):
         ----------
         nda : np.array
             input array
+        out : np.array, optional
+            Output image buffer (used when assembled with ImageAssembler),
+            which is overwritten by each call with the same buffer.
         """
+        if self._assembler is not None and nda is not None \
+                and np.size(nda) == self._assembler._flat.size:
+            return self._assembler.image(nda, out=out)
+        
         return self._det.image(self._evt, nda)
 
+    def _image_buffer(self, nda):
+        """
+        Reusable image buffer for the dtype of the assembled image of nda.
+        """
+        if self._buffers is None or nda is None:
+            return None
+
+        if self._assembler.binning == 1:
+            dtype = np.asarray(nda).dtype
+        else:
+            dtype = np.dtype(float)
+        
+        out = self._buffers.get(dtype)
+        if out is None or out.shape != self._assembler.shape:
+            out = np.zeros(self._assembler.shape, dtype=dtype)
+            self._buffers[dtype] = out
+
+        return out
+
+    def _buffered_image(self):
+        """
+        Image assembled into the reused image buffer.  The image is 
+        overwritten by the next event so it must be copied to keep it.
+        """
+        if 'image' in self._data or self._buffers is None:
+            return self.image
+
+        calib = self.calib
+        return self.make_image(calib, out=self._image_buffer(calib))
+
     def common_mode_correction(self, nda):
         """
         Return the common mode correction for the input numpy 
@@ -4974,7 +6886,10 @@ class ImageData(object):
             if attr not in self._data:
 #                opts = self._opts.get(attr, {})
 #                self._data.update({attr: getattr(self._det, attr)(self._evt, **opts)})
-                self._data.update({attr: getattr(self._det, attr)(self._evt)})
+                if attr == 'image' and self._assembler is not None:
+                    self._data.update({attr: self.make_image(self.calib)})
+                else:
+                    self._data.update({attr: getattr(self._det, attr)(self._evt)})
              
             return self._data.get(attr)
 
@@ -4988,6 +6903,19 @@ class ImageData(object):
 class ImageCalibData(object):
     """
     Calibration Data from psana Detector object.
+
+    Parameters
+    ----------
+    det : object
+        psana.Detector object
+    evt : object
+        psana event
+    cache : dict, optional
+        Cache of run constant calibration data (see Detector.calibData).
+        Cached arrays are shared and are returned as read-only views.
+    geometry : object, optional
+        psgeometry.GeometryCache on-disk cache of geometry and mask arrays
+        shared between processes.
     """
 
     _attrs = ['shape', 'size', 'ndim', 'pedestals', 'rms', 'gain', 'bkgd', 'status',
@@ -4996,6 +6924,11 @@ class ImageCalibData(object):
               'coords_x', 'coords_y', 'coords_z', 
               'image_xaxis', 'image_yaxis',
               ] 
+    # common mode parameters can be changed with Detector.set_cmpars
+    _uncached_attrs = ['common_mode']
+    _geometry_attrs = ['areas', 'indexes_x', 'indexes_y', 
+                       'coords_x', 'coords_y', 'coords_z', 
+                       'image_xaxis', 'image_yaxis', 'mask', 'mask_geo']
     _attr_info = {
             'runnum':      {'doc': 'Run number',
                             'unit': ''},
@@ -5037,10 +6970,42 @@ class ImageCalibData(object):
                             'unit': 'um'},
             } 
 
-    def __init__(self, det, evt):
+    def __init__(self, det, evt, cache=None, geometry=None):
         self._evt = evt
         self._det = det
         self._info = {}
+        self._cache = cache
+        self._geometry = geometry
+
+    def _get_cached(self, key, func, *args, **kwargs):
+        """
+        Return value of psana.Detector method from cache if available.
+        """
+        if self._cache is None:
+            return func(self._evt, *args, **kwargs)
+
+        if key in self._cache:
+            return self._cache[key]
+
+        if isinstance(key, tuple):
+            attr = key[0]
+        else:
+            attr = key
+
+        if self._geometry is not None and attr in self._geometry_attrs:
+            value = self._geometry.load(attr, **kwargs)
+            if value is None:
+                value = func(self._evt, *args, **kwargs)
+                self._geometry.save(attr, value, **kwargs)
+        else:
+            value = func(self._evt, *args, **kwargs)
+        
+        if isinstance(value, np.ndarray):
+            value = value.view()
+            value.flags.writeable = False
+
+        self._cache[key] = value
+        return value
 
     @property
     def instrument(self):
@@ -5168,7 +7133,8 @@ class ImageCalibData(object):
         -------
         combined mask: array-like
         """
-        return self._det.mask(self._evt, calib=calib, status=status, edges=edges, 
+        key = ('mask', calib, status, edges, central, unbond, unbondnbrs)
+        return self._get_cached(key, self._det.mask, calib=calib, status=status, edges=edges, 
                               central=central, unbond=unbond, unbondnbrs=unbondnbrs)
 
     def mask_geo(self, mbits=15): 
@@ -5186,7 +7152,35 @@ class ImageCalibData(object):
             +8-unbonded neighbour pixels;
         
         """
-        return self._det.mask_geo(self._evt, mbits=mbits)
+        return self._get_cached(('mask_geo', mbits), self._det.mask_geo, mbits=mbits)
+
+    def image_assembler(self, binning=1, mean=False):
+        """
+        ImageAssembler from pixel index maps to make images with numpy.
+        Returns None if the detector has no pixel index maps.
+
+        Parameters
+        ----------
+        binning : int
+            Number of image pixels binned along each axis for quick-look images
+        mean : bool
+            Average instead of sum binned pixels
+        """
+        key = ('image_assembler', binning, mean)
+        if self._cache is not None and key in self._cache:
+            return self._cache[key]
+
+        indexes_x = self.indexes_x
+        indexes_y = self.indexes_y
+        if indexes_x is None or indexes_y is None or np.size(indexes_x) == 0:
+            assembler = None
+        else:
+            assembler = ImageAssembler(indexes_x, indexes_y, binning=binning, mean=mean)
+
+        if self._cache is not None:
+            self._cache[key] = assembler
+
+        return assembler
 
     def print_attributes(self):
         """
@@ -5230,8 +7224,11 @@ class ImageCalibData(object):
         return message
 
     def __getattr__(self, attr):
+        if attr in self._uncached_attrs:
+            return getattr(self._det, attr)(self._evt)
+        
         if attr in self._attrs:
-            return (getattr(self._det, attr)(self._evt))
+            return self._get_cached(attr, getattr(self._det, attr))
         
     def __dir__(self):
         all_attrs =  set(self._attrs +
@@ -5476,7 +7473,7 @@ class EpicsStorePV(object):
 
     def __str__(self):
         if len(self.data) > 1 and isinstance(self.data, np.ndarray):
-            value = '<{:}>'.format(mean(self.data))
+            value = '<{:}>'.format(np.mean(self.data))
         else:
             value = self.value
 
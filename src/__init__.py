@@ -3,6 +3,8 @@ __all__ = []
 #from PyDataSource import DataSource
 from PyDataSource import *
 from psxarray import * 
+from psmultirun import *
+from psgeometry import *
 __version__ = '00.00.01'
 
 import logging
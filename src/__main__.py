@@ -1,4 +1,5 @@
 import PyDataSource
+import sys
 import time
 import argparse
 
@@ -26,6 +27,14 @@ if __name__ == "__main__":
     attr = args.attr
     exp = args.exp
     run = args.run
+    if attr == 'import_benchmark':
+        from psutils import import_benchmark
+        result = import_benchmark()
+        print 'Import time = {:8.3f} sec'.format(result['time'])
+        if not result['ok']:
+            print 'Heavy modules loaded on import: {:}'.format(', '.join(result['loaded']))
+        sys.exit(not result['ok'])
+
     ds = PyDataSource.DataSource(exp=exp,run=run)
     if attr == 'config':
         print ds.configData.show_info()
@@ -1,7 +1,7 @@
 import PyDataSource
 import os
 
-from pylab import *
+import numpy as np
 
 class Camera(PyDataSource.Detector):
     """Camera Detector Class.
@@ -1,7 +1,7 @@
 import PyDataSource
 import os
 
-from pylab import *
+import numpy as np
 
 class Cspad2x2(PyDataSource.Detector):
     """Cspad2x2 Detector Class.
@@ -1,8 +1,7 @@
 import PyDataSource
 import os
 
-from pylab import *
-from scipy import signal
+import numpy as np
 
 class Impbox(PyDataSource.Detector):
     """Acqiris Functions.
@@ -77,6 +76,7 @@ class Channel(object):
     
     @property
     def filtered(self):
+        from scipy import signal
         hw = len(self.filter)/2
         f = -signal.convolve(self.waveform,self.filter)
         f[0:len(self.filter)+1] = 0
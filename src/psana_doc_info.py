@@ -29,153 +29,255 @@ def get_type_from_doc(doc):
     except:
         return None
 
+# Updates to psana_doc_info info 
+# (module, type, attribute, info key, value)
+psana_doc_updates = [
+    ('Bld', 'BldDataEBeamV7', 'ebeamDumpCharge', 'unit', 'e-'),
+    ('Bld', 'BldDataFEEGasDetEnergyV1', 'f_11_ENRC', 'unit', 'mJ'),
+    ('Bld', 'BldDataFEEGasDetEnergyV1', 'f_12_ENRC', 'unit', 'mJ'),
+    ('Bld', 'BldDataFEEGasDetEnergyV1', 'f_21_ENRC', 'unit', 'mJ'),
+    ('Bld', 'BldDataFEEGasDetEnergyV1', 'f_22_ENRC', 'unit', 'mJ'),
+    ('Bld', 'BldDataFEEGasDetEnergyV1', 'f_63_ENRC', 'unit', 'mJ'),
+    ('Bld', 'BldDataFEEGasDetEnergyV1', 'f_64_ENRC', 'unit', 'mJ'),
+    ('Acqiris', 'DataDescV1Elem', 'nbrSamplesInSeg', 'unit', ''),
+    ('Acqiris', 'ConfigV1', 'channelMask', 'func_method', bin),
+    ('Acqiris', 'HorizV1', 'sampInterval', 'unit', 'sec'),
+    ('Acqiris', 'HorizV1', 'delayTime', 'unit', 'sec'),
+    ('Camera', 'FrameFexConfigV1', 'threshold', 'unit', ''),
+    ('Quartz', 'ConfigV2', 'gain_percent', 'unit', ''),
+    ('Quartz', 'ConfigV2', 'max_taps', 'unit', ''),
+    ('Quartz', 'ConfigV2', 'output_resolution', 'unit', ''),
+
+    ('Generic1D', 'DataV0', 'data_u16', 'func_shape', 8),
+    ('Generic1D', 'DataV0', 'data_u32', 'func0', 8),  # offset
+    ('Generic1D', 'DataV0', 'data_u32', 'func_shape', 8),
+    ('Generic1D', 'ConfigV0', 'Depth', 'func_shape', 16),
+    ('Generic1D', 'ConfigV0', 'data_offset', 'func_shape', 16),
+
+    # Common mode not applicable?
+    #('CsPad', 'ElementV2', 'common_mode', 'func_quads', 'quads_shape'),
+    ('Acqiris', 'DataDescV1Elem', 'timestamp', 'func_len', 'nbrSegments'),
+    ('Acqiris', 'DataDescV1', 'data', 'func_shape', 'data_shape'),
+    ('Acqiris', 'ConfigV1', 'vert', 'list_len', 'nbrChannels'),
+
+    ('CsPad', 'DataV1', 'quads', 'func_shape', 'quads_shape'),
+    #('CsPad', 'DataV1', 'quads', 'func_dict_len', 'quads_shape'),
+    ('CsPad', 'DataV2', 'quads', 'func_shape', 'quads_shape'),
+    #('CsPad', 'DataV2', 'quads', 'func_dict_len', 'quads_shape'),
+    ('CsPad', 'ConfigV3', 'quads', 'func_shape', 'quads_shape'),
+    #('CsPad', 'ConfigV3', 'quads', 'func_dict_len', 'quads_shape'),
+    ('CsPad', 'ConfigV3', 'numAsicsStored', 'func_len', 'numQuads'),
+    ('CsPad', 'ConfigV3', 'roiMask', 'func_len_hex', 'numQuads'),
+    ('CsPad', 'ConfigV3', 'roiMasks', 'func_method', hex),
+    ('CsPad', 'ConfigV4', 'quads', 'func_shape', 'quads_shape'),
+    #('CsPad', 'ConfigV4', 'quads', 'func_dict_len', 'quads_shape'),
+    ('CsPad', 'ConfigV4', 'numAsicsStored', 'func_len', 'numQuads'),
+    ('CsPad', 'ConfigV4', 'roiMask', 'func_len_hex', 'numQuads'),
+    ('CsPad', 'ConfigV4', 'roiMasks', 'func_method', hex),
+    ('CsPad', 'ConfigV5', 'quads', 'func_shape', 'quads_shape'),
+    #('CsPad', 'ConfigV5', 'quads', 'func_dict_len', 'quads_shape'),
+
+    # see https://confluence.slac.stanford.edu/display/PCDS/Discussion+of+timing+the+cspad+variants
+
+    ('CsPad', 'ConfigV5', 'numAsicsStored', 'func_len', 'numQuads'),
+    ('CsPad', 'ConfigV5', 'asicMask', 'func_method', hex),
+    ('CsPad', 'ConfigV5', 'badAsicMask0', 'func_method', hex),
+    ('CsPad', 'ConfigV5', 'badAsicMask1', 'func_method', hex),
+    ('CsPad', 'ConfigV5', 'concentratorVersion', 'func_method', hex),
+    ('CsPad', 'ConfigV5', 'quadMask', 'func_method', bin),
+    ('CsPad', 'ConfigV5', 'roiMask', 'func_len_hex', 'numQuads'),
+    ('CsPad', 'ConfigV5', 'roiMasks', 'func_method', hex),
+    ('CsPad', 'ElementV2', 'common_mode', 'func_shape', 32),
+    ('CsPad', 'ConfigV3QuadReg', 'ampIdle', 'func_method', hex),
+    ('CsPad', 'ConfigV3QuadReg', 'biasTuning', 'func_method', hex),
+    ('CsPad', 'ConfigV3QuadReg', 'digCount', 'func_method', hex),
+    ('CsPad', 'ConfigV3QuadReg', 'acqDelay', 'unit', 'x8ns'),
+    ('CsPad', 'ConfigV3QuadReg', 'acqDelay', 'doc', 'delay before acquisition (350 typical)'),
+    ('CsPad', 'ConfigV3QuadReg', 'digDelay', 'unit', 'x8ns'),
+    ('CsPad', 'ConfigV3QuadReg', 'digDelay', 'doc', 'hold delay before A to D conversion (1000 typical)'),
+    ('CsPad', 'ConfigV3QuadReg', 'digPeriod', 'unit', 'x8ns'),
+    ('CsPad', 'ConfigV3QuadReg', 'digPeriod', 'doc', 'digitiztion perios'),
+    ('CsPad', 'ConfigV3QuadReg', 'intTime', 'unit', 'x8ns'),
+    ('CsPad', 'ConfigV3QuadReg', 'intTime', 'doc', 'duration of the integration window (5000 typical)'),
+    ('CsPad', 'ConfigV3QuadReg', 'readClkHold', 'doc', '(should be 1)'),
+    ('CsPad', 'ConfigV3QuadReg', 'readClkSet', 'doc', '(should be 2)'),
+    ('CsPad', 'ConfigV3QuadReg', 'rowColShiftPer', 'doc', '(should be 3)'),
+    ('CsPad', 'ConfigV3QuadReg', 'digCount', 'doc', '(max = 0x3ff)'),
+    ('CsPad', 'CsPadReadOnlyCfg', 'version', 'func_method', hex),
+
+    ('CsPad2x2', 'ConfigV2', 'concentratorVersion', 'func_method', hex),
+    ('CsPad2x2', 'ConfigV2', 'asicMask', 'func_method', hex),
+    ('CsPad2x2', 'ConfigV2', 'badAsicMask', 'func_method', hex),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'pdpmndnmBalance', 'doc', '2 bits per nibble, bit order pd00pm00nd00nm'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'pdpmndnmBalance', 'unit', ''),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'acqDelay', 'unit', 'x8ns'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'acqDelay', 'doc', 'delay before acquisition (280 typical)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'digDelay', 'unit', 'x8ns'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'digDelay', 'doc', 'hold delay before A to D conversion (960 typical)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'digPeriod', 'unit', 'x8ns'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'digPeriod', 'doc', 'digitiztion perios'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'intTime', 'unit', 'x8ns'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'intTime', 'doc', 'duration of the integration window (5000 typical)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'readClkHold', 'doc', '(should be 1)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'readClkSet', 'doc', '(should be 1)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'rowColShiftPer', 'doc', '(should be 3)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'digCount', 'doc', '(max = 0x3ff)'),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'ampIdle', 'func_method', hex),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'biasTuning', 'func_method', hex),
+    ('CsPad2x2', 'ConfigV2QuadReg', 'digCount', 'func_method', hex),
+    ('CsPad2x2', 'CsPad2x2ReadOnlyCfg', 'version', 'func_method', hex),
+    ('CsPad2x2', 'CsPad2x2ReadOnlyCfg', 'shiftTest', 'func_method', hex),
+    ('CsPad2x2', 'ElementV1', 'common_mode', 'func_shape', 2),
+
+    ('UsdUsb', 'FexConfigV1', 'name', 'func_shape', 4),
+
+    ('Ipimb', 'ConfigV1', 'capacitorValue', 'func_index', 'capacitorValues'),
+    ('Ipimb', 'ConfigV2', 'capacitorValue', 'func_index', 'capacitorValues'),
+    #Need to understand the diode scale and base arrays.
+    #('Ipimb', 'ConfigV2', 'diode', 'func_len', 4),
+    ]
+
+# Default convention is that attributes have lower case.  
+# Configure exceptions here (e.g. Generic1D)
+psana_attrs_updates = {
+    ('Generic1D', 'ConfigV0'): [
+                                 'Depth',
+                                 'Length',
+                                 'NChannels',
+                                 'Offset',
+                                 'Period',
+                                 'SampleType',
+                                 'data_offset',
+                               ],
+    }
+
+_doc_updates = {}
+for _item in psana_doc_updates:
+    _doc_updates.setdefault(_item[0:2], []).append(_item[2:])
+
+_type_info = {}
+
+def get_type_info(mod_name, typ_name):
+    """
+    Build doc and unit information and list of attributes for a psana type.
+    Built once for each type on first use.
+
+    Returns
+    -------
+    (doc_info, attrs) : tuple
+        doc_info is a dictionary of doc, unit and type information for each attribute.
+        attrs is the list of attributes to evaluate.
+    """
+    if (mod_name, typ_name) in _type_info:
+        return _type_info[(mod_name, typ_name)]
+
+    typ = getattr(getattr(psana, mod_name), typ_name)
+    doc_info = {}
+    for attr in [a for a in dir(typ) if not a.startswith('_')]:
+        if attr in ['TypeId','Version']:
+            info = {'doc': '', 'unit': '', 'type': ''}
+        else:
+            func = getattr(typ, attr)
+            doc = func.__doc__
+            if doc:
+                doc = doc.split('\n')[-1].lstrip(' ')
+                if doc.startswith(attr):
+                    doc = ''
+
+            info = {'doc': doc, 
+                    'unit': get_unit_from_doc(func.__doc__), 
+                    'type': get_type_from_doc(func.__doc__)}
+        
+        doc_info[attr] = info 
+
+    for attr, key, value in _doc_updates.get((mod_name, typ_name), []):
+        if attr in doc_info:
+            doc_info[attr][key] = value
+
+    attrs = psana_attrs_updates.get((mod_name, typ_name))
+    if attrs is None:
+        attrs = [a for a in doc_info if not a[0].isupper()]
+    
+    _type_info[(mod_name, typ_name)] = (doc_info, list(attrs))
+    return _type_info[(mod_name, typ_name)]
+
+
+class LazyInfoDict(dict):
+    """
+    Dictionary with a known set of keys where the value for each key is 
+    built with the build function the first time it is accessed.
+
+    Parameters
+    ----------
+    names : list
+        Keys of dictionary
+    build : function
+        Function with the key as argument that returns the value
+    """
+
+    def __init__(self, names, build):
+        dict.__init__(self)
+        self._names = set(names)
+        self._build = build
+
+    def _load(self, name):
+        if not dict.__contains__(self, name):
+            if name not in self._names:
+                raise KeyError(name)
+            dict.__setitem__(self, name, self._build(name))
+
+        return dict.__getitem__(self, name)
+
+    def __getitem__(self, name):
+        return self._load(name)
+
+    def __setitem__(self, name, value):
+        self._names.add(name)
+        dict.__setitem__(self, name, value)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._names)
+
+    def get(self, name, default=None):
+        if name in self._names:
+            return self._load(name)
+        else:
+            return default
+
+    def keys(self):
+        return sorted(self._names)
+
+    def values(self):
+        return [self._load(name) for name in self.keys()]
+
+    def items(self):
+        return [(name, self._load(name)) for name in self.keys()]
+
+    def copy(self):
+        return dict(self.items())
+
+
+def _module_doc_info(mod_name):
+    mod = getattr(psana, mod_name)
+    return LazyInfoDict([a for a in dir(mod) if not a.startswith('_')], 
+                        lambda typ_name: get_type_info(mod_name, typ_name)[0])
+
+def _module_attrs(mod_name):
+    mod = getattr(psana, mod_name)
+    return LazyInfoDict([a for a in dir(mod) if not a.startswith('_')], 
+                        lambda typ_name: get_type_info(mod_name, typ_name)[1])
+
 # create dictionary of psana method doc and unit information
+# Information for each psana module and type is built on first use.
 psana_omit_list = ['logging', 'os', 'setConfigFile', 'setOption', 'setOptions']
-psana_doc_info = {a: {} for a in dir(psana) if not a.startswith('_') \
-              and not a.startswith('ndarray') and a not in psana_omit_list}
-psana_attrs = {a: {} for a in dir(psana) if not a.startswith('_') \
-              and not a.startswith('ndarray') and a not in psana_omit_list}
-
-for mod_name in psana_doc_info:
-    mod = getattr(psana,mod_name)
-    psana_doc_info[mod_name] = {a: {} for a in dir(mod) if not a.startswith('_')}
-    for typ_name in psana_doc_info[mod_name]:
-        typ = getattr(mod, typ_name)
-        psana_doc_info[mod_name][typ_name] = {a: {} for a in dir(typ) if not a.startswith('_') }
-        # Default convention is that attributes have lower case.  
-        # Configure exceptions below (e.g. Generic1D)
-        psana_attrs[mod_name][typ_name] = [a for a in dir(typ) if not a.startswith('_') and not a[0].isupper() ]
-        for attr in psana_doc_info[mod_name][typ_name]:
-            if attr in ['TypeId','Version']:
-                info = {'doc': '', 'unit': '', 'type': ''}
-            else:
-                func = getattr(typ, attr)
-                doc = func.__doc__
-                if doc:
-                    doc = doc.split('\n')[-1].lstrip(' ')
-                    if doc.startswith(attr):
-                        doc = ''
-
-                info = {'doc': doc, 
-                        'unit': get_unit_from_doc(func.__doc__), 
-                        'type': get_type_from_doc(func.__doc__)}
-            
-            psana_doc_info[mod_name][typ_name][attr] = info 
-
-# Updates to psana_doc_info info
-psana_doc_info['Bld']['BldDataEBeamV7']['ebeamDumpCharge']['unit'] = 'e-'
-psana_doc_info['Bld']['BldDataFEEGasDetEnergyV1']['f_11_ENRC']['unit'] = 'mJ'
-psana_doc_info['Bld']['BldDataFEEGasDetEnergyV1']['f_12_ENRC']['unit'] = 'mJ'
-psana_doc_info['Bld']['BldDataFEEGasDetEnergyV1']['f_21_ENRC']['unit'] = 'mJ'
-psana_doc_info['Bld']['BldDataFEEGasDetEnergyV1']['f_22_ENRC']['unit'] = 'mJ'
-psana_doc_info['Bld']['BldDataFEEGasDetEnergyV1']['f_63_ENRC']['unit'] = 'mJ'
-psana_doc_info['Bld']['BldDataFEEGasDetEnergyV1']['f_64_ENRC']['unit'] = 'mJ'
-psana_doc_info['Acqiris']['DataDescV1Elem']['nbrSamplesInSeg']['unit'] = ''
-psana_doc_info['Acqiris']['ConfigV1']['channelMask']['func_method'] = bin 
-psana_doc_info['Acqiris']['HorizV1']['sampInterval']['unit'] = 'sec'
-psana_doc_info['Acqiris']['HorizV1']['delayTime']['unit'] = 'sec'
-psana_doc_info['Camera']['FrameFexConfigV1']['threshold']['unit'] = ''
-psana_doc_info['Quartz']['ConfigV2']['gain_percent']['unit'] = ''
-psana_doc_info['Quartz']['ConfigV2']['max_taps']['unit'] = ''
-psana_doc_info['Quartz']['ConfigV2']['output_resolution']['unit'] = ''
-
-psana_doc_info['Generic1D']['DataV0']['data_u16']['func_shape'] = 8
-psana_doc_info['Generic1D']['DataV0']['data_u32']['func0'] = 8     # offset
-psana_doc_info['Generic1D']['DataV0']['data_u32']['func_shape'] = 8
-psana_doc_info['Generic1D']['ConfigV0']['Depth']['func_shape'] = 16
-psana_doc_info['Generic1D']['ConfigV0']['data_offset']['func_shape'] = 16
-
-psana_attrs['Generic1D']['ConfigV0'] = [
-                                         'Depth',
-                                         'Length',
-                                         'NChannels',
-                                         'Offset',
-                                         'Period',
-                                         'SampleType',
-                                         'data_offset',
-                                       ]
-
-
-# Common mode not applicable?
-#psana_doc_info['CsPad']['ElementV2']['common_mode']['func_quads'] = 'quads_shape'
-psana_doc_info['Acqiris']['DataDescV1Elem']['timestamp']['func_len'] = 'nbrSegments'
-psana_doc_info['Acqiris']['DataDescV1']['data']['func_shape'] = 'data_shape'
-psana_doc_info['Acqiris']['ConfigV1']['vert']['list_len'] = 'nbrChannels'
-
-psana_doc_info['CsPad']['DataV1']['quads']['func_shape'] = 'quads_shape'
-#psana_doc_info['CsPad']['DataV1']['quads']['func_dict_len'] = 'quads_shape'
-psana_doc_info['CsPad']['DataV2']['quads']['func_shape'] = 'quads_shape'
-#psana_doc_info['CsPad']['DataV2']['quads']['func_dict_len'] = 'quads_shape'
-psana_doc_info['CsPad']['ConfigV3']['quads']['func_shape'] = 'quads_shape'
-#psana_doc_info['CsPad']['ConfigV3']['quads']['func_dict_len'] = 'quads_shape'
-psana_doc_info['CsPad']['ConfigV3']['numAsicsStored']['func_len'] = 'numQuads'
-psana_doc_info['CsPad']['ConfigV3']['roiMask']['func_len_hex'] = 'numQuads'
-psana_doc_info['CsPad']['ConfigV3']['roiMasks']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV4']['quads']['func_shape'] = 'quads_shape'
-#psana_doc_info['CsPad']['ConfigV4']['quads']['func_dict_len'] = 'quads_shape'
-psana_doc_info['CsPad']['ConfigV4']['numAsicsStored']['func_len'] = 'numQuads'
-psana_doc_info['CsPad']['ConfigV4']['roiMask']['func_len_hex'] = 'numQuads'
-psana_doc_info['CsPad']['ConfigV4']['roiMasks']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV5']['quads']['func_shape'] = 'quads_shape'
-#psana_doc_info['CsPad']['ConfigV5']['quads']['func_dict_len'] = 'quads_shape'
-
-# see https://confluence.slac.stanford.edu/display/PCDS/Discussion+of+timing+the+cspad+variants
-
-psana_doc_info['CsPad']['ConfigV5']['numAsicsStored']['func_len'] = 'numQuads'
-psana_doc_info['CsPad']['ConfigV5']['asicMask']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV5']['badAsicMask0']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV5']['badAsicMask1']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV5']['concentratorVersion']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV5']['quadMask']['func_method'] = bin
-psana_doc_info['CsPad']['ConfigV5']['roiMask']['func_len_hex'] = 'numQuads'
-psana_doc_info['CsPad']['ConfigV5']['roiMasks']['func_method'] = hex
-psana_doc_info['CsPad']['ElementV2']['common_mode']['func_shape'] = 32
-psana_doc_info['CsPad']['ConfigV3QuadReg']['ampIdle']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV3QuadReg']['biasTuning']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV3QuadReg']['digCount']['func_method'] = hex
-psana_doc_info['CsPad']['ConfigV3QuadReg']['acqDelay']['unit'] = 'x8ns'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['acqDelay']['doc'] = 'delay before acquisition (350 typical)'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['digDelay']['unit'] = 'x8ns'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['digDelay']['doc'] = 'hold delay before A to D conversion (1000 typical)'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['digPeriod']['unit'] = 'x8ns'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['digPeriod']['doc'] = 'digitiztion perios'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['intTime']['unit'] = 'x8ns'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['intTime']['doc'] = 'duration of the integration window (5000 typical)'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['readClkHold']['doc'] = '(should be 1)'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['readClkSet']['doc'] = '(should be 2)'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['rowColShiftPer']['doc'] = '(should be 3)'
-psana_doc_info['CsPad']['ConfigV3QuadReg']['digCount']['doc'] = '(max = 0x3ff)'
-psana_doc_info['CsPad']['CsPadReadOnlyCfg']['version']['func_method'] = hex
-
-psana_doc_info['CsPad2x2']['ConfigV2']['concentratorVersion']['func_method'] = hex
-psana_doc_info['CsPad2x2']['ConfigV2']['asicMask']['func_method'] = hex
-psana_doc_info['CsPad2x2']['ConfigV2']['badAsicMask']['func_method'] = hex
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['pdpmndnmBalance']['doc'] = '2 bits per nibble, bit order pd00pm00nd00nm'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['pdpmndnmBalance']['unit'] = ''
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['acqDelay']['unit'] = 'x8ns'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['acqDelay']['doc'] = 'delay before acquisition (280 typical)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['digDelay']['unit'] = 'x8ns'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['digDelay']['doc'] = 'hold delay before A to D conversion (960 typical)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['digPeriod']['unit'] = 'x8ns'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['digPeriod']['doc'] = 'digitiztion perios'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['intTime']['unit'] = 'x8ns'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['intTime']['doc'] = 'duration of the integration window (5000 typical)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['readClkHold']['doc'] = '(should be 1)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['readClkSet']['doc'] = '(should be 1)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['rowColShiftPer']['doc'] = '(should be 3)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['digCount']['doc'] = '(max = 0x3ff)'
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['ampIdle']['func_method'] = hex
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['biasTuning']['func_method'] = hex
-psana_doc_info['CsPad2x2']['ConfigV2QuadReg']['digCount']['func_method'] = hex
-psana_doc_info['CsPad2x2']['CsPad2x2ReadOnlyCfg']['version']['func_method'] = hex
-psana_doc_info['CsPad2x2']['CsPad2x2ReadOnlyCfg']['shiftTest']['func_method'] = hex
-psana_doc_info['CsPad2x2']['ElementV1']['common_mode']['func_shape'] = 2
-
-psana_doc_info['UsdUsb']['FexConfigV1']['name']['func_shape'] = 4
-
-psana_doc_info['Ipimb']['ConfigV1']['capacitorValue']['func_index'] = 'capacitorValues'
-psana_doc_info['Ipimb']['ConfigV2']['capacitorValue']['func_index'] = 'capacitorValues'
-#Need to understand the diode scale and base arrays.
-#psana_doc_info['Ipimb']['ConfigV2']['diode']['func_len'] = 4
-
+_psana_modules = [a for a in dir(psana) if not a.startswith('_') \
+                  and not a.startswith('ndarray') and a not in psana_omit_list]
+psana_doc_info = LazyInfoDict(_psana_modules, _module_doc_info)
+psana_attrs = LazyInfoDict(_psana_modules, _module_attrs)
 
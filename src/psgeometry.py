@@ -0,0 +1,630 @@
+# standard python modules
+import os
+import re
+import glob
+import hashlib
+import traceback
+import numpy as np
+
+def calib_files(calibDir, srcname, runnum):
+    """
+    Calibration files in calibDir that are valid for a run.
+
+    Calibration files are named begin-end.data (e.g., 0-end.data) in
+    calibDir/<calib group>/<srcname>/<calib type>/.  For each calib type the
+    valid file with the latest begin run is used (the same as psana).
+
+    Parameters
+    ----------
+    calibDir : str
+        Calibration directory
+    srcname : str
+        Detector source name (e.g., 'CxiDs1.0:Cspad.0')
+    runnum : int
+        Run number
+
+    Returns
+    -------
+    list
+        (file name, size, modification time) for each valid calib file
+    """
+    runnum = int(runnum)
+    valid = {}
+    for file_name in glob.glob(os.path.join(calibDir, '*', srcname, '*', '*.data')):
+        calib_type = os.path.dirname(file_name)
+        try:
+            begin, end = os.path.basename(file_name)[:-5].split('-')
+            begin = int(begin)
+            if end != 'end':
+                end = int(end)
+                if runnum > end:
+                    continue
+            if runnum < begin:
+                continue
+        except:
+            continue
+
+        if calib_type not in valid or begin >= valid[calib_type][0]:
+            valid[calib_type] = (begin, file_name)
+
+    files = []
+    for calib_type, (begin, file_name) in sorted(valid.items()):
+        stat = os.stat(file_name)
+        files.append((os.path.relpath(file_name, calibDir), stat.st_size, int(stat.st_mtime)))
+
+    return files
+
+
+class GeometryCache(object):
+    """
+    On-disk cache of detector geometry and mask arrays shared between processes.
+
+    Arrays are saved as .npy files named by a hash of the detector source,
+    the calib files valid for the run (with their size and modification time)
+    and the keyword arguments used to make the array.  Cached arrays are
+    loaded as read-only memory maps, so batch workers processing the same
+    run share one copy instead of each rebuilding the geometry.
+
+    Parameters
+    ----------
+    calibDir : str
+        Calibration directory
+    srcname : str
+        Detector source name
+    runnum : int
+        Run number
+    path : str
+        Directory for cache files
+    """
+
+    def __init__(self, calibDir, srcname, runnum, path):
+        self.calibDir = calibDir
+        self.srcname = srcname
+        self.runnum = runnum
+        self.path = path
+        self._calib_files = calib_files(calibDir, srcname, runnum)
+        self.hits = 0
+        self.misses = 0
+        self._error = False
+
+    def _file_name(self, attr, **kwargs):
+        md5 = hashlib.md5()
+        md5.update(repr((self.srcname, attr, sorted(kwargs.items()), self._calib_files)))
+        name = re.sub('-|:|\.| ','_', self.srcname)
+        return os.path.join(self.path, '{:}_{:}_{:}.npy'.format(name, attr, md5.hexdigest()[:16]))
+
+    def load(self, attr, **kwargs):
+        """
+        Load array from cache as read-only memory map.
+        Returns None if not in cache.
+        """
+        file_name = self._file_name(attr, **kwargs)
+        if not os.path.isfile(file_name):
+            self.misses += 1
+            return None
+
+        try:
+            value = np.load(file_name, mmap_mode='r')
+            self.hits += 1
+            return value
+        except:
+            self.misses += 1
+            return None
+
+    def save(self, attr, value, **kwargs):
+        """
+        Save array to cache.  The file is written to a temporary file and
+        renamed so other processes never load a partial file.
+        """
+        if not isinstance(value, np.ndarray) or value.dtype == object:
+            return False
+
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+
+            file_name = self._file_name(attr, **kwargs)
+            tmp_file = '{:}.{:}.tmp'.format(file_name, os.getpid())
+            with open(tmp_file, 'wb') as f:
+                np.save(f, value)
+
+            os.rename(tmp_file, file_name)
+            return True
+
+        except Exception as err:
+            if not self._error:
+                print 'Cannot save {:} geometry cache in {:}: {:}'.format(self.srcname,
+                        self.path, err)
+                self._error = True
+            return False
+
+    def get(self, attr, func, *args, **kwargs):
+        """
+        Return cached array or evaluate func(*args, **kwargs) and save it.
+        """
+        value = self.load(attr, **kwargs)
+        if value is None:
+            value = func(*args, **kwargs)
+            self.save(attr, value, **kwargs)
+
+        return value
+
+    def clear(self):
+        """
+        Remove cache files for this source.
+        """
+        name = re.sub('-|:|\.| ','_', self.srcname)
+        for file_name in glob.glob(os.path.join(self.path, '{:}_*.npy'.format(name))):
+            try:
+                os.remove(file_name)
+            except:
+                traceback.print_exc()
+
+    def __str__(self):
+        return '{:} run {:}, {:} hits, {:} misses'.format(self.srcname, self.runnum,
+                                                          self.hits, self.misses)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+class ImageAssembler(object):
+    """
+    Assemble detector images from pixel index maps with numpy.
+
+    The flat image index of each pixel is computed once from indexes_x and
+    indexes_y (e.g., from calibData) so that assembling an image is a single
+    numpy put (or bincount when binning) into an optionally reused output
+    buffer instead of a psana det.image call per event.
+
+    Parameters
+    ----------
+    indexes_x : array-like
+        Pixel X image index (e.g., shape (32, 185, 388) for CSPAD)
+    indexes_y : array-like
+        Pixel Y image index
+    binning : int, optional
+        Number of image pixels binned together along each axis for quick-look
+        images (default = 1, no binning)
+    mean : bool, optional
+        Average instead of sum binned pixels (default = False)
+
+    Example
+    -------
+    assembler = ImageAssembler(calibData.indexes_x, calibData.indexes_y)
+    img = assembler.image(evt.DscCsPad.calib)
+    imgs = assembler.images(calib_stack)    # shape (N, 32, 185, 388)
+    """
+
+    def __init__(self, indexes_x, indexes_y, binning=1, mean=False):
+        indexes_x = np.asarray(indexes_x, dtype=np.int64)
+        indexes_y = np.asarray(indexes_y, dtype=np.int64)
+        if indexes_x.shape != indexes_y.shape:
+            raise ValueError('indexes_x shape {:} does not match indexes_y shape {:}'.format(
+                    indexes_x.shape, indexes_y.shape))
+
+        self.binning = max(1, int(binning))
+        self.mean = mean
+        self.pixel_shape = indexes_x.shape
+        ix = indexes_x.ravel()//self.binning
+        iy = indexes_y.ravel()//self.binning
+        self.shape = (int(ix.max())+1, int(iy.max())+1)
+        self.size = self.shape[0]*self.shape[1]
+        self._flat = ix*self.shape[1]+iy
+        if self.binning > 1 and mean:
+            counts = np.bincount(self._flat, minlength=self.size).astype(float)
+            counts[counts == 0] = 1.
+            self._norm = 1./counts
+        else:
+            self._norm = None
+
+    def _check_out(self, out, shape, dtype):
+        if out is None:
+            return np.zeros(shape, dtype=dtype)
+
+        if out.shape != shape or not out.flags.c_contiguous:
+            raise ValueError('out must be a C contiguous array with shape {:}'.format(shape))
+
+        return out
+
+    def image(self, nda, out=None):
+        """
+        Assemble image from array of pixel data.
+
+        Parameters
+        ----------
+        nda : array-like
+            Pixel data with the same shape as the index maps
+        out : array-like, optional
+            Reused output image buffer with shape self.shape
+
+        Returns
+        -------
+        2D image array
+        """
+        nda = np.asarray(nda)
+        if nda.size != self._flat.size:
+            raise ValueError('Data shape {:} does not match pixel shape {:}'.format(
+                    nda.shape, self.pixel_shape))
+        
+        if self.binning == 1:
+            out = self._check_out(out, self.shape, nda.dtype)
+            out.fill(0)
+            np.put(out, self._flat, nda)
+        else:
+            out = self._check_out(out, self.shape, float)
+            binned = np.bincount(self._flat, weights=nda.ravel(), minlength=self.size)
+            if self._norm is not None:
+                binned *= self._norm
+            out.reshape(-1)[:] = binned
+
+        return out
+
+    def images(self, stack, out=None):
+        """
+        Assemble a batch of images.
+
+        Parameters
+        ----------
+        stack : array-like
+            Pixel data with shape (N,) + pixel_shape (e.g., (N, 32, 185, 388))
+        out : array-like, optional
+            Reused output buffer with shape (N,) + self.shape
+
+        Returns
+        -------
+        3D array of images with shape (N,) + self.shape
+        """
+        stack = np.asarray(stack)
+        nevents = stack.shape[0]
+        stack = stack.reshape(nevents, -1)
+        if stack.shape[1] != self._flat.size:
+            raise ValueError('Data shape {:} does not match pixel shape {:}'.format(
+                    stack.shape, self.pixel_shape))
+
+        shape = (nevents,)+self.shape
+        if self.binning == 1:
+            out = self._check_out(out, shape, stack.dtype)
+            flat_out = out.reshape(nevents, -1)
+            flat_out.fill(0)
+            flat_out[:, self._flat] = stack
+        else:
+            out = self._check_out(out, shape, float)
+            offsets = np.arange(nevents, dtype=np.int64)[:,np.newaxis]*self.size
+            binned = np.bincount((offsets+self._flat).ravel(), weights=stack.ravel(), 
+                                 minlength=nevents*self.size).reshape(nevents, -1)
+            if self._norm is not None:
+                binned *= self._norm
+            out.reshape(nevents, -1)[:] = binned
+
+        return out
+
+    def axis(self, axis):
+        """
+        Bin image axis (e.g., calibData.image_xaxis) to match binned images.
+        """
+        if axis is None or self.binning == 1:
+            return axis
+
+        axis = np.asarray(axis, dtype=float)
+        nbins = int(np.ceil(axis.size/float(self.binning)))
+        idx = np.arange(axis.size)//self.binning
+        return np.bincount(idx, weights=axis, minlength=nbins)/np.bincount(idx, minlength=nbins)
+
+    def __str__(self):
+        return 'pixels {:} to image {:}, binning {:}'.format(self.pixel_shape, self.shape,
+                                                            self.binning)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+def bin_indexes(values, bins, valid=None):
+    """
+    Bin index of each value with the same bin edges as np.histogram.
+
+    Values outside the bin range, nan values and values that are not valid
+    are given the overflow index len(edges)-1.
+
+    Parameters
+    ----------
+    values : array-like
+        Flat array of values
+    bins : int or sequence of scalars
+        Number of bins or bin edges (see np.histogram)
+    valid : array-like, optional
+        Boolean flat array of values to bin
+
+    Returns
+    -------
+    tuple
+        (bin index of each value, bin edges)
+    """
+    values = np.asarray(values, dtype=float)
+    if valid is None:
+        valid = np.isfinite(values)
+    else:
+        valid = valid & np.isfinite(values)
+
+    edges = np.histogram(values[valid], bins=bins)[1]
+    nbins = edges.size-1
+    idx = np.searchsorted(edges, values, side='right')-1
+    # np.histogram includes the right edge in the last bin
+    idx[values == edges[-1]] = nbins-1
+    idx[(idx < 0) | (idx >= nbins) | ~valid] = nbins
+
+    return idx, edges
+
+
+class PolarIntegrator(object):
+    """
+    Radial, azimuthal or (r, az) cake integration with a precomputed bin map.
+
+    The bin index of every pixel is computed once so that integrating an
+    event is a single np.bincount weighted by the flat pixel data.  Masked
+    pixels and pixels outside the bins go to an overflow bin that is dropped.
+    Results are the same as np.histogram of the unmasked pixel coordinates
+    weighted by the unmasked pixel data.
+
+    Parameters
+    ----------
+    coords : array-like
+        Pixel coordinate (e.g., radius or azimuth) with the data shape
+    bins : int or sequence of scalars
+        Number of bins or bin edges for coords (see np.histogram)
+    mask : array-like, optional
+        Pixel mask with np.ma convention (True = masked)
+    coords2 : array-like, optional
+        Second pixel coordinate for 2D cake integration (e.g., azimuth)
+    bins2 : int or sequence of scalars, optional
+        Number of bins or bin edges for coords2
+    """
+
+    def __init__(self, coords, bins, mask=None, coords2=None, bins2=None):
+        coords = np.asarray(coords)
+        self.pixel_shape = coords.shape
+        if mask is not None:
+            valid = ~np.ma.getmaskarray(np.ma.masked_array(coords, mask)).ravel()
+        else:
+            valid = None
+        
+        idx, self.edges = bin_indexes(coords.ravel(), bins, valid=valid)
+        nbins = self.edges.size-1
+        if coords2 is not None:
+            idx2, self.edges2 = bin_indexes(np.asarray(coords2).ravel(), bins2, valid=valid)
+            nbins2 = self.edges2.size-1
+            overflow = (idx == nbins) | (idx2 == nbins2)
+            idx = idx*nbins2+idx2
+            self.shape = (nbins, nbins2)
+        else:
+            self.edges2 = None
+            overflow = idx == nbins
+            self.shape = (nbins,)
+
+        self.size = int(np.prod(self.shape))
+        idx[overflow] = self.size
+        self._idx = idx
+        self.counts = np.bincount(idx, minlength=self.size+1)[:self.size].reshape(self.shape)
+
+    @property
+    def axis(self):
+        """
+        Bin centers of first coordinate.
+        """
+        return (self.edges[1:]+self.edges[:-1])/2.
+
+    @property
+    def axis2(self):
+        """
+        Bin centers of second coordinate for cake integration.
+        """
+        if self.edges2 is not None:
+            return (self.edges2[1:]+self.edges2[:-1])/2.
+
+    def integrate(self, nda, normalize=False):
+        """
+        Sum of pixel data in each bin.
+
+        Parameters
+        ----------
+        nda : array-like
+            Pixel data with the shape of the coordinates
+        normalize : bool
+            Divide by the number of pixels in each bin
+        """
+        nda = np.asarray(nda)
+        if nda.size != self._idx.size:
+            raise ValueError('Data shape {:} does not match pixel shape {:}'.format(
+                    nda.shape, self.pixel_shape))
+
+        hst = np.bincount(self._idx, weights=nda.ravel(), 
+                          minlength=self.size+1)[:self.size].reshape(self.shape)
+        if normalize:
+            hst = hst/self.counts
+
+        return hst
+
+    def integrate_batch(self, stack, normalize=False, out=None):
+        """
+        Integrate a batch of events.
+
+        Parameters
+        ----------
+        stack : array-like
+            Pixel data with shape (N,) + pixel_shape
+        normalize : bool
+            Divide by the number of pixels in each bin
+        out : array-like, optional
+            Reused output array with shape (N,) + self.shape
+        """
+        stack = np.asarray(stack)
+        nevents = stack.shape[0]
+        if out is None:
+            out = np.empty((nevents,)+self.shape)
+        
+        for i in range(nevents):
+            out[i] = self.integrate(stack[i], normalize=normalize)
+
+        return out
+
+    def __str__(self):
+        return 'pixels {:} to bins {:}'.format(self.pixel_shape, self.shape)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+
+class ArrayStore(object):
+    """
+    Shared reference counted store of large arrays referenced by key.
+
+    Arrays are keyed by a hash of their content so identical arrays
+    (e.g., the same mask used by several projections) are held once.
+    Keys are strings starting with 'array:' that can be saved in 
+    configuration dictionaries in place of the arrays, and the arrays 
+    are saved separately in a binary npz file.
+    """
+    
+    prefix = 'array:'
+
+    def __init__(self):
+        self._arrays = {}
+        self._refs = {}
+
+    def _key(self, value):
+        md5 = hashlib.md5()
+        md5.update(str(value.dtype))
+        md5.update(str(value.shape))
+        md5.update(np.ascontiguousarray(value).data)
+        return self.prefix+md5.hexdigest()
+
+    def is_key(self, value):
+        """
+        True if value is an ArrayStore key.
+        """
+        return isinstance(value, basestring) and value.startswith(self.prefix)
+
+    def add(self, value):
+        """
+        Add array to store and return key.  Adding an array already in the store
+        increments the reference count.  The array is copied so changing the
+        input array afterwards does not change the stored array.
+        """
+        value = np.asarray(value)
+        key = self._key(value)
+        if key not in self._arrays:
+            value = np.array(value, copy=True)
+            value.flags.writeable = False
+            self._arrays[key] = value
+            self._refs[key] = 0
+
+        self._refs[key] += 1
+        return key
+
+    def retain(self, key):
+        """
+        Increment reference count of key.
+        """
+        if key in self._arrays:
+            self._refs[key] += 1
+
+    def release(self, key):
+        """
+        Decrement reference count of key and remove array when no longer referenced.
+        """
+        if key in self._arrays:
+            self._refs[key] -= 1
+            if self._refs[key] <= 0:
+                del self._arrays[key]
+                del self._refs[key]
+
+    def prune(self):
+        """
+        Remove arrays that are not referenced.
+        """
+        for key, nrefs in self._refs.items():
+            if nrefs <= 0:
+                del self._arrays[key]
+                del self._refs[key]
+
+    def get(self, key):
+        """
+        Array for key (None if not in store).
+        """
+        return self._arrays.get(key)
+
+    def resolve(self, value):
+        """
+        Array if value is a key, otherwise the value itself.
+        """
+        if self.is_key(value):
+            return self._arrays.get(value)
+        
+        return value
+
+    def save(self, file_name, keys=None):
+        """
+        Save arrays to npz file.
+
+        Parameters
+        ----------
+        file_name : str
+            Name of npz file
+        keys : list, optional
+            Keys of arrays to save (default = all)
+        """
+        if keys is None:
+            keys = self._arrays.keys()
+        
+        arrays = {key[len(self.prefix):]: self._arrays[key] for key in keys if key in self._arrays}
+        tmp_file = '{:}.{:}.tmp'.format(file_name, os.getpid())
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, **arrays)
+
+        os.rename(tmp_file, file_name)
+
+    def load(self, file_name):
+        """
+        Load arrays from npz file saved with save.  Loaded arrays are
+        not referenced until retained.
+
+        Returns
+        -------
+        list
+            Keys of loaded arrays
+        """
+        keys = []
+        data = np.load(file_name)
+        try:
+            for name in data.files:
+                key = self.prefix+name
+                if key not in self._arrays:
+                    value = data[name]
+                    value.flags.writeable = False
+                    self._arrays[key] = value
+                    self._refs[key] = 0
+                keys.append(key)
+        finally:
+            data.close()
+
+        return keys
+
+    @property
+    def nbytes(self):
+        """
+        Total size of stored arrays in bytes.
+        """
+        return sum(value.nbytes for value in self._arrays.values())
+
+    def __contains__(self, key):
+        return key in self._arrays
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def __str__(self):
+        return '{:} arrays, {:.1f} MB'.format(len(self), self.nbytes/1.e6)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
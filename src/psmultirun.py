@@ -0,0 +1,262 @@
+# standard python modules
+import os
+import time
+import heapq
+import traceback
+import numpy as np
+
+from psxarray import runstr_to_array, runlist_to_str
+
+def _open_run(exp, run, config_file=None, **kwargs):
+    """
+    Open DataSource for run and optionally load saved DataSource configuration.
+    """
+    import PyDataSource
+    ds = PyDataSource.DataSource(exp=exp, run=run, **kwargs)
+    if config_file:
+        ds.load_config(file_name=config_file)
+
+    return ds
+
+def _map_run(args):
+    """
+    Worker method to apply func to each event in a run.
+    Returns a list of (sec, nsec, run, ievent, result) tuples sorted by time
+    or None if the run failed.
+    """
+    exp, run, func, eventCodes, nevents, ds_kwargs = args
+    try:
+        ds = _open_run(exp, run, **ds_kwargs)
+        if eventCodes:
+            events = ds.events.filter(eventCodes=eventCodes)
+        else:
+            events = ds.events
+
+        results = []
+        for ievt, evt in enumerate(events):
+            if nevents and ievt >= nevents:
+                break
+
+            result = func(evt)
+            if result is not None:
+                eventId = evt.EventId
+                results.append((eventId.sec, eventId.nsec, run, ds._ievent, result))
+
+        return sorted(results, key=lambda a: a[0:4])
+
+    except:
+        print 'Error processing exp {:}, run {:}'.format(exp, run)
+        traceback.print_exc()
+        return None
+
+def _xarray_run(args):
+    """
+    Worker method to make xarray Dataset for a run.
+    """
+    exp, run, xarray_kwargs, ds_kwargs = args
+    try:
+        from psxarray import to_xarray
+        ds = _open_run(exp, run, **ds_kwargs)
+        x = to_xarray(ds, **xarray_kwargs)
+        x.coords['run'] = (['time'], np.ones(x.time.size, dtype=int)*run)
+        return x
+
+    except:
+        print 'Error making xarray for exp {:}, run {:}'.format(exp, run)
+        traceback.print_exc()
+        return None
+
+def _run_variables(x):
+    """
+    Names of variables in run xarray Dataset that do not have the time dim
+    and are not the index of a dim used by the time variables.
+    """
+    time_dims = set()
+    for name, var in x.variables.items():
+        if 'time' in var.dims:
+            time_dims.update(var.dims)
+    
+    return [name for name, var in x.variables.items() \
+            if 'time' not in var.dims and name not in time_dims]
+
+def _concat_runs(datasets, runs):
+    """
+    Concatenate xarray Datasets of runs along time.
+
+    Only variables with the time dim are concatenated.  Other variables
+    are added once if they are the same for all runs, otherwise they 
+    are added for each run with a run prefix (e.g., run0012_det_config).
+    Step variables (with the steps dim) are always added for each run 
+    (e.g., run0012_steps coord and dim).
+    """
+    import xarray as xr
+    run_names = [_run_variables(x) for x in datasets]
+    x = xr.concat([xrun.drop(names) for xrun, names in zip(datasets, run_names)], 
+                  dim='time', data_vars='minimal', coords='minimal')
+    
+    names = []
+    for item in run_names:
+        names.extend([name for name in item if name not in names])
+
+    for name in names:
+        items = [(run, xrun) for run, xrun in zip(runs, datasets) if name in xrun.variables]
+        var0 = items[0][1].variables[name]
+        shared = 'steps' not in var0.dims and len(items) == len(datasets) \
+                 and all(xrun.variables[name].equals(var0) for run, xrun in items)
+        for run, xrun in items:
+            var = xrun.variables[name]
+            if shared:
+                alias = name
+            else:
+                prefix = 'run{:04}_'.format(run)
+                alias = prefix+name
+                # dims not in concatenated Dataset (e.g., steps) are for this run
+                dims = [dim if x.dims.get(dim) == size else prefix+dim \
+                        for dim, size in zip(var.dims, var.shape)]
+                var = xr.Variable(dims, var.values, attrs=var.attrs)
+            
+            if name in xrun.coords:
+                x.coords[alias] = var
+            else:
+                x[alias] = var
+
+            if shared:
+                break
+
+    return x
+
+
+class MultiRun(object):
+    """
+    Process a list of runs concurrently with one PyDataSource.DataSource
+    per run in a pool of worker processes.
+
+    Parameters
+    ----------
+    exp : str
+        Experiment name
+    runs : str or list
+        List of runs or run string (e.g., '10:40' or '10,12,20:25')
+    nworkers : int
+        Number of worker processes (default = number of runs up to number of cpus)
+    config_file : str
+        DataSource configuration file from ds.save_config to load
+        for each run (e.g., to add the same detector AddOns)
+
+    Other keyword arguments are passed to PyDataSource.DataSource
+
+    Example
+    -------
+    import PyDataSource
+    def get_energy(evt):
+        return evt.EBeam.ebeamL3Energy
+
+    mr = PyDataSource.MultiRun(exp='xpptut15', runs='200:210')
+    for sec, nsec, run, ievent, energy in mr.map(get_energy):
+        ...
+    x = mr.to_xarray()
+    """
+
+    def __init__(self, exp=None, runs=None, nworkers=None, **kwargs):
+        import multiprocessing
+        self.exp = exp
+        if isinstance(runs, str):
+            runs = runstr_to_array(runs)
+        elif isinstance(runs, int):
+            runs = [runs]
+
+        self.runs = sorted([int(run) for run in runs])
+        if not nworkers:
+            nworkers = min(len(self.runs), multiprocessing.cpu_count())
+
+        self.nworkers = max(1, int(nworkers))
+        self._ds_kwargs = kwargs
+
+    def _pool_map(self, worker, args_list):
+        """
+        Map worker over args_list in process pool (or serially for one worker).
+        """
+        if self.nworkers == 1 or len(args_list) == 1:
+            return [worker(args) for args in args_list]
+
+        import multiprocessing
+        pool = multiprocessing.Pool(self.nworkers)
+        try:
+            return pool.map(worker, args_list, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    def map(self, func, eventCodes=None, nevents=None):
+        """
+        Apply func to each event in all runs and merge the results into a
+        single time ordered stream.
+
+        Parameters
+        ----------
+        func : function
+            Module level (picklable) function with the event as argument.
+            Events where func returns None are dropped.
+        eventCodes : list
+            Only process events passing event code selection (see ds.events.filter)
+        nevents : int
+            Maximum number of events to process per run
+
+        Returns
+        -------
+        iterator
+            (sec, nsec, run, ievent, result) tuples in time order
+        """
+        time0 = time.time()
+        args_list = [(self.exp, run, func, eventCodes, nevents, self._ds_kwargs) \
+                        for run in self.runs]
+        run_results = self._pool_map(_map_run, args_list)
+        self._check_failed(run_results, 'processing')
+        print '{:} runs processed in {:8.3f} sec'.format(len(self.runs), time.time()-time0)
+
+        return heapq.merge(*run_results)
+
+    def to_xarray(self, **kwargs):
+        """
+        Build xarray for each run with PyDataSource.psxarray.to_xarray
+        and concatenate along time with a run coordinate.
+        Step coordinates are kept separate for each run with a run prefix
+        (e.g., run0012_steps), and an Exception is raised listing any runs
+        that failed.
+
+        Keyword arguments are passed to to_xarray.
+        
+        See Also
+        --------
+        _concat_runs : function
+            Concatenation of run Datasets
+        """
+        from psxarray import resort
+        time0 = time.time()
+        kwargs.setdefault('save', False)
+        args_list = [(self.exp, run, kwargs, self._ds_kwargs) for run in self.runs]
+        datasets = self._pool_map(_xarray_run, args_list)
+        self._check_failed(datasets, 'making xarray for')
+        x = _concat_runs(datasets, self.runs)
+        x = x.isel(time=np.argsort(x.time.values, kind='mergesort'))
+        x.attrs['run'] = runlist_to_str(self.runs)
+        print '{:} runs processed in {:8.3f} sec'.format(len(self.runs), time.time()-time0)
+
+        return resort(x)
+
+    def _check_failed(self, results, action):
+        """
+        Raise Exception listing runs where the worker failed (returned None).
+        """
+        failed = [run for run, result in zip(self.runs, results) if result is None]
+        if failed:
+            raise Exception('Failed {:} exp {:} runs {:}'.format(action,
+                            self.exp, runlist_to_str(failed)))
+
+    def __str__(self):
+        return '{:}, Runs {:}, {:} workers'.format(self.exp, runlist_to_str(self.runs),
+                                                   self.nworkers)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
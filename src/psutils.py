@@ -395,6 +395,54 @@ def capture_print(executableStrThatPrints):
 
     return reportStr
 
+def import_benchmark(module='PyDataSource', heavy_modules=None, nrepeat=3, path=None):
+    """Time the import of a module in a new python process and check which 
+       heavy (plotting and analysis) modules are loaded as a side effect.
+
+    Parameters
+    ----------
+    module : str
+        Name of module to import (default = 'PyDataSource')
+    heavy_modules : list
+        Modules that should not be loaded on import 
+        (default = ['matplotlib', 'pylab', 'pandas', 'psmon', 'scipy'])
+    nrepeat : int
+        Number of times to repeat import -- minimum time is reported
+    path : str
+        Path to add to sys.path (default is parent of this package)
+
+    Returns
+    -------
+    dict
+        'time' : minimum import time [sec]
+        'loaded' : list of heavy modules that were loaded
+        'ok' : True if no heavy modules were loaded
+    """
+    if heavy_modules is None:
+        heavy_modules = ['matplotlib', 'pylab', 'pandas', 'psmon', 'scipy']
+    
+    if path is None:
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    code = '; '.join([
+            'import sys, time',
+            'sys.path.insert(0, {:})'.format(repr(path)),
+            'time0 = time.time()',
+            'import {:}'.format(module),
+            'print time.time()-time0',
+            'print " ".join(sorted(set(name.split(".")[0] for name in sys.modules)))',
+            ])
+    
+    times = []
+    loaded = []
+    for i in range(nrepeat):
+        output = subprocess.check_output([sys.executable, '-c', code]).strip().split('\n')
+        times.append(float(output[-2]))
+        modules = output[-1].split()
+        loaded = [name for name in heavy_modules if name in modules]
+
+    return {'time': min(times), 'loaded': loaded, 'ok': not loaded}
+
 # Use pandas to_json and read_json instead.
 #def write_json(dict_data, filename, indent=2, separators=(',',':'), 
 #               overwrite=False, **kwargs):
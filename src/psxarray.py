@@ -164,6 +164,9 @@ def open_h5netcdf(file_name=None, path='', file_base=None, exp=None, run=None,
 def to_h5netcdf(xdat=None, ds=None, file_name=None, path=None, 
         h5folder='scratch', subfolder='nc', **kwargs):
     """Write hdf5 file with netcdf4 convention using builtin xarray engine h5netcdf.
+
+    With stream=True the file is written in blocks of events by to_xarray
+    (with checkpoints to resume interrupted jobs).
     """
     if xdat:
         if xdat.__class__.__name__ == 'DataSource':
@@ -176,6 +179,9 @@ def to_h5netcdf(xdat=None, ds=None, file_name=None, path=None,
             import PyDataSource
             ds = PyDataSource.DataSource(**kwargs)
 
+        if kwargs.get('stream'):
+            return to_xarray(ds, file_name=file_name, path=path, **kwargs)
+
         xdat = to_xarray(ds, **kwargs)
     
     if not path:
@@ -205,6 +211,191 @@ def to_h5netcdf(xdat=None, ds=None, file_name=None, path=None,
 
     return xdat
 
+class StreamWriter(object):
+    """
+    Append blocks of events to an hdf5 file with netcdf4 convention and an
+    unlimited time dimension using h5netcdf.  Only one block of events needs 
+    to be held in memory.  The file can be opened with xarray (e.g., open_h5netcdf).
+
+    Parameters
+    ----------
+    file_name : str
+        Name of file
+    block_size : int
+        Number of events in each block
+    checkpoint : dict, optional
+        Checkpoint from load_checkpoint to resume appending to the 
+        partially written file of an interrupted job.
+    """
+
+    def __init__(self, file_name, block_size=1000, checkpoint=None):
+        import h5netcdf
+        self.file_name = file_name
+        self.block_size = int(block_size)
+        if checkpoint:
+            self._tmp_file = checkpoint['tmp_file']
+            self._time_vars = checkpoint['time_vars']
+            self._coords = checkpoint['coords']
+            self._file = h5netcdf.File(self._tmp_file, 'a')
+            # drop any rows written after the checkpoint
+            self.nrows = checkpoint['nrows']
+            self._file.resize_dimension('time', self.nrows)
+        else:
+            self._tmp_file = '{:}.{:}.tmp'.format(file_name, os.getpid())
+            self._time_vars = []
+            self._coords = []
+            self.nrows = 0
+            self._file = h5netcdf.File(self._tmp_file, 'w')
+            self._file.dimensions['time'] = None
+
+    @staticmethod
+    def _checkpoint_file(file_name):
+        return file_name+'.checkpoint'
+
+    @staticmethod
+    def load_checkpoint(file_name):
+        """
+        Load checkpoint saved for file_name.  Returns None if there is 
+        no checkpoint or the partially written file no longer exists.
+        """
+        import json
+        checkpoint_file = StreamWriter._checkpoint_file(file_name)
+        if not os.path.isfile(checkpoint_file):
+            return None
+
+        try:
+            with open(checkpoint_file) as f:
+                checkpoint = json.load(f)
+        except:
+            print 'Cannot read checkpoint {:}'.format(checkpoint_file)
+            traceback.print_exc()
+            return None
+
+        if not os.path.isfile(checkpoint.get('tmp_file', '')):
+            return None
+
+        return checkpoint
+
+    def save_checkpoint(self, **kwargs):
+        """
+        Save checkpoint of the rows written so far with additional information 
+        in kwargs needed to resume (e.g., last event index and config hash).
+        """
+        import json
+        checkpoint = {'file_name': self.file_name,
+                      'tmp_file': self._tmp_file,
+                      'nrows': self.nrows,
+                      'time_vars': self._time_vars,
+                      'coords': self._coords,
+                      'time': time.time()}
+        checkpoint.update(**kwargs)
+        checkpoint_file = self._checkpoint_file(self.file_name)
+        tmp_file = '{:}.{:}.tmp'.format(checkpoint_file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            json.dump(checkpoint, f)
+
+        os.rename(tmp_file, checkpoint_file)
+
+    def discard(self):
+        """
+        Close and remove partially written file and checkpoint.
+        """
+        self._file.close()
+        for file_name in [self._tmp_file, self._checkpoint_file(self.file_name)]:
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+    def _create_dims(self, dims, shape):
+        for dim, size in zip(dims, shape):
+            if dim not in self._file.dimensions:
+                self._file.dimensions[dim] = size
+
+    def create_variable(self, name, dims, dtype=float, data=None, shape=None, 
+                        attrs={}, coord=False):
+        """
+        Create variable.  Variables with 'time' as the first dimension are appended
+        by write (with shape of the other dimensions), and other variables are 
+        written with data.
+        """
+        dims = tuple(dims)
+        if shape is not None:
+            self._create_dims(dims[1:], shape)
+        
+        if data is not None:
+            data = np.asarray(data)
+            if data.dtype.kind == 'U':
+                data = data.astype(str)
+            dtype = data.dtype
+            self._create_dims(dims, data.shape)
+        
+        if dims and dims[0] == 'time':
+            shape = tuple(self._file.dimensions[dim] for dim in dims[1:])
+            # limit hdf5 chunks to about 4 MB
+            row_size = int(np.prod(shape))*np.dtype(dtype).itemsize
+            chunks = (max(1, min(self.block_size, (1 << 22)//max(row_size, 1))),)+shape
+            var = self._file.create_variable(name, dims, dtype=dtype, chunks=chunks)
+            self._time_vars.append(name)
+        else:
+            var = self._file.create_variable(name, dims, data=data)
+
+        for attr, val in attrs.items():
+            if val is None:
+                val = ''
+            try:
+                var.attrs[attr] = val
+            except:
+                print 'cannot write attr {:} of {:}'.format(attr, name)
+        
+        if coord:
+            self._coords.append(name)
+
+        return var
+
+    def write(self, columns, nrows):
+        """
+        Append first nrows rows of each time variable in columns dictionary.
+        """
+        if nrows <= 0:
+            return
+
+        nrows0 = self.nrows
+        self.nrows += nrows
+        self._file.resize_dimension('time', self.nrows)
+        for name, vals in columns.items():
+            self._file.variables[name][nrows0:self.nrows] = vals[:nrows]
+
+        self._file.flush()
+
+    def close(self, attrs={}):
+        """
+        Write global attrs and close file.
+        """
+        for attr, val in attrs.items():
+            try:
+                self._file.attrs[attr] = val
+            except:
+                print 'cannot write attr {:}'.format(attr)
+
+        self._file.close()
+        os.rename(self._tmp_file, self.file_name)
+        checkpoint_file = self._checkpoint_file(self.file_name)
+        if os.path.isfile(checkpoint_file):
+            os.remove(checkpoint_file)
+
+    def open(self):
+        """
+        Open file as xarray Dataset.
+        """
+        import xarray as xr
+        x = xr.open_dataset(self.file_name, engine='h5netcdf')
+        return x.set_coords([coord for coord in self._coords if coord in x.data_vars])
+
+    def __str__(self):
+        return '{:} with {:} events'.format(self.file_name, self.nrows)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
 def to_summary(x, dim='time', groupby='step', 
         save_summary=False,
         normby=None,
@@ -265,6 +456,311 @@ def to_summary(x, dim='time', groupby='step',
 
     return x
 
+class SummaryAccumulator(object):
+    """
+    Single pass summary statistics for each step (or other groupby value).
+
+    The count, mean, variance (Welford/Chan update), min and max of each
+    variable are updated with each event or block of events, ignoring nan 
+    values like xarray.  Like psxarray.to_summary, events where a 
+    'Damage_cut' variable is False are left out.  Accumulators filled from 
+    different chunks of a run (e.g., in parallel workers) can be combined 
+    with merge, and the accumulated state can be saved as a JSON compatible 
+    dictionary with get_state (e.g., in to_xarray stream checkpoints).
+    to_summary gives the same Dataset layout as psxarray.to_summary
+    without keeping the event level data.
+
+    Parameters
+    ----------
+    groupby : str
+        Name of groupby coordinate [default = 'step']
+    stats : list
+        List of statistics for summary.
+        Default = ['mean', 'std', 'min', 'max', 'count']
+    omit_list : list
+        List of variables to omit
+
+    Example
+    -------
+    summary = SummaryAccumulator()
+    x = to_xarray(ds, stream=True, summary=summary)
+    xsum = summary.to_summary()
+    """
+
+    _stats = ['mean', 'std', 'var', 'min', 'max', 'count', 'sum']
+
+    def __init__(self, groupby='step', 
+            stats=['mean', 'std', 'min', 'max', 'count'],
+            omit_list=['run', 'sec', 'nsec', 'fiducials', 'ticks']):
+        for stat in stats:
+            if stat not in self._stats:
+                raise ValueError('{:} is not a valid stat -- must be in {:}'.format(stat, self._stats))
+
+        self.groupby = groupby
+        self.stats = list(stats)
+        self.omit_list = list(omit_list)
+        self.attrs = {}
+        self.nevents = 0
+        self._vars = {}
+
+    def _add_var(self, name, dims, attrs={}):
+        if name not in self._vars:
+            self._vars[name] = {'dims': tuple(dims), 'attrs': dict(attrs), 'steps': {}}
+        elif attrs and not self._vars[name]['attrs']:
+            self._vars[name]['attrs'] = dict(attrs)
+
+    @staticmethod
+    def _block_stats(vals):
+        """
+        count, mean, M2, min and max of block of values (event axis first).
+        """
+        vals = np.asarray(vals, dtype=float)
+        valid = ~np.isnan(vals)
+        count = valid.sum(axis=0)
+        ncount = np.maximum(count, 1)
+        mean = np.where(valid, vals, 0.).sum(axis=0)/ncount
+        m2 = (np.where(valid, vals-mean, 0.)**2).sum(axis=0)
+        vmin = np.where(valid, vals, np.inf).min(axis=0)
+        vmax = np.where(valid, vals, -np.inf).max(axis=0)
+        empty = count == 0
+        vmin = np.where(empty, np.nan, vmin)
+        vmax = np.where(empty, np.nan, vmax)
+        return [count, mean, m2, vmin, vmax]
+
+    @staticmethod
+    def _combine(a, b):
+        """
+        Combine count, mean, M2, min and max of two sets of values.
+        """
+        na, ma, m2a, mina, maxa = a
+        nb, mb, m2b, minb, maxb = b
+        n = na+nb
+        nn = np.maximum(n, 1)
+        delta = mb-ma
+        mean = ma+delta*nb/nn
+        m2 = m2a+m2b+delta**2*na*nb/nn
+        return [n, mean, m2, np.fmin(mina, minb), np.fmax(maxa, maxb)]
+
+    def _update(self, name, step, block):
+        steps = self._vars[name]['steps']
+        if step in steps:
+            steps[step] = self._combine(steps[step], block)
+        else:
+            steps[step] = block
+
+    def add(self, step, values, dims={}, attrs={}):
+        """
+        Add one event.
+
+        Parameters
+        ----------
+        step : int
+            groupby value of event (e.g., step number)
+        values : dict
+            Values of each variable
+        dims : dict
+            Dimension names (without event dimension) of each array variable
+        attrs : dict
+            Attributes of each variable
+        """
+        steps = np.array([step])
+        self.add_block(steps, {name: np.asarray(val)[np.newaxis] for name, val in values.items()},
+                       dims=dims, attrs=attrs)
+
+    def add_block(self, steps, values, dims={}, attrs={}):
+        """
+        Add block of events.
+
+        Parameters
+        ----------
+        steps : array-like
+            groupby value of each event
+        values : dict
+            Arrays of each variable with the event axis first 
+        dims : dict
+            Dimension names (without event dimension) of each array variable
+        attrs : dict
+            Attributes of each variable
+        """
+        steps = np.asarray(steps)
+        if steps.size == 0:
+            return
+        
+        if 'Damage_cut' in values:
+            # leave out damaged events as in psxarray.to_summary
+            keep = np.asarray(values['Damage_cut'])[:steps.size].astype(bool)
+            steps = steps[keep]
+            values = {name: np.asarray(vals)[:keep.size][keep] for name, vals in values.items() \
+                      if name != 'Damage_cut'}
+            if steps.size == 0:
+                return
+
+        self.nevents += steps.size
+        usteps = np.unique(steps)
+        for name, vals in values.items():
+            if name in self.omit_list or name == self.groupby:
+                continue
+            
+            vals = np.asarray(vals)
+            if vals.dtype.kind not in 'biuf':
+                continue
+
+            vals = vals[:steps.size]
+            self._add_var(name, dims.get(name, ['{:}_d{:}'.format(name, i) \
+                                for i in range(vals.ndim-1)]), attrs.get(name, {}))
+            for step in usteps:
+                if usteps.size == 1:
+                    block = self._block_stats(vals)
+                else:
+                    block = self._block_stats(vals[steps == step])
+                self._update(name, step.item(), block)
+
+    def add_dataset(self, x, dim='time'):
+        """
+        Add events in xarray Dataset (e.g., chunk of a run).
+        """
+        self.attrs.update(x.attrs)
+        if self.groupby:
+            steps = x[self.groupby].values
+        else:
+            steps = np.zeros(x.dims[dim], dtype=int)
+
+        values = {}
+        dims = {}
+        attrs = {}
+        for name in list(x.data_vars)+list(x.coords):
+            item = x[name]
+            if name != dim and item.dims and item.dims[0] == dim:
+                values[name] = item.values
+                dims[name] = item.dims[1:]
+                attrs[name] = item.attrs
+        
+        self.add_block(steps, values, dims=dims, attrs=attrs)
+
+    def merge(self, other):
+        """
+        Merge accumulator from another chunk of events into this one.
+        """
+        self.nevents += other.nevents
+        for attr, val in other.attrs.items():
+            self.attrs.setdefault(attr, val)
+        
+        for name, item in other._vars.items():
+            self._add_var(name, item['dims'], item['attrs'])
+            for step, block in item['steps'].items():
+                self._update(name, step, block)
+
+        return self
+
+    def get_state(self):
+        """
+        Accumulated state as a JSON compatible dictionary (see set_state).
+        The (count, mean, M2, min, max) of each step are saved as lists.
+        """
+        state = {'groupby': self.groupby,
+                 'nevents': self.nevents,
+                 'attrs': _json_attrs(self.attrs),
+                 'vars': {}}
+        for name, item in self._vars.items():
+            state['vars'][name] = {'dims': list(item['dims']), 
+                                   'attrs': _json_attrs(item['attrs']),
+                                   'steps': [[step]+[np.asarray(val).tolist() for val in block] \
+                                             for step, block in item['steps'].items()]}
+
+        return state
+
+    def set_state(self, state):
+        """
+        Restore accumulated state saved with get_state.
+        """
+        if state.get('groupby') != self.groupby:
+            raise ValueError('State is grouped by {:} instead of {:}'.format(
+                             state.get('groupby'), self.groupby))
+
+        self.nevents = state['nevents']
+        self.attrs = dict(state['attrs'])
+        self._vars = {}
+        for name, item in state['vars'].items():
+            steps = {}
+            for vals in item['steps']:
+                step = vals[0]
+                count = np.array(vals[1], dtype=int)
+                steps[step] = [count]+[np.array(val, dtype=float) for val in vals[2:]]
+            
+            self._vars[name] = {'dims': tuple(item['dims']), 'attrs': dict(item['attrs']), 
+                                'steps': steps}
+
+    def to_summary(self):
+        """
+        Summary xarray Dataset with 'stat' and groupby dimensions.
+        """
+        import xarray as xr
+        groupby = self.groupby or 'group'
+        steps = sorted(set(step for item in self._vars.values() for step in item['steps']))
+        x = xr.Dataset()
+        for name, item in self._vars.items():
+            stat_vals = {stat: [] for stat in self.stats}
+            for step in steps:
+                block = item['steps'].get(step)
+                if block is None:
+                    continue
+                count, mean, m2, vmin, vmax = block
+                empty = count == 0
+                ncount = np.maximum(count, 1)
+                var = np.where(empty, np.nan, m2/ncount)
+                step_vals = {'mean': np.where(empty, np.nan, mean),
+                             'std': np.sqrt(var),
+                             'var': var,
+                             'min': vmin,
+                             'max': vmax,
+                             'count': count,
+                             'sum': mean*count}
+                for stat in self.stats:
+                    stat_vals[stat].append(step_vals[stat])
+
+            if len(stat_vals[self.stats[0]]) != len(steps):
+                # variable not in all steps
+                shape = np.shape(stat_vals[self.stats[0]][0])
+                vals = np.empty((len(self.stats), len(steps))+shape)
+                vals.fill(np.nan)
+                isteps = [i for i, step in enumerate(steps) if step in item['steps']]
+                for istat, stat in enumerate(self.stats):
+                    vals[istat, isteps] = stat_vals[stat]
+            else:
+                vals = np.array([stat_vals[stat] for stat in self.stats], dtype=float)
+            
+            x[name] = (('stat', groupby)+item['dims'], vals)
+            x[name].attrs.update(item['attrs'])
+
+        x.coords['stat'] = self.stats
+        x.coords[groupby] = steps
+        x.attrs.update(self.attrs)
+        x.attrs['nevents_summary'] = self.nevents
+
+        return resort(x)
+
+    def __str__(self):
+        return '{:} variables, {:} events'.format(len(self._vars), self.nevents)
+
+    def __repr__(self):
+        return '< {:}: {:} >'.format(self.__class__.__name__, str(self))
+
+def _json_attrs(attrs):
+    """
+    Copy of attrs dictionary with values that can be saved with json.
+    """
+    jattrs = {}
+    for attr, val in attrs.items():
+        if isinstance(val, (np.ndarray, np.generic)):
+            val = val.tolist()
+        elif isinstance(val, (list, tuple)):
+            val = [v.item() if isinstance(v, np.generic) else v for v in val]
+        elif val is not None and not isinstance(val, (basestring, bool, int, long, float)):
+            val = str(val)
+        jattrs[str(attr)] = val
+
+    return jattrs
+
 def add_steps(x, attr, name=None):
     vals = getattr(x, attr).values
     steps = np.sort(list(set(vals)))
@@ -301,7 +797,9 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
         code_flags={'XrayOff': [162], 'XrayOn': [-162]},
         pvs=[], epics_attrs=[], 
         eventCodes=None, config=None, 
-        save=None, **kwargs):
+        save=None, nworkers=None, 
+        stream=False, block_size=1000, file_name=None, path=None, resume=True, 
+        summary=None, **kwargs):
     """
     Build xarray object from PyDataSource.DataSource object.
        
@@ -311,6 +809,32 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
         Maximum array size of data objects to build into xarray.
     ichunk: int
         chunk index (skip ahead nevents*ichunk)
+    nworkers : int
+        Number of worker processes.  The run is split into nworkers chunks 
+        with equal numbers of events that are each processed with a new 
+        DataSource (with the AddOns of ds) and merged in time order.
+        Each worker reads its chunk by index from the first event of the chunk.
+        An Exception is raised if any chunk fails.
+    stream : bool
+        Write blocks of block_size events to an hdf5 file (netcdf4 convention)
+        with an unlimited time dimension so that only one block is held in 
+        memory, and return the Dataset opened from the file.
+    block_size : int
+        Number of events in each block for stream option (default = 1000)
+    file_name : str
+        File name for stream option (default = path/run####.nc)
+    path : str
+        Path for stream option (default in scratch/nc folder of experiment)
+    resume : bool
+        For stream option, resume from the checkpoint saved after the last 
+        written block of an interrupted job with the same AddOn configuration
+        and options (default = True).  The events after the last written event
+        (found from its time stamp) are read by index, so the written events 
+        are not read again.
+    summary : SummaryAccumulator
+        Accumulate summary statistics from the event buffers while processing 
+        events (by block for stream option with the accumulated state saved in 
+        checkpoints, and merged from chunks for nworkers option) 
     pvs: list
         List of pvs
     code_flags : dict
@@ -336,6 +860,21 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
         PyDataSource
         ds = PyDataSource.DataSource(**kwargs)
   
+    if stream and nworkers and nworkers > 1:
+        raise Exception('nworkers option is not supported with stream option')
+
+    if nworkers and nworkers > 1 and ichunk is None and not nevents and not stream:
+        xbase = _to_xarray_parallel(ds, nworkers, max_size=max_size, store_data=store_data,
+                    code_flags=code_flags, pvs=pvs, epics_attrs=epics_attrs, 
+                    eventCodes=eventCodes, summary=summary)
+        if save:
+            try:
+                to_h5netcdf(xbase)
+            except:
+                print 'Could not save to_h5netcdf'
+
+        return xbase
+
     adat = {}
     ds.reload()
     evt = ds.events.next(publish=publish, init=publish)
@@ -365,6 +904,12 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
         else:
             nevents = ds.nevents
  
+    # number of event rows held in memory
+    if stream:
+        nrows = min(int(block_size), nevents)
+    else:
+        nrows = nevents
+
     neventCodes = len(eventCodes)
     det_funcs = {}
     epics_pvs = {}
@@ -418,7 +963,8 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
             traceback.print_exc()
 
     axdat = {}
-    atimes = {}
+    abuf = {}
+    aattrs = {}
     btimes = []
     if not xbase:
         xbase = xr.Dataset()
@@ -429,8 +975,6 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
     for attr in ['instrument', 'experiment', 'expNum', 'calibDir']:
         xbase.attrs[attr] = getattr(ds, attr)
 
-    xbase.coords['time'] = np.zeros(nevents, dtype=dtime.datetime64.dtype)
-    
     ttypes = {'sec': 'int32', 
               'nsec': 'int32', 
               'fiducials': 'int32', 
@@ -439,22 +983,26 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
     
     # explicitly order EventId coords in desired order 
     print 'Begin processing {:} events'.format(nevents)
-    for attr in ['sec', 'nsec', 'fiducials', 'ticks', 'run']:
-        #dtyp = ttypes[attr]
-        #xbase.coords[attr] = (['time'], np.zeros(nevents,dtype=dtyp))
-        dtyp = int
-        xbase.coords[attr] = (['time'], np.zeros(nevents,dtype=int))
-
-    xbase.coords['step'] = (['time'], np.empty(nevents,dtype=int))
-    
-    # Event Codes -- earlier bool was not supported but now is. 
-    for code in eventCodes:
-        xbase.coords['ec{:}'.format(code)] = ('time', np.zeros(nevents, dtype=bool))
+    if not stream:
+        # event coords for stream option are created by the StreamWriter 
+        # and written in blocks
+        xbase.coords['time'] = np.zeros(nevents, dtype=dtime.datetime64.dtype)
+        for attr in ['sec', 'nsec', 'fiducials', 'ticks', 'run']:
+            #dtyp = ttypes[attr]
+            #xbase.coords[attr] = (['time'], np.zeros(nevents,dtype=dtyp))
+            dtyp = int
+            xbase.coords[attr] = (['time'], np.zeros(nevents,dtype=int))
+
+        xbase.coords['step'] = (['time'], np.empty(nevents,dtype=int))
+        
+        # Event Codes -- earlier bool was not supported but now is. 
+        for code in eventCodes:
+            xbase.coords['ec{:}'.format(code)] = ('time', np.zeros(nevents, dtype=bool))
 
-    for attr, ec in code_flags.items():
-        xbase.coords[attr] = ('time', np.zeros(nevents, dtype=bool))
-        xbase.coords[attr].attrs['doc'] = 'Event code flag: True if all positive and no negative "codes" are in eventCodes'
-        xbase.coords[attr].attrs['codes'] = ec
+        for attr, ec in code_flags.items():
+            xbase.coords[attr] = ('time', np.zeros(nevents, dtype=bool))
+            xbase.coords[attr].attrs['doc'] = 'Event code flag: True if all positive and no negative "codes" are in eventCodes'
+            xbase.coords[attr].attrs['codes'] = ec
 
     xbase.attrs['event_flags'] = code_flags.keys()
 
@@ -472,7 +1020,8 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
             for attr, vals in ds.configData.ScanData.control_values.items():
                 alias = ds.configData.ScanData.pvAliases[attr]
                 xbase.coords[alias+'_steps'] = (['steps'], vals) 
-                xbase.coords[alias] = ('time', np.zeros(nevents, dtype=bool))
+                if not stream:
+                    xbase.coords[alias] = ('time', np.zeros(nevents, dtype=bool))
 
         for attr in attrs:
             val = getattr(ds.configData.ScanData, attr)
@@ -483,10 +1032,13 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
     for srcstr, item in sorted(ds.configData._sources.items(), key=operator.itemgetter(0)):
         det = item['alias']
         if det in adat:
-            atimes[det] = []
             axdat[det] = xr.Dataset()
+            # event data is filled in numpy buffers and added to xarray after event loop
+            abuf[det] = {}
+            aattrs[det] = {}
             for attr, item in sorted(adat[det].items(), key=operator.itemgetter(0)):
-                axdat[det][attr] = (item[0], np.zeros(item[1]))
+                abuf[det][attr] = np.zeros((nrows,)+tuple(item[1][1:]))
+                aattrs[det][attr] = {}
             
             axdat[det].coords['steps'] = range(nsteps)
             axdat[det].coords['codes'] = eventCodes
@@ -544,7 +1096,7 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
                         attr_info.update({a, ''})
 
                 if 'event' in attr_func:
-                    axdat[det][alias].attrs.update(attrs_info)
+                    aattrs[det][alias].update(attrs_info)
                 
             coords = detector._xarray_info.get('coords')
             if coords:
@@ -565,24 +1117,139 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
     time0 = time.time()
     igood = -1
     aievt = {}
-    aievents = {}
+    aigood = {}
 
-    # keep track of events for each det
+    # keep track of events for each det (not needed for stream option where 
+    # detector data is on the same rows as the base event)
     for srcstr, srcitem in ds.configData._sources.items():
         det = srcitem.get('alias')
         aievt[det] = -1
-        aievents[det] = []
+        aigood[det] = []
+
+    # event coordinates filled in numpy buffers 
+    astep = np.empty(nrows, dtype=int)
+    acodes = {code: np.zeros(nrows, dtype=bool) for code in eventCodes}
+    aflags = {attr: np.zeros(nrows, dtype=bool) for attr in code_flags}
+    irow0 = 0
+    ievt_start = 0
+    ievent = -1
+    nerrors = 0
+    
+    if stream:
+        if summary is not None:
+            summary_options = {'groupby': summary.groupby, 'omit_list': summary.omit_list}
+        else:
+            summary_options = None
+        
+        config_hash = _xarray_config_hash(ds, nevents=nevents, ievent0=ievent0, 
+                max_size=max_size, store_data=store_data, code_flags=code_flags, 
+                eventCodes=eventCodes, pvs=pvs, block_size=nrows, summary=summary_options)
+        scan_aliases = {}
+        if ds.configData.ScanData and ds.configData.ScanData.nsteps > 1:
+            for attr, vals in ds.configData.ScanData.control_values.items():
+                scan_aliases[ds.configData.ScanData.pvAliases[attr]] = np.array(vals)
+        
+        apvs = {pv: np.empty(nrows) for pv in epics_pvs}
+        writer, checkpoint = _init_stream_writer(ds, xbase, axdat, abuf, adat, aattrs, 
+                    acodes, aflags, scan_aliases, apvs, code_flags, ttypes,
+                    file_name=file_name, path=path, ichunk=ichunk, block_size=nrows,
+                    resume=resume, config_hash=config_hash)
+        if checkpoint:
+            igood = checkpoint['igood']
+            irow0 = igood+1
+            ievent_last = checkpoint['ievent']
+            event_time = checkpoint.get('event_time')
+            if event_time and ds._time_index is not None:
+                # find last written event from its time stamp in the run time index
+                ievent_time = ds._time_index.find(tuple(event_time))
+                if ievent_time is not None and ievent_time != ievent_last:
+                    print 'Event {:} at time {:} of checkpoint is event {:} in {:}'.format(
+                            ievent_last, event_time, ievent_time, ds.data_source)
+                    ievent_last = ievent_time
+            
+            # events after the checkpoint are read by index (see below)
+            ievt_start = ievent_last+1-ievent0
+            if summary is not None and checkpoint.get('summary'):
+                # summary statistics of events written before checkpoint
+                summary.set_state(checkpoint['summary'])
+            print 'Resuming {:} from event {:} with {:} events written'.format(
+                    writer.file_name, ievent_last+1, writer.nrows)
+
+        summary_dims = {}
+        summary_attrs = {}
+        for det in abuf:
+            for alias in abuf[det]:
+                summary_dims[alias] = adat[det][alias][0][1:]
+                summary_attrs[alias] = aattrs[det][alias]
+
+        def write_block(nblock, ievent, igood):
+            """
+            Write block of events to file, save checkpoint and reset buffers.
+            """
+            columns = {'time': np.array([e.datetime64 for e in btimes], 
+                                        dtype='datetime64[ns]').astype('int64'),
+                       'step': astep}
+            for attr, dtyp in ttypes.items():
+                columns[attr] = np.array([getattr(e, attr) for e in btimes],dtype=dtyp)
+            for code, vals in acodes.items():
+                columns['ec{:}'.format(code)] = vals.astype('int8')
+            for attr, vals in aflags.items():
+                columns[attr] = vals.astype('int8')
+            for alias, vals in scan_aliases.items():
+                columns[alias] = vals[astep[:nblock]]
+            for det in abuf:
+                columns.update(abuf[det])
+            columns.update(apvs)
+            
+            if btimes:
+                event_time = [int(getattr(btimes[-1], attr)) for attr in ['sec', 'nsec', 'fiducials']]
+            else:
+                event_time = None
+
+            writer.write(columns, nblock)
+            if summary is not None:
+                summary.add_block(astep[:nblock], 
+                        {name: vals for name, vals in columns.items() if name != 'time'},
+                        dims=summary_dims, attrs=summary_attrs)
+                summary_state = summary.get_state()
+            else:
+                summary_state = None
+
+            writer.save_checkpoint(ievent=ievent, igood=igood, event_time=event_time, 
+                                   config_hash=config_hash, summary=summary_state)
+            for vals in acodes.values()+aflags.values():
+                vals.fill(False)
+            for det in abuf:
+                for vals in abuf[det].values():
+                    vals.fill(np.nan)
+            for vals in apvs.values():
+                vals.fill(np.nan)
+            del btimes[:]
+
+        for det in abuf:
+            for vals in abuf[det].values():
+                vals.fill(np.nan)
+        for vals in apvs.values():
+            vals.fill(np.nan)
   
     if ichunk is not None:
         print 'Making chunk {:}'.format(ichunk)
         print 'Starting with event {:} of {:}'.format(ievent0,ds.nevents)
         print 'Analyzing {:} events'.format(nevents)
         xbase.attrs['ichunk'] = ichunk
-        if ichunk > 1:
-            for i in range(ievent0):
-                evt = ds.events.next()
-        
-            print 'Previous event before current chunk:', evt
+
+    # Start a chunk (or resume) by reading events directly by index with the 
+    # run time index so the preceding events are not read.
+    ievent_first = ievent0+ievt_start
+    indexed = ievent_first > 0 and ds._time_index is not None
+    if indexed:
+        step_starts = _scan_step_starts(ds)
+        _set_idx_env(ds)
+        print 'Reading events by index starting with event {:}'.format(ievent_first)
+    elif ievent_first > 0:
+        # no index (e.g., shared memory) -- read through preceding events
+        for i in range(ievent_first):
+            ds.events._next_evt()
 
     if ichunk is not None:
         evtformat = '{:10.1f} sec, Event {:} of {:} in chunk with {:} accepted'
@@ -590,14 +1257,17 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
         evtformat = '{:10.1f} sec, Event {:} of {:} with {:} accepted'
     
     #for ievent in range(ds.nevents+1):
-    for ievt in range(nevents):
+    for ievt in range(ievt_start, nevents):
         ievent = ievent0+ievt
         if ievt > 0 and (ievt % 100) == 0:
             print evtformat.format(time.time()-time0, ievt, nevents, igood+1)
         
         if ievent < ds.nevents:
             try:
-                evt = ds.events.next(publish=publish, init=publish)
+                if indexed:
+                    evt = _read_event(ds, ievent, publish=publish, step_starts=step_starts)
+                else:
+                    evt = ds.events.next(publish=publish, init=publish)
             except:
                 ievent = -1
                 continue
@@ -613,47 +1283,101 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
             continue
         
         igood += 1
-        if igood+1 == nevents:
-            break
-
-        istep = ds._istep
-        xbase['step'][igood] = istep
+        irow = igood-irow0
+        astep[irow] = ds._istep
         btimes.append(dtime)
         for ec in evt.Evr.eventCodes:
-            if ec in eventCodes:
-                xbase['ec{:}'.format(ec)][igood] = True
+            if ec in acodes:
+                acodes[ec][irow] = True
 
         for attr, codes in code_flags.items():
             if evt.Evr.present(codes):
-                xbase.coords[attr][igood] = True
+                aflags[attr][irow] = True
 
         for pv, pvarray in epics_pvs.items():
             try:
                 val = float(ds.epicsData.getPV(pv).data()) 
-                pvarray.update({dtime: val})
+                if stream:
+                    apvs[pv][irow] = val
+                else:
+                    pvarray.update({dtime: val})
             except:
                 print 'cannot update pv', pv, dtime
 
         for det in evt._attrs:
             detector = evt._dets.get(det)
-            atimes[det].append(dtime)
-            aievt[det] += 1 
-            ievt = aievt[det]
-            aievents[det].append(ievent)
+            if stream:
+                # detector events are on the same rows as the base event
+                ievt = irow
+            else:
+                aievt[det] += 1 
+                ievt = aievt[det]
+                aigood[det].append(igood)
             
-            for attr, attr_func in det_funcs.get(det, {}).items():
-                vals = getattr(detector, attr)
+            # evaluate AddOn outputs together so shared inputs are only computed once
+            event_attrs = [attr for attr, attr_func in det_funcs.get(det, {}).items() \
+                                if 'event' in attr_func]
+            if hasattr(detector, 'reduction_plan'):
+                addon_vals = detector.reduction_plan(event_attrs).evaluate()
+            else:
+                addon_vals = {}
+
+            for attr in event_attrs:
+                attr_func = det_funcs[det][attr]
+                if attr in addon_vals:
+                    vals = addon_vals[attr]
+                elif attr == 'image' and hasattr(detector, '_buffered_image'):
+                    # copied into abuf so image buffer can be reused
+                    vals = detector._buffered_image()
+                else:
+                    vals = getattr(detector, attr)
                 alias = attr_func.get('alias')
-                if vals is not None and 'event' in attr_func:
+                if vals is not None:
                     # Fill event
                     try:
-                        
-                        axdat[det][alias][ievt] = vals
+                        abuf[det][alias][ievt] = vals
                     except:
-                        print 'Event Error', alias, det, attr, ievent, vals
-                        print axdat[det][alias][ievt].shape, vals.shape
-                        return axdat, vals
-                        vals = None
+                        # leave event unfilled and continue with next
+                        nerrors += 1
+                        print 'Event Error', alias, det, attr, ievent, \
+                                abuf[det][alias][ievt].shape, np.shape(vals)
+
+        if stream and irow+1 == nrows:
+            write_block(nrows, ievent, igood)
+            irow0 += nrows
+
+    if nerrors:
+        print 'WARNING: {:} values could not be filled (see Event Error messages)'.format(nerrors)
+        xbase.attrs['event_errors'] = nerrors
+
+    if stream:
+        write_block(igood+1-irow0, ievent, igood)
+        attrs = xbase.attrs.copy()
+        attrs['scan_variables'] = sorted(scan_aliases.keys())
+        attrs['correlation_variables'] = []
+        for pv in epics_attrs:
+            try:
+                attrs.update({pv: ds.epicsData.getPV(pv).data()[0]})
+            except:
+                print 'cannot att epics_attr', pv
+                traceback.print_exc()
+        
+        _set_idx_env(ds, False)
+        writer.close(attrs=attrs)
+        print 'Wrote {:}'.format(writer)
+        if summary is not None:
+            summary.attrs.update(attrs)
+
+        return resort(writer.open())
+
+    xbase.coords['step'] = (['time'], astep)
+    for code, vals in acodes.items():
+        xbase.coords['ec{:}'.format(code)] = (['time'], vals)
+    
+    for attr, vals in aflags.items():
+        xbase.coords[attr] = (['time'], vals)
+        xbase.coords[attr].attrs['doc'] = 'Event code flag: True if all positive and no negative "codes" are in eventCodes'
+        xbase.coords[attr].attrs['codes'] = code_flags[attr]
 
     xbase = xbase.isel(time=range(len(btimes)))
     xbase['time'] =  [e.datetime64 for e in btimes]
@@ -679,23 +1403,40 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
             print 'cannot att epics_attr', pv
             traceback.print_exc()
 
-    # cut down size of xdat
+    _set_idx_env(ds, False)
+
+    # Place detector event buffers on the base time axis (nan where the detector is 
+    # not in an event) and merge all detectors into the base Dataset at once.
+    # Variables are made for detectors without events so that chunks of a run 
+    # all have the same variables.
+    ntimes = len(btimes)
+    xdat = xr.Dataset(coords={'time': xbase.time})
+    summary_values = {}
+    summary_dims = {}
+    summary_attrs = {}
     det_list = [det for det in axdat]
     for det in np.sort(det_list):
-        nevents = len(atimes[det])
-        if nevents > 0 and det in axdat:
-            #try:
-                print 'merging', det
-                xdat = axdat.pop(det)
-                if 'time' in xdat:
-                    xdat = xdat.isel(time=range(nevents))
-                    xdat['time'] = [e.datetime64 for e in atimes[det]]
-                    xdat = xdat.reindex_like(xbase)
-        
-                xbase = xbase.merge(xdat)
-            
-            #except:
-            #    print 'Could not merge', det
+        nevents = len(aigood[det])
+        if det in axdat:
+            print 'merging', det
+            xdat = xdat.merge(axdat.pop(det))
+            igood_det = np.array(aigood[det][:nevents], dtype=int)
+            for alias, buf in abuf.pop(det).items():
+                dims = adat[det][alias][0]
+                if dims[0] == 'time':
+                    vals = np.empty((ntimes,)+buf.shape[1:], dtype=float)
+                    vals.fill(np.nan)
+                    vals[igood_det] = buf[:nevents]
+                else:
+                    vals = buf
+
+                xdat[alias] = (dims, vals)
+                xdat[alias].attrs.update(aattrs[det][alias])
+                summary_values[alias] = vals
+                summary_dims[alias] = dims[1:]
+                summary_attrs[alias] = aattrs[det][alias]
+
+    xbase = xbase.merge(xdat)
 
 
     attrs = [attr for attr,item in xbase.data_vars.items()] 
@@ -709,6 +1450,20 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
                               coords={'time': [e.datetime64 for e in pvdata.keys()]} )
         xbase = xbase.merge(xdat)
 
+    if summary is not None:
+        # summary statistics from the event buffers 
+        for code, vals in acodes.items():
+            summary_values['ec{:}'.format(code)] = vals[:ntimes]
+        for attr, vals in aflags.items():
+            summary_values[attr] = vals[:ntimes]
+        for alias in scan_variables:
+            summary_values[alias] = xbase.coords[alias+'_steps'].values[astep[:ntimes]]
+        for pv, pvdata in epics_pvs.items():
+            summary_values[pv] = np.array([pvdata.get(dtime, np.nan) for dtime in btimes])
+        
+        summary.add_block(astep[:ntimes], summary_values, dims=summary_dims, attrs=summary_attrs)
+        summary.attrs.update(xbase.attrs)
+
     xbase = resort(xbase)
 
     if save:
@@ -720,6 +1475,339 @@ def to_xarray(ds=None, nevents=None, max_size=10001,
     return xbase
 
 
+def _xarray_config_hash(ds, **kwargs):
+    """
+    Hash of DataSource AddOn configuration and to_xarray options 
+    used to check a checkpoint is valid.
+    """
+    import hashlib
+    import PyDataSource
+    md5 = hashlib.md5()
+    md5.update(str(ds.data_source))
+    PyDataSource._update_hash(md5, ds._device_sets)
+    PyDataSource._update_hash(md5, kwargs)
+    return md5.hexdigest()
+
+def _init_stream_writer(ds, xbase, axdat, abuf, adat, aattrs, 
+        acodes, aflags, scan_aliases, apvs, code_flags, ttypes,
+        file_name=None, path=None, ichunk=None, block_size=1000,
+        resume=True, config_hash=None):
+    """
+    Create StreamWriter with the variables of to_xarray or resume
+    from checkpoint with the same config_hash.
+
+    Returns
+    -------
+    tuple
+        (StreamWriter, checkpoint dict or None)
+    """
+    if not path:
+        path = '/reg/d/psdm/{:}/{:}/scratch/nc/'.format(ds.instrument, ds.experiment)
+
+    if not os.path.isdir(path):
+        os.mkdir(path)
+
+    if not file_name:
+        if ichunk is not None:
+            file_name = '{:}/run{:04}_c{:03}.nc'.format(path, int(ds.data_source.run), ichunk)
+        else:
+            file_name = '{:}/run{:04}.nc'.format(path, int(ds.data_source.run))
+
+    checkpoint = StreamWriter.load_checkpoint(file_name)
+    if checkpoint:
+        if resume and checkpoint.get('config_hash') == config_hash:
+            return StreamWriter(file_name, block_size=block_size, checkpoint=checkpoint), checkpoint
+        
+        if resume:
+            print 'Configuration changed since checkpoint -- starting {:} over'.format(file_name)
+        
+        os.remove(checkpoint['tmp_file'])
+
+    writer = StreamWriter(file_name, block_size=block_size)
+    
+    # coordinates without time dimension
+    coords = [xbase.coords]+[axdat[det].coords for det in sorted(axdat)]
+    for xcoords in coords:
+        for coord, item in xcoords.items():
+            if 'time' not in item.dims and coord not in writer._file.variables:
+                writer.create_variable(coord, item.dims, data=item.values, 
+                                       attrs=item.attrs, coord=True)
+
+    # event coordinates
+    writer.create_variable('time', ['time'], dtype='int64', coord=True,
+            attrs={'units': 'nanoseconds since 1970-01-01', 'calendar': 'proleptic_gregorian'})
+    for attr, dtyp in ttypes.items():
+        writer.create_variable(attr, ['time'], dtype=dtyp, coord=True)
+
+    writer.create_variable('step', ['time'], dtype=int, coord=True)
+    for code in acodes:
+        writer.create_variable('ec{:}'.format(code), ['time'], dtype='int8', 
+                               attrs={'dtype': 'bool'}, coord=True)
+
+    for attr in aflags:
+        writer.create_variable(attr, ['time'], dtype='int8', coord=True,
+                attrs={'dtype': 'bool', 'codes': code_flags[attr],
+                       'doc': 'Event code flag: True if all positive and no negative "codes" are in eventCodes'})
+
+    for alias in scan_aliases:
+        writer.create_variable(alias, ['time'], dtype=float, coord=True)
+    
+    # event data
+    for det in sorted(abuf):
+        for alias, buf in sorted(abuf[det].items()):
+            writer.create_variable(alias, adat[det][alias][0], dtype=float, shape=buf.shape[1:],
+                                   attrs=aattrs[det][alias])
+
+    for pv in apvs:
+        writer.create_variable(pv, ['time'], dtype=float)
+
+    return writer, None
+
+def _scan_step_starts(ds):
+    """
+    Index of the first event in each step of the run (None if not available).
+    """
+    try:
+        if ds.configData.ScanData:
+            return np.asarray(ds.configData.ScanData._scanData['ievent_start'])
+    except:
+        traceback.print_exc()
+    
+    return None
+
+def _set_idx_env(ds, idx=True):
+    """
+    Use the env of the idx run opened with smd data for configuration, epics 
+    and detectors while reading events by index (see _read_event), since the 
+    env of the smd DataSource is not updated by indexed reads.
+    Set idx=False to go back to the smd DataSource env.
+    """
+    import PyDataSource
+    if not ds.data_source.smd:
+        return
+
+    if idx and '_smd_state' not in ds.__dict__:
+        ds._smd_state = (ds._ds, ds._istep)
+        ds._ds = ds._idx_ds
+        # step config is loaded on next read
+        ds._istep = -1
+    elif not idx and '_smd_state' in ds.__dict__:
+        ds._ds, ds._istep = ds.__dict__.pop('_smd_state')
+    else:
+        return
+
+    ds.epicsData = PyDataSource.EpicsData(ds._ds)
+    # psana.Detector objects use the env
+    ds._init_detectors(reuse=False, reload=False)
+
+def _read_event(ds, ievent, publish=False, step_starts=None):
+    """
+    Read event with index ievent in the run directly with the indexed run
+    (idx data source or the idx run opened with smd data -- see _set_idx_env).
+    For smd data the step is set from step_starts (see _scan_step_starts) 
+    and the step configuration is loaded when the step changes.
+    """
+    import PyDataSource
+    ievent = int(ievent)
+    if ds.data_source.idx:
+        return ds.events.next(ievent, publish=publish, init=publish)
+
+    if ds._prefetcher is not None:
+        evt = ds._prefetcher.event(ievent)
+    else:
+        evt = ds._idx_run.event(ds._idx_times[ievent])
+    
+    if step_starts is not None:
+        istep = int(np.searchsorted(step_starts, ievent, side='right'))-1
+        if istep != ds._istep:
+            # env configStore is updated for the step of the event read
+            ds._istep = istep
+            ds._init_detectors(reuse=True, reload=False)
+
+    ds._ievent = ievent
+    ds._set_current_evt(evt)
+    return PyDataSource.EvtDetectors(ds, publish=publish, init=publish)
+
+def _data_source_kwargs(ds):
+    """
+    Keyword arguments to open the DataSource of ds in another process
+    with the same data source options (e.g., dir or ffb) and DataSource
+    options (e.g., prefetch).
+    """
+    return {'data_source': str(ds.data_source),
+            'scan_cache': ds._scan_cache,
+            'geometry_cache': ds._geometry_cache,
+            'prefetch': ds._prefetch,
+            'prefetch_memory': ds._prefetch_memory}
+
+def _xarray_chunk(args):
+    """
+    Worker method to make xarray Dataset for one chunk of a run.
+    """
+    exp, run, ichunk, nchunks, config_file, xarray_kwargs, ds_kwargs = args
+    try:
+        from psmultirun import _open_run
+        time0 = time.time()
+        ds = _open_run(exp, run, config_file=config_file, **ds_kwargs)
+        x = to_xarray(ds, ichunk=ichunk, nchunks=nchunks, chunk_steps=False, 
+                      save=False, **xarray_kwargs)
+        return ichunk, x, time.time()-time0, xarray_kwargs.get('summary')
+
+    except:
+        print 'Error making xarray for exp {:}, run {:}, chunk {:}'.format(exp, run, ichunk)
+        traceback.print_exc()
+        return ichunk, None, 0., None
+
+def _to_xarray_parallel(ds, nworkers, summary=None, **kwargs):
+    """
+    Make xarray Dataset with nworkers processes each building one chunk
+    with the same number of events and merge chunks in time order.
+    The DataSource configuration (e.g., AddOns) is passed to the workers
+    through a temporary file from ds.save_config.
+    """
+    import multiprocessing
+    import tempfile
+    import xarray as xr
+    nchunks = int(nworkers)
+    exp = ds.data_source.exp
+    run = ds.data_source.run
+    
+    config_file = None
+    try:
+        fd, config_file = tempfile.mkstemp(suffix='.config')
+        os.close(fd)
+        ds.save_config(file_name=config_file)
+    except:
+        print 'Cannot save DataSource config for workers -- AddOns will not be included'
+        traceback.print_exc()
+        config_file = None
+
+    print 'Processing {:} events in {:} chunks with {:} workers'.format(ds.nevents, 
+            nchunks, nworkers)
+    if summary is not None:
+        # each worker fills a new accumulator with the same options
+        kwargs['summary'] = SummaryAccumulator(groupby=summary.groupby, 
+                stats=summary.stats, omit_list=summary.omit_list)
+
+    ds_kwargs = _data_source_kwargs(ds)
+    args_list = [(exp, run, ichunk, nchunks, config_file, kwargs, ds_kwargs) \
+                    for ichunk in range(1, nchunks+1)]
+    
+    time0 = time.time()
+    datasets = {}
+    failed = []
+    nevents_done = 0
+    pool = multiprocessing.Pool(nchunks)
+    try:
+        for ichunk, x, dt, chunk_summary in pool.imap_unordered(_xarray_chunk, args_list):
+            if x is None:
+                failed.append(ichunk)
+                continue
+            
+            # merge summary statistics accumulated by worker
+            if summary is not None and chunk_summary is not None:
+                summary.merge(chunk_summary)
+
+            datasets[ichunk] = x
+            nevents_done += x.time.size
+            dtime = time.time()-time0
+            print '{:10.1f} sec, chunk {:} of {:} done in {:8.1f} sec -- {:} events at {:8.1f} events/sec'.format( \
+                    dtime, len(datasets), nchunks, dt, nevents_done, nevents_done/max(dtime, 1.e-9))
+    finally:
+        pool.close()
+        pool.join()
+        if config_file:
+            for file_name in [config_file, config_file+'.npz']:
+                if os.path.isfile(file_name):
+                    os.remove(file_name)
+
+    if failed:
+        raise Exception('to_xarray failed for chunks {:} of {:} (see worker errors above)'.format(
+                        sorted(failed), nchunks))
+
+    x = xr.concat([datasets[ichunk] for ichunk in sorted(datasets)], dim='time', 
+                  data_vars='minimal')
+    x = x.isel(time=np.argsort(x.time.values, kind='mergesort'))
+    if 'ichunk' in x.attrs:
+        del x.attrs['ichunk']
+    x.attrs['nchunks'] = nchunks
+
+    return resort(x)
+
+def benchmark_fill(nevents=10000, shape=(100,), nattrs=10, fraction=0.9):
+    """
+    Benchmark filling event data into xarray with per event xarray assignment
+    and per detector reindex and merge (previous to_xarray method) against
+    filling numpy buffers and building the Dataset once (current method).
+
+    Parameters
+    ----------
+    nevents : int
+        Number of events
+    shape : tuple
+        Shape of each event data array
+    nattrs : int
+        Number of data arrays
+    fraction : float
+        Fraction of events with detector data
+
+    Returns
+    -------
+    dict
+        Time in sec for 'xarray' and 'numpy' methods and 'speedup'
+    """
+    import xarray as xr
+    times = np.arange(nevents)
+    idet = np.sort(np.random.choice(nevents, int(nevents*fraction), replace=False))
+    data = np.random.rand(idet.size, *shape)
+    dims = ['time']+['d{:}'.format(i) for i in range(len(shape))]
+    attrs = ['attr{:}'.format(i) for i in range(nattrs)]
+    
+    time0 = time.time()
+    xbase = xr.Dataset(coords={'time': times})
+    xbase.coords['step'] = (['time'], np.zeros(nevents, dtype=int))
+    xdat = xr.Dataset()
+    for attr in attrs:
+        xdat[attr] = (dims, np.zeros((nevents,)+shape))
+    for ievt, ievent in enumerate(idet):
+        xbase['step'][ievent] = 1
+        for attr in attrs:
+            xdat[attr][ievt] = data[ievt]
+    xdat = xdat.isel(time=range(idet.size))
+    xdat['time'] = times[idet]
+    xdat = xdat.reindex_like(xbase)
+    x_xarray = xbase.merge(xdat)
+    time_xarray = time.time()-time0
+
+    time0 = time.time()
+    xbase = xr.Dataset(coords={'time': times})
+    astep = np.zeros(nevents, dtype=int)
+    abuf = {attr: np.zeros((nevents,)+shape) for attr in attrs}
+    aigood = []
+    for ievt, ievent in enumerate(idet):
+        astep[ievent] = 1
+        aigood.append(ievent)
+        for attr in attrs:
+            abuf[attr][ievt] = data[ievt]
+    xbase.coords['step'] = (['time'], astep)
+    xdat = xr.Dataset(coords={'time': xbase.time})
+    for attr, buf in abuf.items():
+        vals = np.empty((nevents,)+shape)
+        vals.fill(np.nan)
+        vals[aigood] = buf[:len(aigood)]
+        xdat[attr] = (dims, vals)
+    x_numpy = xbase.merge(xdat)
+    time_numpy = time.time()-time0
+
+    if not x_numpy.equals(x_xarray):
+        print 'WARNING: xarray and numpy methods do not give the same result'
+
+    print 'xarray assignment: {:8.3f} sec'.format(time_xarray)
+    print 'numpy buffers:     {:8.3f} sec'.format(time_numpy)
+    
+    return {'xarray': time_xarray, 'numpy': time_numpy, 
+            'speedup': time_xarray/max(time_numpy, 1.e-9)}
+
 def normalize_data(x, variables=[], norm_attr='PulseEnergy', name='norm', quiet=True):
     """
     Normalize a list of variables with norm_attr [default = 'PulseEnergy']
@@ -759,7 +1847,7 @@ def resort(x):
 
     return x
 
-def map_indexes(xx, yy, ww):                                                                      
+def map_indexes(xx, yy, ww, out=None):
     """
     Simplified map method from PSCalib.GeometryAccess.img_from_pixel_arrays
     
@@ -771,13 +1859,20 @@ def map_indexes(xx, yy, ww):
         Array of y coordinates
     ww : array-like
         Array of weights
+    out : array-like, optional
+        Reused output image array (see also psgeometry.ImageAssembler)
 
     Returns
     -------
     2D image array
 
     """
-    a = np.zeros([xx.max()+1,yy.max()+1])
+    if out is None:
+        a = np.zeros([xx.max()+1,yy.max()+1])
+    else:
+        a = out
+        a.fill(0)
+    
     a[xx,yy] = ww
     return a
 
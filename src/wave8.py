@@ -1,7 +1,7 @@
 import PyDataSource
 import os
 
-from pylab import *
+import numpy as np
 
 class Wave8(PyDataSource.Detector):
     """Wave8 Functions.
@@ -0,0 +1,218 @@
+#--------------------------------------------------------------------------
+# Description:
+#  Unit tests for PyDataSource event time index and configuration fingerprints.
+#
+#  EventTimeIndexTest and ConfigFingerprintTest use python stand-ins for 
+#  psana.EventTime and configStore types.
+#
+#  The step tests need an smd run with more than one step, which is given 
+#  by the PYDATASOURCE_TEST_SCAN environment variable 
+#  (default exp=xpptut15:run=54:smd) and are skipped if it cannot be opened.
+#------------------------------------------------------------------------
+import os
+import hashlib
+import unittest
+
+import numpy as np
+
+from PyDataSource import PyDataSource
+
+
+def _hash(value):
+    md5 = hashlib.md5()
+    PyDataSource._update_hash(md5, value)
+    return md5.hexdigest()
+
+
+class _EventTime(object):
+    """Stand-in for psana.EventTime.
+    """
+    def __init__(self, sec, nsec, fiducial):
+        self._time = (sec, nsec, fiducial)
+
+    def seconds(self):
+        return self._time[0]
+
+    def nanoseconds(self):
+        return self._time[1]
+
+    def fiducial(self):
+        return self._time[2]
+
+
+class _Unprintable(object):
+    pass
+
+
+class _ControlConfig(object):
+    """Stand-in for a ControlData config type with scalar and array attributes.
+    """
+    def __init__(self, values, duration=1):
+        self._pv_values = values
+        self._duration = duration
+
+    def duration(self):
+        return self._duration
+
+    def npvControls(self):
+        return len(self._pv_values)
+
+    def pvControls_value(self):
+        return list(self._pv_values)
+
+
+class _SrcConfig(object):
+    """Stand-in for PsanaSrcData with one type.
+    """
+    def __init__(self, typ_func):
+        self._types = {'ControlDataConfig': PyDataSource.PsanaTypeData(typ_func)}
+
+
+class EventTimeIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        # not in time order, with two events with the same time stamp 
+        self.times = [(100, 500, 3), (100, 10, 0), (101, 0, 6), 
+                      (99, 999999999, 9), (100, 500, 12), (102, 7, 15)]
+        self.index = PyDataSource.EventTimeIndex([_EventTime(*t) for t in self.times])
+
+    def test_find(self):
+        self.assertEqual(len(self.index), len(self.times))
+        for ievent, evt_time in enumerate(self.times):
+            self.assertEqual(self.index.find(evt_time), ievent)
+            self.assertEqual(self.index.index(_EventTime(*evt_time)), ievent)
+            self.assertIn(evt_time, self.index)
+        
+        packed = (101 << 32) | 0
+        self.assertEqual(self.index.find(packed), 2)
+    
+    def test_miss(self):
+        self.assertIsNone(self.index.find((100, 501, 3)))
+        self.assertIsNone(self.index.find((103, 0)))
+        # time found but fiducial does not match
+        self.assertIsNone(self.index.find((101, 0, 7)))
+        self.assertNotIn((98, 0), self.index)
+        self.assertRaises(ValueError, self.index.index, (100, 501, 3))
+
+    def test_duplicate_times(self):
+        # fiducial selects between events with the same time stamp 
+        self.assertEqual(self.index.find((100, 500, 3)), 0)
+        self.assertEqual(self.index.find((100, 500, 12)), 4)
+        # first event in run order without fiducial
+        self.assertEqual(self.index.find((100, 500)), 0)
+
+    def test_nearest_and_range(self):
+        self.assertEqual(self.index.nearest((100, 20)), 1)
+        self.assertEqual(self.index.nearest((100, 999999999)), 2)
+        self.assertEqual(self.index.nearest((0, 0)), 3)
+        self.assertEqual(self.index.nearest((200, 0)), 5)
+        self.assertEqual(list(self.index.range((100, 0), (101, 0))), [1, 0, 4, 2])
+        self.assertEqual(list(self.index.range((103, 0), (104, 0))), [])
+
+
+class UpdateHashTest(unittest.TestCase):
+
+    def test_objects_without_value_repr(self):
+        # default repr includes the memory address
+        self.assertEqual(_hash({'a': _Unprintable()}), _hash({'a': _Unprintable()}))
+
+    def test_functions(self):
+        self.assertEqual(_hash(np.mean), _hash(np.mean))
+        self.assertNotEqual(_hash(np.mean), _hash(np.sum))
+
+    def test_values(self):
+        self.assertEqual(_hash({'x': [1, 2.5, 'a'], 'y': np.arange(4)}), 
+                         _hash({'y': np.arange(4), 'x': [1, 2.5, 'a']}))
+        self.assertNotEqual(_hash({'x': np.arange(4)}), _hash({'x': np.arange(5)}))
+        self.assertEqual(_hash(np.float32(2.5)), _hash(2.5))
+
+
+class ConfigFingerprintTest(unittest.TestCase):
+
+    def _fingerprint(self, *args, **kwargs):
+        configData = PyDataSource.ConfigData.__new__(PyDataSource.ConfigData)
+        configData._key_info = {}
+        config = _SrcConfig(_ControlConfig(*args, **kwargs))
+        return configData._config_fingerprint('ProcInfo()', config), config
+
+    def test_same_config(self):
+        fingerprint, config = self._fingerprint([1., 2.])
+        self.assertEqual(fingerprint, self._fingerprint([1., 2.])[0])
+        # array values are memoized for use
+        self.assertEqual(config._types['ControlDataConfig'].pvControls_value, [1., 2.])
+
+    def test_control_values_changed(self):
+        # steps that differ only in control values
+        self.assertNotEqual(self._fingerprint([1., 2.])[0], self._fingerprint([1., 3.])[0])
+
+    def test_scalar_changed(self):
+        self.assertNotEqual(self._fingerprint([1., 2.])[0], 
+                            self._fingerprint([1., 2.], duration=2)[0])
+
+
+class StepReuseTest(unittest.TestCase):
+
+    data_source = os.environ.get('PYDATASOURCE_TEST_SCAN', 'exp=xpptut15:run=54:smd')
+
+    def setUp(self):
+        try:
+            self.ds = PyDataSource.DataSource(self.data_source)
+        except Exception, err:
+            self.skipTest('Cannot open {:}: {:}'.format(self.data_source, err))
+        
+        if not self.ds.data_source.smd or self.ds._idx_nsteps < 2:
+            self.skipTest('{:} is not an smd run with steps'.format(self.data_source))
+
+    def _step_configs(self):
+        """Detectors and full content hash of the config for each source and step.
+        """
+        for step in self.ds.steps:
+            configData = self.ds.configData
+            hashes = {srcstr: _hash(config._all_values) \
+                      for srcstr, config in configData._config.items()}
+            yield dict(self.ds._detectors), hashes
+
+    def test_unchanged_detectors_reused(self):
+        ds = self.ds
+        ds.steps.next()
+        detectors = dict(ds._detectors)
+        ds.steps.next()
+        unchanged = [alias for alias, srcstr in ds._aliases.items() \
+                     if srcstr not in ds.configData.changed_sources \
+                        and alias in detectors]
+        self.assertTrue(unchanged)
+        for alias in unchanged:
+            self.assertIn(alias, ds._reused_detectors)
+            self.assertIs(ds._detectors[alias], detectors[alias])
+
+    def test_changed_config_rebuilds_detectors(self):
+        # includes array config such as the ControlData pvControls values 
+        previous = None
+        nchanged = 0
+        for detectors, hashes in self._step_configs():
+            if previous is not None:
+                for alias, srcstr in self.ds._aliases.items():
+                    if alias not in detectors or alias not in previous[0]:
+                        continue
+                    if hashes.get(srcstr) != previous[1].get(srcstr):
+                        nchanged += 1
+                        self.assertIn(srcstr, self.ds.configData.changed_sources)
+                        self.assertNotIn(alias, self.ds._reused_detectors)
+                        self.assertIsNot(detectors[alias], previous[0][alias])
+            
+            previous = (detectors, hashes)
+        
+        if not nchanged:
+            self.skipTest('{:} has no detector config changes between steps'.format(
+                          self.data_source))
+
+    def test_control_values_by_step(self):
+        # reused ConfigData has the same control values as a new one for the step
+        for step in self.ds.steps:
+            configData = PyDataSource.ConfigData(self.ds)
+            self.assertEqual(_hash(self.ds.configData._controlData), 
+                             _hash(configData._controlData))
+
+
+if __name__ == '__main__':
+    unittest.main()
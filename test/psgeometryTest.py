@@ -0,0 +1,209 @@
+#--------------------------------------------------------------------------
+# Description:
+#  Unit tests for psgeometry ArrayStore, ImageAssembler and PolarIntegrator.
+#
+#  Assembled images are compared with the psana det.image method for pixel
+#  index maps (PSCalib.GeometryAccess.img_from_pixel_arrays).
+#------------------------------------------------------------------------
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from PyDataSource.psgeometry import ArrayStore, ImageAssembler, PolarIntegrator, bin_indexes
+
+
+def _pixel_indexes():
+    """Index maps of two 4x6 panels placed with a gap in a 10x8 image, 
+    the second panel rotated by 90 degrees.
+    """
+    ix = np.empty((2, 4, 6), dtype=int)
+    iy = np.empty((2, 4, 6), dtype=int)
+    ix[0], iy[0] = np.mgrid[0:4, 0:6]
+    iy[1], ix[1] = np.mgrid[0:4, 0:6]
+    ix[1] += 4
+    iy[1] += 7
+    return ix, iy
+
+def _psana_image(ix, iy, nda):
+    """Image as made by psana det.image (PSCalib img_from_pixel_arrays).
+    """
+    img = np.zeros((ix.max()+1, iy.max()+1), dtype=nda.dtype)
+    img[ix.ravel(), iy.ravel()] = nda.ravel()
+    return img
+
+
+class ImageAssemblerTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.ix, self.iy = _pixel_indexes()
+        self.nda = np.random.rand(2, 4, 6).astype(np.float32)
+
+    def test_image(self):
+        assembler = ImageAssembler(self.ix, self.iy)
+        img = assembler.image(self.nda)
+        expected = _psana_image(self.ix, self.iy, self.nda)
+        self.assertEqual(img.shape, expected.shape)
+        self.assertEqual(img.dtype, self.nda.dtype)
+        np.testing.assert_array_equal(img, expected)
+
+    def test_out_buffer(self):
+        assembler = ImageAssembler(self.ix, self.iy)
+        out = np.empty(assembler.shape, dtype=self.nda.dtype)
+        out.fill(-1)
+        img = assembler.image(self.nda, out=out)
+        self.assertIs(img, out)
+        # gaps are reset between events
+        np.testing.assert_array_equal(out, _psana_image(self.ix, self.iy, self.nda))
+        self.assertRaises(ValueError, assembler.image, self.nda, out=np.empty((3, 3)))
+        self.assertRaises(ValueError, assembler.image, self.nda[0])
+
+    def test_images(self):
+        assembler = ImageAssembler(self.ix, self.iy)
+        stack = np.random.rand(3, 2, 4, 6)
+        imgs = assembler.images(stack)
+        self.assertEqual(imgs.shape, (3,)+assembler.shape)
+        for img, nda in zip(imgs, stack):
+            np.testing.assert_array_equal(img, _psana_image(self.ix, self.iy, nda))
+
+    def test_binning(self):
+        expected = _psana_image(self.ix, self.iy, self.nda.astype(float))
+        # pad to a multiple of the binning and sum 2x2 blocks
+        padded = np.zeros((10, 14))
+        padded[:expected.shape[0], :expected.shape[1]] = expected
+        binned = padded.reshape(5, 2, 7, 2).sum(axis=(1, 3))
+        assembler = ImageAssembler(self.ix, self.iy, binning=2)
+        img = assembler.image(self.nda)
+        np.testing.assert_allclose(img, binned[:img.shape[0], :img.shape[1]])
+        np.testing.assert_allclose(assembler.images(self.nda[np.newaxis])[0], img)
+
+        # mean of the pixels in each bin
+        assembler = ImageAssembler(self.ix, self.iy, binning=2, mean=True)
+        counts = ImageAssembler(self.ix, self.iy, binning=2).image(np.ones((2, 4, 6)))
+        img_mean = assembler.image(self.nda)
+        np.testing.assert_allclose(img_mean, img/np.maximum(counts, 1))
+
+
+class ArrayStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_refcounts(self):
+        store = ArrayStore()
+        mask = np.arange(12).reshape(3,4) % 2 == 0
+        key = store.add(mask)
+        self.assertTrue(store.is_key(key))
+        # identical content is stored once
+        self.assertEqual(store.add(mask.copy()), key)
+        self.assertEqual(len(store), 1)
+        store.retain(key)
+        other = store.add(np.ones(5))
+        self.assertEqual(len(store), 2)
+        
+        for i in range(2):
+            store.release(key)
+        self.assertIn(key, store)
+        store.release(key)
+        self.assertNotIn(key, store)
+        self.assertIsNone(store.resolve(key))
+        np.testing.assert_array_equal(store.resolve(other), np.ones(5))
+        self.assertEqual(store.resolve(5), 5)
+
+    def test_stored_copy(self):
+        store = ArrayStore()
+        mask = np.ones((3,4), dtype=bool)
+        key = store.add(mask)
+        mask[0] = False
+        stored = store.get(key)
+        self.assertTrue(stored.all())
+        self.assertFalse(stored.flags.writeable)
+        # key is still the content hash of the stored array
+        self.assertEqual(store.add(np.ones((3,4), dtype=bool)), key)
+
+    def test_save_load(self):
+        store = ArrayStore()
+        keys = [store.add(np.arange(10.)), store.add(np.eye(3, dtype=bool))]
+        file_name = os.path.join(self.path, 'arrays.npz')
+        store.save(file_name, keys=keys[:1])
+        store.save(file_name)
+
+        loaded = ArrayStore()
+        self.assertEqual(sorted(loaded.load(file_name)), sorted(keys))
+        for key in keys:
+            np.testing.assert_array_equal(loaded.get(key), store.get(key))
+            self.assertEqual(loaded.get(key).dtype, store.get(key).dtype)
+            self.assertFalse(loaded.get(key).flags.writeable)
+
+        # loaded arrays are not referenced until retained
+        loaded.retain(keys[0])
+        loaded.prune()
+        self.assertEqual(list(loaded._arrays), keys[:1])
+
+
+class PolarIntegratorTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        y, x = np.mgrid[-20:20, -15:25] + 0.5
+        self.radius = np.sqrt(x**2+y**2).reshape(2, 20, 40)
+        self.azimuth = np.degrees(np.arctan2(y, x)).reshape(2, 20, 40)
+        self.nda = np.random.rand(2, 20, 40)
+        self.mask = np.random.rand(2, 20, 40) < 0.1
+
+    def test_bin_indexes(self):
+        values = np.array([0., 0.5, 1., 2., np.nan, -1., 3.])
+        idx, edges = bin_indexes(values, [0., 1., 2.])
+        np.testing.assert_array_equal(edges, [0., 1., 2.])
+        # right edge is in the last bin as for np.histogram
+        self.assertEqual(idx.tolist(), [0, 0, 1, 1, 2, 2, 2])
+        idx, edges = bin_indexes(values, [0., 1., 2.], valid=values != 0.5)
+        self.assertEqual(idx.tolist(), [0, 2, 1, 1, 2, 2, 2])
+
+    def test_radial(self):
+        integrator = PolarIntegrator(self.radius, 25, mask=self.mask)
+        valid = ~self.mask
+        hst, edges = np.histogram(self.radius[valid], bins=25, weights=self.nda[valid])
+        counts = np.histogram(self.radius[valid], bins=25)[0]
+        np.testing.assert_allclose(integrator.edges, edges)
+        np.testing.assert_allclose(integrator.integrate(self.nda), hst)
+        np.testing.assert_array_equal(integrator.counts, counts)
+        np.testing.assert_allclose(integrator.integrate(self.nda, normalize=True), 
+                                   hst/counts)
+        np.testing.assert_allclose(integrator.axis, (edges[1:]+edges[:-1])/2.)
+
+    def test_bin_edges(self):
+        # pixels outside the bins are dropped
+        bins = np.linspace(5., 15., 11)
+        integrator = PolarIntegrator(self.radius, bins)
+        hst = np.histogram(self.radius, bins=bins, weights=self.nda)[0]
+        np.testing.assert_allclose(integrator.integrate(self.nda), hst)
+
+    def test_cake(self):
+        integrator = PolarIntegrator(self.radius, 10, mask=self.mask, 
+                                     coords2=self.azimuth, bins2=8)
+        valid = ~self.mask
+        hst, xedges, yedges = np.histogram2d(self.radius[valid], self.azimuth[valid], 
+                                             bins=[10, 8], weights=self.nda[valid])
+        self.assertEqual(integrator.shape, (10, 8))
+        np.testing.assert_allclose(integrator.edges2, yedges)
+        np.testing.assert_allclose(integrator.integrate(self.nda), hst)
+
+    def test_batch(self):
+        integrator = PolarIntegrator(self.radius, 25, mask=self.mask)
+        stack = np.random.rand(3, 2, 20, 40)
+        out = integrator.integrate_batch(stack)
+        self.assertEqual(out.shape, (3, 25))
+        for hst, nda in zip(out, stack):
+            np.testing.assert_allclose(hst, integrator.integrate(nda))
+        self.assertRaises(ValueError, integrator.integrate, self.nda[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
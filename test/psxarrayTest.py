@@ -0,0 +1,199 @@
+#--------------------------------------------------------------------------
+# Description:
+#  Unit tests for psxarray StreamWriter and SummaryAccumulator.
+#
+#  StreamWriter tests are skipped if h5netcdf is not available.
+#------------------------------------------------------------------------
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from PyDataSource import psxarray
+from PyDataSource.psxarray import StreamWriter, SummaryAccumulator
+
+try:
+    import h5netcdf
+except ImportError:
+    h5netcdf = None
+
+
+def _block(irow0, nrows, size=5):
+    """Block of rows in buffers of size rows with nan for rows not filled.
+    """
+    vals = np.empty((size, 3))
+    vals.fill(np.nan)
+    vals[:nrows] = np.arange(irow0, irow0+nrows)[:,np.newaxis]*np.ones(3)
+    # detector not in every other event
+    vals[1:nrows:2] = np.nan
+    return {'time': np.arange(irow0, irow0+size, dtype='int64'),
+            'step': np.arange(irow0, irow0+size)//4,
+            'det_a': vals}
+
+
+@unittest.skipIf(h5netcdf is None, 'h5netcdf not available')
+class StreamWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.path, 'run0001.nc')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _writer(self, **kwargs):
+        writer = StreamWriter(self.file_name, block_size=5, **kwargs)
+        if not kwargs.get('checkpoint'):
+            writer.create_variable('steps', ['steps'], data=np.arange(3), coord=True)
+            writer.create_variable('time', ['time'], dtype='int64', coord=True)
+            writer.create_variable('step', ['time'], dtype=int, coord=True)
+            writer.create_variable('det_a', ['time', 'det_a_d0'], dtype=float, shape=(3,),
+                                   attrs={'unit': 'ADU', 'doc': None})
+        return writer
+
+    def _expected(self, blocks):
+        return {name: np.concatenate([_block(*block)[name][:block[1]] for block in blocks]) \
+                for name in ['time', 'step', 'det_a']}
+
+    def test_block_append(self):
+        writer = self._writer()
+        writer.write(_block(0, 5), 5)
+        writer.write(_block(5, 3), 3)
+        self.assertEqual(writer.nrows, 8)
+        writer.close(attrs={'run': 1})
+
+        self.assertFalse(os.path.isfile(writer._tmp_file))
+        x = writer.open()
+        expected = self._expected([(0, 5), (5, 3)])
+        self.assertEqual(x.dims['time'], 8)
+        self.assertIn('step', x.coords)
+        np.testing.assert_array_equal(x.step.values, expected['step'])
+        # rows without detector data stay nan
+        np.testing.assert_array_equal(x.det_a.values, expected['det_a'])
+        self.assertTrue(np.isnan(x.det_a.values[[1, 3, 6]]).all())
+        self.assertEqual(x.det_a.attrs['unit'], 'ADU')
+        self.assertEqual(x.det_a.attrs['doc'], '')
+        self.assertEqual(x.attrs['run'], 1)
+        x.close()
+
+    def test_resume_resizes_to_checkpoint(self):
+        writer = self._writer()
+        writer.write(_block(0, 5), 5)
+        writer.save_checkpoint(ievent=4, igood=4, config_hash='abc')
+        # block written after the checkpoint is lost when the job is interrupted
+        writer.write(_block(5, 5), 5)
+        writer._file.close()
+
+        checkpoint = StreamWriter.load_checkpoint(self.file_name)
+        self.assertEqual(checkpoint['nrows'], 5)
+        self.assertEqual(checkpoint['ievent'], 4)
+        self.assertEqual(checkpoint['config_hash'], 'abc')
+
+        writer = self._writer(checkpoint=checkpoint)
+        self.assertEqual(writer.nrows, 5)
+        self.assertEqual(writer._file['time'].shape[0], 5)
+        writer.write(_block(5, 2), 2)
+        writer.close()
+
+        self.assertIsNone(StreamWriter.load_checkpoint(self.file_name))
+        x = writer.open()
+        expected = self._expected([(0, 5), (5, 2)])
+        np.testing.assert_array_equal(x.step.values, expected['step'])
+        np.testing.assert_array_equal(x.det_a.values, expected['det_a'])
+        x.close()
+
+    def test_discard(self):
+        writer = self._writer()
+        writer.write(_block(0, 5), 5)
+        writer.save_checkpoint(ievent=4, igood=4)
+        writer.discard()
+        self.assertEqual(os.listdir(self.path), [])
+
+
+class SummaryAccumulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        nevents = 200
+        vals = np.random.rand(nevents, 4)
+        vals[np.random.rand(nevents) < 0.2] = np.nan
+        self.x = xr.Dataset({'det_a': (('time', 'det_a_d0'), vals),
+                             'det_b': (('time',), np.random.rand(nevents))},
+                            coords={'time': np.arange(nevents),
+                                    'step': ('time', np.arange(nevents)*3//nevents)})
+
+    def _compare(self, xsum, xref):
+        for name in ['det_a', 'det_b']:
+            dims = xref[name].dims
+            np.testing.assert_allclose(xsum[name].transpose(*dims).values,
+                                       xref[name].values, rtol=1.e-10)
+
+    def test_single_pass_matches_to_summary(self):
+        summary = SummaryAccumulator()
+        summary.add_dataset(self.x)
+        xref = psxarray.to_summary(self.x)
+        xsum = summary.to_summary()
+        self.assertEqual(list(xsum.stat.values), list(xref.stat.values))
+        self._compare(xsum, xref)
+        self.assertEqual(xsum.attrs['nevents_summary'], self.x.dims['time'])
+
+    def test_merge_equals_single_pass(self):
+        summary = SummaryAccumulator()
+        summary.add_dataset(self.x)
+
+        merged = SummaryAccumulator()
+        for chunk in [slice(0, 50), slice(50, 120), slice(120, None)]:
+            chunk_summary = SummaryAccumulator()
+            for i in range(chunk.start, chunk.stop or self.x.dims['time'], 10):
+                chunk_summary.add_dataset(self.x.isel(time=slice(i, i+10)))
+            merged.merge(chunk_summary)
+
+        self._compare(merged.to_summary(), summary.to_summary())
+        self.assertEqual(merged.nevents, summary.nevents)
+
+    def test_nan_layout(self):
+        summary = SummaryAccumulator()
+        summary.add_block([0, 0, 1], {'det_a': [1., np.nan, 3.]})
+        # det_c only in step 1
+        summary.add_block([1, 1], {'det_c': [2., 4.]})
+        xsum = summary.to_summary()
+        self.assertEqual(list(xsum.step.values), [0, 1])
+        self.assertEqual(xsum.det_a.sel(stat='count').values.tolist(), [1, 1])
+        self.assertEqual(xsum.det_a.sel(stat='mean').values.tolist(), [1., 3.])
+        self.assertTrue(np.isnan(xsum.det_c.sel(stat='mean', step=0).values))
+        self.assertEqual(float(xsum.det_c.sel(stat='mean', step=1)), 3.)
+        self.assertEqual(float(xsum.det_c.sel(stat='std', step=1)), 1.)
+
+    def test_state_round_trip(self):
+        summary = SummaryAccumulator()
+        summary.add_dataset(self.x.isel(time=slice(0, 120)))
+        state = json.loads(json.dumps(summary.get_state()))
+        
+        resumed = SummaryAccumulator()
+        resumed.set_state(state)
+        resumed.add_dataset(self.x.isel(time=slice(120, None)))
+        
+        single = SummaryAccumulator()
+        single.add_dataset(self.x)
+        self._compare(resumed.to_summary(), single.to_summary())
+        self.assertEqual(resumed.nevents, single.nevents)
+        self.assertRaises(ValueError, SummaryAccumulator(groupby='run').set_state, state)
+
+    def test_damage_cut(self):
+        # to_summary drops events with any nan value after the Damage_cut
+        x = self.x.fillna(0.)
+        x['Damage_cut'] = ('time', np.arange(x.dims['time']) % 3 != 0)
+        summary = SummaryAccumulator()
+        summary.add_dataset(x)
+        xsum = summary.to_summary()
+        self.assertNotIn('Damage_cut', xsum)
+        self._compare(xsum, psxarray.to_summary(x))
+        self.assertEqual(summary.nevents, int(x.Damage_cut.sum()))
+
+
+if __name__ == '__main__':
+    unittest.main()